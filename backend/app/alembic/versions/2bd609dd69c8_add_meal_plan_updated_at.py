@@ -0,0 +1,30 @@
+"""add meal plan updated_at
+
+Revision ID: 2bd609dd69c8
+Revises: 8a36ea2cba13
+Create Date: 2026-10-17 04:52:51.193791
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2bd609dd69c8'
+down_revision: Union[str, Sequence[str], None] = '8a36ea2cba13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('mealplan', sa.Column('updated_at', sqlmodel.sql.sqltypes.AutoString(length=30), nullable=True))
+    op.execute('UPDATE mealplan SET updated_at = created_at')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('mealplan', 'updated_at')
@@ -0,0 +1,30 @@
+"""add meal plan listing indexes
+
+Revision ID: 2f895fa28d73
+Revises: e6a9ece88982
+Create Date: 2026-10-17 04:52:50.874601
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f895fa28d73'
+down_revision: Union[str, Sequence[str], None] = 'e6a9ece88982'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_mealplan_user_id_created_at', 'mealplan', ['user_id', 'created_at'], unique=False)
+    op.create_index(op.f('ix_mealplanitem_meal_plan_id'), 'mealplanitem', ['meal_plan_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_mealplanitem_meal_plan_id'), table_name='mealplanitem')
+    op.drop_index('ix_mealplan_user_id_created_at', table_name='mealplan')
@@ -0,0 +1,41 @@
+"""add food name mapping
+
+Revision ID: 6868f8dcf3f1
+Revises: 2bd609dd69c8
+Create Date: 2026-10-17 04:52:51.326807
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6868f8dcf3f1'
+down_revision: Union[str, Sequence[str], None] = '2bd609dd69c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('foodnamemapping',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('item_key', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=False),
+    sa.Column('food_name', sqlmodel.sql.sqltypes.AutoString(length=100), nullable=True),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('catalog_version', sqlmodel.sql.sqltypes.AutoString(length=32), nullable=False),
+    sa.Column('resolved_at', sqlmodel.sql.sqltypes.AutoString(length=30), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_foodnamemapping_id'), 'foodnamemapping', ['id'], unique=False)
+    op.create_index(op.f('ix_foodnamemapping_item_key'), 'foodnamemapping', ['item_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_foodnamemapping_item_key'), table_name='foodnamemapping')
+    op.drop_index(op.f('ix_foodnamemapping_id'), table_name='foodnamemapping')
+    op.drop_table('foodnamemapping')
@@ -0,0 +1,31 @@
+"""add meal plan household
+
+Revision ID: 8238ca0a590d
+Revises: 6868f8dcf3f1
+Create Date: 2026-10-17 04:48:26.512309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8238ca0a590d'
+down_revision: Union[str, Sequence[str], None] = '6868f8dcf3f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('mealplan', sa.Column('household', sa.JSON(), nullable=True))
+    op.add_column('mealplanitem', sa.Column('household_group', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('mealplanitem', 'household_group')
+    op.drop_column('mealplan', 'household')
@@ -0,0 +1,28 @@
+"""add meal plan analysis
+
+Revision ID: 8a36ea2cba13
+Revises: 2f895fa28d73
+Create Date: 2026-10-17 04:52:51.027330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a36ea2cba13'
+down_revision: Union[str, Sequence[str], None] = '2f895fa28d73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('mealplan', sa.Column('analysis', sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('mealplan', 'analysis')
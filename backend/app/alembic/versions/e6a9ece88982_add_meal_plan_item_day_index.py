@@ -0,0 +1,30 @@
+"""add meal plan item day index
+
+Revision ID: e6a9ece88982
+Revises: 76a91dc29733
+Create Date: 2026-10-17 04:52:50.703057
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a9ece88982'
+down_revision: Union[str, Sequence[str], None] = '76a91dc29733'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('mealplanitem', sa.Column('day_index', sa.Integer(), nullable=False, server_default='0'))
+    # Existing plans are single weeks, so the day of the week is the day of the plan
+    op.execute('UPDATE mealplanitem SET day_index = day_of_week')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('mealplanitem', 'day_index')
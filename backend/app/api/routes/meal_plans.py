@@ -1,11 +1,28 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.routing import APIRouter
 from app.models import User, MealPlan, MealPlanItem, InventoryItem
 from app.api.deps import get_current_user
-from app.db import get_session
-from app.meal_optimizer import MealOptimizer, FoodDatabase
-from typing import Annotated, List, Optional
-from sqlmodel import Session, select, Field, SQLModel
+from app.db import engine, get_session
+from app.food_matcher import resolve_names
+from app.meal_optimizer import CatalogSnapshot, MealOptimizer, FoodDatabase
+from app import plan_formats
+from app.plan_cache import PlanCache
+from app.plan_store import (
+    archive_meal_plans,
+    delete_meal_plans,
+    meal_item_fields,
+    pack_analysis,
+    unpack_analysis,
+    write_meal_plan,
+)
+from typing import Annotated, Dict, Iterable, List, Optional
+from sqlmodel import Session, select, Field, SQLModel, and_, func, or_
+from sqlalchemy.orm import defer
+import base64
+import hashlib
+import itertools
+import json
 import uuid
 from datetime import datetime, timedelta
 
@@ -17,10 +34,46 @@ class MealPlanCreate(SQLModel):
     target_budget: float = Field(ge=0.0)
 
 
+class HouseholdMember(SQLModel):
+    name: str = Field(max_length=100)
+    dietary_restrictions: str | None = Field(default=None, max_length=100)
+    portion: float = Field(default=1.0, gt=0.0, le=3.0, description="Share of an adult's intake, e.g. 0.5 for a young child")
+
+
 class MealPlanOptimizeRequest(SQLModel):
     target_budget: float = Field(ge=0.0, description="Weekly budget for meal planning")
     duration_days: int = Field(default=7, ge=1, le=30, description="Number of days to plan")
     use_inventory: bool = Field(default=True, description="Whether to use inventory items")
+    mode: str = Field(default="greedy", regex="^(greedy|lp|milp|anytime|multistart)$", description="Optimization engine: greedy, lp, milp, anytime or multistart")
+    deadline_ms: int | None = Field(default=None, ge=1, le=60000, description="Time budget in milliseconds for the search and LP engines")
+    restarts: int = Field(default=8, ge=1, le=64, description="Local-search restarts for the multistart engine")
+    seed: int | None = Field(default=None, description="Random seed for the anytime and multistart engines")
+    members: List[HouseholdMember] | None = Field(default=None, max_length=100, description="Household members sharing the budget; defaults to housing_size adults with the account's restrictions")
+
+
+class BudgetSweepRequest(SQLModel):
+    budgets: List[float] = Field(min_length=1, max_length=50, description="Weekly budgets to evaluate")
+    use_inventory: bool = Field(default=True, description="Whether to use inventory items")
+    mode: str = Field(default="greedy", regex="^(greedy|lp|milp|anytime|multistart)$", description="Optimization engine: greedy, lp, milp, anytime or multistart")
+    deadline_ms: int | None = Field(default=None, ge=1, le=60000, description="Time budget in milliseconds per budget point")
+    restarts: int = Field(default=8, ge=1, le=64, description="Number of restarts for the multistart engine")
+    seed: int | None = Field(default=None, description="Random seed for the anytime and multistart engines")
+
+
+class MealPlanRetentionRequest(SQLModel):
+    older_than_days: int = Field(ge=1, le=3650, description="Apply to plans created more than this many days ago")
+    action: str = Field(default="archive", regex="^(archive|delete)$", description="Archive or delete the old plans")
+    status_filter: str | None = Field(default=None, description="Only apply to plans with this status")
+
+
+class FoodPriceUpdateRequest(SQLModel):
+    prices: Dict[str, float] = Field(description="New cost per 100g by food name")
+
+
+class MealRegenerateRequest(SQLModel):
+    day_index: int = Field(ge=0, le=29, description="Day of the plan of the meal to regenerate (0=start date)")
+    meal_type: str = Field(regex="^(breakfast|lunch|dinner|snack)$", description="Meal to regenerate")
+    use_inventory: bool = Field(default=True, description="Whether to use inventory items")
 
 
 class MealPlanResponse(SQLModel):
@@ -38,6 +91,13 @@ class MealPlanResponse(SQLModel):
 
 class MealPlanDetailResponse(MealPlanResponse):
     items: List[MealPlanItem]
+    shopping_list: List[dict] | None = None
+    nutrition_analysis: dict | None = None
+    alternatives: List[dict] | None = None
+    inventory_usage: dict | None = None
+    budget_remaining: float | None = None
+    budget_utilization: float | None = None
+    household: dict | None = None
 
 
 class OptimizedMealPlanResponse(SQLModel):
@@ -50,6 +110,32 @@ class OptimizedMealPlanResponse(SQLModel):
     nutrition_analysis: dict
     alternatives: List[dict]
     inventory_usage: dict
+    optimization: dict = {}
+    catalog_version: str | None = None
+    household: dict | None = None
+
+
+class BudgetSweepPoint(SQLModel):
+    budget: float
+    total_cost: float
+    budget_utilization: float
+    overall_score: int
+    weekly_averages: dict
+    meals_from_inventory: int
+
+
+class BudgetSweepResponse(SQLModel):
+    points: List[BudgetSweepPoint]
+    frontier: List[BudgetSweepPoint]
+
+
+class MealRegenerateResponse(SQLModel):
+    meal_plan_id: uuid.UUID
+    day_index: int
+    meal_type: str
+    items: List[MealPlanItem]
+    total_cost: float
+    budget_remaining: float
 
 
 router = APIRouter(
@@ -57,12 +143,223 @@ router = APIRouter(
     tags=["meal planning"]
 )
 
+# Optimized plans shared across users with equivalent inputs
+plan_cache = PlanCache()
+
+# Catalog responses may be reused for a while and revalidated by ETag after that
+CATALOG_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+
+def _load_inventory(session: Session, user: User, snapshot: CatalogSnapshot, store_mappings: bool = True) -> List[dict]:
+    """
+    Load a user's inventory in the shape MealOptimizer expects, matched to catalog foods.
+    
+    Without store_mappings, names are matched without writing to (or committing) the session.
+    """
+    statement = select(InventoryItem).where(InventoryItem.user_id == user.id)
+    items = session.exec(statement).all()
+    food_names = resolve_names(session, snapshot.get_name_matcher(), {item.name for item in items}, store=store_mappings)
+    return [
+        {
+            'id': str(item.id),
+            'name': item.name,
+            'food_name': food_names[item.name],
+            'quantity': item.quantity,
+            'cost': item.cost,
+            'category': item.category,
+            'expiration_date': item.expiration_date
+        }
+        for item in items
+    ]
+
+
+def _etag(*parts) -> str:
+    """Strong entity tag over the values that determine a response's bytes."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names the current entity tag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return "*" in candidates or etag in [tag.removeprefix("W/") for tag in candidates]
+
+
+def _not_modified(etag: str, cache_control: Optional[str] = None) -> Response:
+    """Empty 304 response repeating the validators of the full one."""
+    headers = {"ETag": etag, "Vary": "Accept"}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def _response_format(accept: Optional[str]) -> str:
+    """Negotiate the item layout of a plan response from the Accept header."""
+    try:
+        return plan_formats.negotiate(accept)
+    except plan_formats.FormatUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=str(e)
+        )
+
+
+def _formatted(body: SQLModel, items_key: str, media_type: str, response: Response):
+    """Return a plan response as-is for JSON, or encoded with its items in columns."""
+    response.headers["Vary"] = "Accept"
+    if media_type == plan_formats.JSON:
+        return body
+    return Response(
+        content=plan_formats.encode(body.model_dump(mode="json"), items_key, media_type),
+        media_type=media_type,
+        headers={name: value for name, value in response.headers.items() if name in ("etag", "vary")}
+    )
+
+
+def _plan_cache_key(request: MealPlanOptimizeRequest, user: User, inventory_items: List[dict], start_date, snapshot: CatalogSnapshot) -> str:
+    """Fingerprint an optimize request for the shared plan cache."""
+    return plan_cache.fingerprint(
+        request.target_budget,
+        user.dietary_restrictions,
+        inventory_items,
+        catalog=snapshot.tag,
+        mode=request.mode,
+        deadline_ms=request.deadline_ms,
+        seed=request.seed,
+        restarts=request.restarts,
+        days=request.duration_days,
+        start_date=start_date.isoformat(),
+        members=_household_members(request, user)
+    )
+
+
+def _build_optimizer(request: MealPlanOptimizeRequest, user: User, inventory_items: List[dict], start_date, snapshot: CatalogSnapshot) -> MealOptimizer:
+    """Create the optimizer for a request, planning at the bottom of its budget bucket."""
+    return MealOptimizer(
+        budget=plan_cache.quantize_budget(request.target_budget),
+        inventory_items=inventory_items,
+        dietary_restrictions=user.dietary_restrictions,
+        dietary_pref=user.dietary_pref,
+        days=request.duration_days,
+        start_date=start_date,
+        snapshot=snapshot
+    )
+
+
+def _household_members(request: MealPlanOptimizeRequest, user: User) -> Optional[List[dict]]:
+    """Members to plan for, or None when the plan is for the account holder alone."""
+    if request.members:
+        return [member.model_dump() for member in request.members]
+    if user.housing_size <= 1:
+        return None
+    holder = {'name': user.full_name or user.username, 'dietary_restrictions': user.dietary_restrictions, 'portion': 1.0}
+    return [holder] + [
+        {'name': f"Member {number}", 'dietary_restrictions': user.dietary_restrictions, 'portion': 1.0}
+        for number in range(2, user.housing_size + 1)
+    ]
+
+
+def _run_optimizer(optimizer: MealOptimizer, request: MealPlanOptimizeRequest, user: User) -> dict:
+    """Plan for the request's household, or for the account holder alone."""
+    members = _household_members(request, user)
+    if members is not None:
+        return optimizer.optimize_household(members, **_engine_options(request))
+    return optimizer.optimize_weekly_plan(**_engine_options(request))
+
+
+def _engine_options(request: MealPlanOptimizeRequest) -> dict:
+    """Engine options of an optimize request."""
+    return {
+        'mode': request.mode,
+        'deadline_ms': request.deadline_ms,
+        'seed': request.seed,
+        'restarts': request.restarts
+    }
+
+
+def _rebase_result(result: dict, request: MealPlanOptimizeRequest, inventory_items: List[dict], cache_hit: bool) -> dict:
+    """Adapt a shared plan result to this request and note whether it came from the cache."""
+    optimization_result = PlanCache.rebase(result, request.target_budget, inventory_items)
+    optimization_result['optimization'] = {
+        **optimization_result['optimization'],
+        'cache': 'hit' if cache_hit else 'miss'
+    }
+    return optimization_result
+
+
+def _save_optimized_plan(
+    session: Session,
+    user_id: uuid.UUID,
+    request: MealPlanOptimizeRequest,
+    start_date,
+    optimization_result: dict
+) -> OptimizedMealPlanResponse:
+    """Persist an optimized plan and its items and build the optimize response."""
+    end_date = start_date + timedelta(days=request.duration_days - 1)
+    created_at = datetime.now().isoformat()
+    
+    # Create meal plan record
+    meal_plan = MealPlan(
+        name=f"Optimized Plan - {start_date.strftime('%b %d, %Y')}",
+        description=f"AI-optimized meal plan generated with ${request.target_budget} budget",
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        target_budget=request.target_budget,
+        total_cost=optimization_result['total_cost'],
+        status="active",
+        user_id=user_id,
+        created_at=created_at,
+        updated_at=created_at,
+        analysis=pack_analysis(optimization_result),
+        household=optimization_result.get('household')
+    )
+    
+    # Plan and items go out in one transaction; the response is built from memory
+    meal_items_list = write_meal_plan(session, meal_plan, optimization_result['meal_plan_items'])
+    
+    # Prepare response
+    meal_plan_response = MealPlanResponse(
+        id=meal_plan.id,
+        name=meal_plan.name,
+        description=meal_plan.description,
+        start_date=meal_plan.start_date,
+        end_date=meal_plan.end_date,
+        target_budget=meal_plan.target_budget,
+        total_cost=meal_plan.total_cost,
+        status=meal_plan.status,
+        created_at=meal_plan.created_at,
+        items_count=len(meal_items_list)
+    )
+    
+    response = OptimizedMealPlanResponse(
+        meal_plan=meal_plan_response,
+        meal_items=meal_items_list,
+        shopping_list=optimization_result['shopping_list'],
+        total_cost=optimization_result['total_cost'],
+        budget_remaining=optimization_result['budget_remaining'],
+        budget_utilization=optimization_result['budget_utilization'],
+        nutrition_analysis=optimization_result['nutrition_analysis'],
+        alternatives=optimization_result['alternatives'],
+        inventory_usage=optimization_result['inventory_usage'],
+        optimization=optimization_result['optimization'],
+        catalog_version=optimization_result.get('catalog_version'),
+        household=optimization_result.get('household')
+    )
+    session.commit()
+    
+    return response
+
 
 @router.post("/optimize", response_model=OptimizedMealPlanResponse)
 def optimize_meal_plan(
     request: MealPlanOptimizeRequest,
     current_user: Annotated[User, Depends(get_current_user)],
-    session: Annotated[Session, Depends(get_session)]
+    session: Annotated[Session, Depends(get_session)],
+    response: Response,
+    accept: Annotated[str | None, Header()] = None
 ):
     """
     Generate an optimized weekly meal plan based on budget, inventory, and nutrition requirements.
@@ -73,114 +370,312 @@ def optimize_meal_plan(
     - Ensures minimum nutrition requirements are met
     - Suggests alternatives based on cost data
     - Provides a shopping list with estimated costs
+    
+    Send `Accept: application/vnd.mealplan.columnar+json` or `application/msgpack`
+    to receive `meal_items` as one array per field.
     """
+    media_type = _response_format(accept)
+    
     try:
         # Get user's inventory items
-        inventory_items = []
-        if request.use_inventory:
-            statement = select(InventoryItem).where(InventoryItem.user_id == current_user.id)
-            db_items = session.exec(statement).all()
-            inventory_items = [
-                {
-                    'id': str(item.id),
-                    'name': item.name,
-                    'quantity': item.quantity,
-                    'cost': item.cost,
-                    'category': item.category,
-                    'expiration_date': item.expiration_date
-                }
-                for item in db_items
-            ]
-        
-        # Initialize meal optimizer
-        optimizer = MealOptimizer(
-            budget=request.target_budget,
-            inventory_items=inventory_items,
-            dietary_restrictions=current_user.dietary_restrictions,
-            dietary_pref=current_user.dietary_pref
-        )
-        
-        # Generate optimized meal plan
-        optimization_result = optimizer.optimize_weekly_plan()
-        
-        # Create meal plan record
+        # Plan against one catalog snapshot even if prices are reloaded meanwhile
+        snapshot = FoodDatabase.snapshot()
+        inventory_items = _load_inventory(session, current_user, snapshot) if request.use_inventory else []
         start_date = datetime.now().date()
-        end_date = start_date + timedelta(days=request.duration_days - 1)
         
-        meal_plan = MealPlan(
-            name=f"Optimized Plan - {start_date.strftime('%b %d, %Y')}",
-            description=f"AI-optimized meal plan generated with ${request.target_budget} budget",
-            start_date=start_date.isoformat(),
-            end_date=end_date.isoformat(),
-            target_budget=request.target_budget,
-            total_cost=optimization_result['total_cost'],
-            status="active",
-            user_id=current_user.id,
-            created_at=datetime.now().isoformat()
-        )
+        # Reuse a plan for equivalent inputs
+        cache_key = _plan_cache_key(request, current_user, inventory_items, start_date, snapshot)
+        def run_optimizer():
+            optimizer = _build_optimizer(request, current_user, inventory_items, start_date, snapshot)
+            return _run_optimizer(optimizer, request, current_user)
         
-        session.add(meal_plan)
-        session.commit()
-        session.refresh(meal_plan)
+        cached_result, cache_hit = plan_cache.get_or_compute(cache_key, run_optimizer)
+        optimization_result = _rebase_result(cached_result, request, inventory_items, cache_hit)
         
-        # Create meal plan items
-        meal_items_list = []
-        for item_data in optimization_result['meal_plan_items']:
-            meal_item = MealPlanItem(
-                meal_plan_id=meal_plan.id,
-                day_of_week=item_data['day_of_week'],
-                meal_type=item_data['meal_type'],
-                food_name=item_data['food_name'],
-                quantity=item_data['quantity'],
-                unit=item_data['unit'],
-                estimated_cost=item_data['estimated_cost'],
-                calories=item_data.get('calories'),
-                protein=item_data.get('protein'),
-                carbs=item_data.get('carbs'),
-                fats=item_data.get('fats'),
-                uses_inventory=item_data['uses_inventory'],
-                inventory_item_id=uuid.UUID(item_data['inventory_item_id']) if item_data.get('inventory_item_id') else None,
-                notes=item_data.get('notes')
-            )
-            session.add(meal_item)
-            meal_items_list.append(meal_item)
+        body = _save_optimized_plan(session, current_user.id, request, start_date, optimization_result)
+        return _formatted(body, "meal_items", media_type, response)
         
-        session.commit()
-        
-        # Refresh all items to get IDs
-        for item in meal_items_list:
-            session.refresh(item)
-        
-        # Prepare response
-        meal_plan_response = MealPlanResponse(
-            id=meal_plan.id,
-            name=meal_plan.name,
-            description=meal_plan.description,
-            start_date=meal_plan.start_date,
-            end_date=meal_plan.end_date,
-            target_budget=meal_plan.target_budget,
-            total_cost=meal_plan.total_cost,
-            status=meal_plan.status,
-            created_at=meal_plan.created_at,
-            items_count=len(meal_items_list)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to generate meal plan: {str(e)}"
         )
+
+
+@router.post("/optimize/stream")
+def optimize_meal_plan_stream(
+    request: MealPlanOptimizeRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Annotated[Session, Depends(get_session)]
+):
+    """
+    Generate an optimized meal plan, streaming it as newline-delimited JSON.
+    
+    Emits one `day` frame per planned day with its meals, nutrition and the
+    running total, then a `summary` frame shaped like the /optimize response
+    (saved plan, shopping list, alternatives and nutrition analysis). Failures
+    after the stream has started arrive as an `error` frame.
+    """
+    snapshot = FoodDatabase.snapshot()
+    inventory_items = _load_inventory(session, current_user, snapshot) if request.use_inventory else []
+    start_date = datetime.now().date()
+    cache_key = _plan_cache_key(request, current_user, inventory_items, start_date, snapshot)
+    optimizer = _build_optimizer(request, current_user, inventory_items, start_date, snapshot)
+    household = _household_members(request, current_user) is not None
+    user_id = current_user.id
+    
+    def plan_frames():
+        cached_result = plan_cache.get(cache_key)
+        if cached_result is not None:
+            result = _rebase_result(cached_result, request, inventory_items, cache_hit=True)
+            yield from MealOptimizer.day_frames(result['meal_plan_items'])
+            yield {'type': 'result', 'result': result}
+            return
         
-        return OptimizedMealPlanResponse(
-            meal_plan=meal_plan_response,
-            meal_items=meal_items_list,
-            shopping_list=optimization_result['shopping_list'],
-            total_cost=optimization_result['total_cost'],
-            budget_remaining=optimization_result['budget_remaining'],
-            budget_utilization=optimization_result['budget_utilization'],
-            nutrition_analysis=optimization_result['nutrition_analysis'],
-            alternatives=optimization_result['alternatives'],
-            inventory_usage=optimization_result['inventory_usage']
+        if household:
+            # Household plans are assembled from every group's plan, so days come out at the end
+            result = _run_optimizer(optimizer, request, current_user)
+            frames = itertools.chain(MealOptimizer.day_frames(result['meal_plan_items']),
+                                     [{'type': 'result', 'result': result}])
+        else:
+            frames = optimizer.stream_weekly_plan(**_engine_options(request))
+        for frame in frames:
+            if frame['type'] == 'result':
+                plan_cache.put(cache_key, frame['result'])
+                frame = {'type': 'result', 'result': _rebase_result(frame['result'], request, inventory_items, cache_hit=False)}
+            yield frame
+    
+    def ndjson_stream():
+        try:
+            for frame in plan_frames():
+                if frame['type'] == 'result':
+                    # The request session may already be closed while streaming
+                    with Session(engine) as stream_session:
+                        response = _save_optimized_plan(stream_session, user_id, request, start_date, frame['result'])
+                    frame = {'type': 'summary', **response.model_dump(mode='json')}
+                yield json.dumps(frame) + "\n"
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'detail': f"Failed to generate meal plan: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@router.post("/budget-sweep", response_model=BudgetSweepResponse)
+def budget_sweep(
+    request: BudgetSweepRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Annotated[Session, Depends(get_session)]
+):
+    """
+    Evaluate a list of weekly budgets without saving any plans.
+    
+    Returns cost and nutrition score for every budget, plus the Pareto
+    frontier: the points no other budget beats on both cost and score.
+    """
+    if any(budget < 0 for budget in request.budgets):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Budgets must not be negative"
+        )
+    
+    snapshot = FoodDatabase.snapshot()
+    optimizer = MealOptimizer(
+        budget=request.budgets[0],
+        inventory_items=_load_inventory(session, current_user, snapshot, store_mappings=False) if request.use_inventory else [],
+        dietary_restrictions=current_user.dietary_restrictions,
+        dietary_pref=current_user.dietary_pref,
+        snapshot=snapshot
+    )
+    
+    try:
+        return optimizer.budget_sweep(
+            request.budgets,
+            mode=request.mode,
+            deadline_ms=request.deadline_ms,
+            seed=request.seed,
+            restarts=request.restarts
         )
-        
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate meal plan: {str(e)}"
+            detail=f"Failed to evaluate budgets: {str(e)}"
+        )
+
+
+@router.get("/cache-stats")
+def get_plan_cache_stats(
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Get size and hit/miss counters of the shared plan cache.
+    """
+    return plan_cache.stats()
+
+
+def _day_nutrition(items: Iterable[MealPlanItem]) -> Dict[str, float]:
+    """What a day's saved items already provide."""
+    daily_nutrition = {'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fats': 0.0, 'fiber': 0.0}
+    for item in items:
+        daily_nutrition['calories'] += item.calories or 0
+        daily_nutrition['protein'] += item.protein or 0
+        daily_nutrition['carbs'] += item.carbs or 0
+        daily_nutrition['fats'] += item.fats or 0
+        food_key = item.food_name.lower().replace(' ', '_')
+        daily_nutrition['fiber'] += FoodDatabase.calculate_nutrition(food_key, item.quantity).get('fiber', 0)
+    return daily_nutrition
+
+
+def _food_keys(items: Iterable[MealPlanItem]) -> List[str]:
+    """Catalog names of saved items' foods."""
+    return [item.food_name.lower().replace(' ', '_') for item in items]
+
+
+def _plan_days(meal_plan: MealPlan) -> int:
+    """Number of days a saved plan covers."""
+    start_date = datetime.fromisoformat(meal_plan.start_date).date()
+    end_date = datetime.fromisoformat(meal_plan.end_date).date()
+    return (end_date - start_date).days + 1
+
+
+@router.post("/{plan_id}/regenerate", response_model=MealRegenerateResponse)
+def regenerate_meal(
+    plan_id: uuid.UUID,
+    request: MealRegenerateRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Annotated[Session, Depends(get_session)]
+):
+    """
+    Regenerate a single meal of an existing plan in place.
+    
+    Only the chosen (day, meal type) slot is re-planned, against the day's
+    remaining budget and the nutrition of its other meals. In household plans
+    each group's share of the slot is re-planned for that group alone. The
+    slot's rows are updated in place, the plan total is patched by the cost
+    difference and the stored analysis is recomputed from the plan's items.
+    """
+    statement = select(MealPlan).where(
+        MealPlan.id == plan_id,
+        MealPlan.user_id == current_user.id
+    )
+    meal_plan = session.exec(statement).first()
+    
+    if not meal_plan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Meal plan not found"
+        )
+    
+    days = _plan_days(meal_plan)
+    if request.day_index >= days:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"Day {request.day_index} is outside this {days}-day plan"
+        )
+    
+    items_statement = select(MealPlanItem).where(MealPlanItem.meal_plan_id == plan_id)
+    plan_items = session.exec(items_statement).all()
+    day_items = [item for item in plan_items if item.day_index == request.day_index]
+    slot_items = [item for item in day_items if item.meal_type == request.meal_type]
+    other_items = [item for item in day_items if item.meal_type != request.meal_type]
+    if not slot_items:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {request.meal_type} on day {request.day_index} of this plan"
+        )
+    daily_budget = meal_plan.target_budget / 7
+    
+    snapshot = FoodDatabase.snapshot()
+    optimizer = MealOptimizer(
+        budget=meal_plan.target_budget,
+        inventory_items=_load_inventory(session, current_user, snapshot, store_mappings=False) if request.use_inventory else [],
+        dietary_restrictions=current_user.dietary_restrictions,
+        dietary_pref=current_user.dietary_pref,
+        days=days,
+        snapshot=snapshot
+    )
+    # Stock the rest of the plan already uses is not there to draw again
+    slot_ids = {item.id for item in slot_items}
+    kept_items = [item for item in plan_items if item.id not in slot_ids]
+    optimizer.reserve_inventory([item.model_dump() for item in kept_items])
+    
+    if meal_plan.household:
+        # Every group eats its own meal, re-planned for its restrictions, portions and budget share
+        household = meal_plan.household
+        new_items = []
+        for group_index, group in enumerate(household['groups']):
+            group_other = [item for item in other_items if item.household_group == group_index]
+            new_items.extend(optimizer.regenerate_group_meal(
+                household,
+                group_index,
+                day=request.day_index,
+                meal_type=request.meal_type,
+                remaining_budget=daily_budget * group['portions'] / household['portions']
+                - sum(item.estimated_cost for item in group_other),
+                daily_nutrition=_day_nutrition(group_other),
+                exclude_foods=_food_keys(item for item in slot_items if item.household_group == group_index)
+            ))
+    else:
+        new_items = optimizer.regenerate_meal(
+            day=request.day_index,
+            meal_type=request.meal_type,
+            remaining_budget=daily_budget - sum(item.estimated_cost for item in other_items),
+            daily_nutrition=_day_nutrition(other_items),
+            exclude_foods=_food_keys(slot_items)
+        )
+    
+    # Reuse the slot's rows, then insert or delete only the difference
+    old_cost = sum(item.estimated_cost for item in slot_items)
+    updated_items = []
+    for row, item_data in zip(slot_items, new_items):
+        for field, value in meal_item_fields(item_data).items():
+            setattr(row, field, value)
+        session.add(row)
+        updated_items.append(row)
+    for item_data in new_items[len(slot_items):]:
+        row = MealPlanItem(meal_plan_id=plan_id, **meal_item_fields(item_data))
+        session.add(row)
+        updated_items.append(row)
+    for row in slot_items[len(new_items):]:
+        session.delete(row)
+    
+    new_cost = sum(item['estimated_cost'] for item in new_items)
+    meal_plan.total_cost = round(max(0.0, (meal_plan.total_cost or 0) - old_cost + new_cost), 2)
+    # The stored analysis follows the edit, in the same transaction
+    edited_items = sorted(kept_items + updated_items, key=lambda item: item.day_index)
+    meal_plan.analysis = pack_analysis(
+        optimizer.analyze_plan([item.model_dump() for item in edited_items], meal_plan.household)
+    )
+    meal_plan.updated_at = datetime.now().isoformat()
+    session.add(meal_plan)
+    
+    response = MealRegenerateResponse(
+        meal_plan_id=plan_id,
+        day_index=request.day_index,
+        meal_type=request.meal_type,
+        items=[MealPlanItem.model_validate(row) for row in updated_items],
+        total_cost=meal_plan.total_cost,
+        budget_remaining=round(meal_plan.target_budget - meal_plan.total_cost, 2)
+    )
+    session.commit()
+    
+    return response
+
+
+def _encode_cursor(plan: MealPlan) -> str:
+    """Opaque keyset cursor for the position right after a plan."""
+    payload = json.dumps([plan.created_at, str(plan.id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    """Read a cursor back into (created_at, id), rejecting malformed values."""
+    try:
+        created_at, plan_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), uuid.UUID(plan_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
 
 
@@ -188,23 +683,52 @@ def optimize_meal_plan(
 def get_meal_plans(
     current_user: Annotated[User, Depends(get_current_user)],
     session: Annotated[Session, Depends(get_session)],
-    status_filter: Optional[str] = None
+    response: Response,
+    status_filter: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=100),
+    cursor: Optional[str] = None
 ):
-    """Get all meal plans for the current user."""
-    statement = select(MealPlan).where(MealPlan.user_id == current_user.id)
+    """
+    Get the current user's meal plans, newest first.
+    
+    Item counts come from one grouped aggregate joined to the plans. Pass
+    `limit` to page through the plans; when more remain, the `X-Next-Cursor`
+    response header holds the `cursor` for the next page.
+    """
+    item_counts = (
+        select(MealPlanItem.meal_plan_id, func.count().label("items_count"))
+        .group_by(MealPlanItem.meal_plan_id)
+        .subquery()
+    )
+    statement = (
+        select(MealPlan, func.coalesce(item_counts.c.items_count, 0))
+        .outerjoin(item_counts, item_counts.c.meal_plan_id == MealPlan.id)
+        .where(MealPlan.user_id == current_user.id)
+        .options(defer(MealPlan.analysis))
+        .order_by(MealPlan.created_at.desc(), MealPlan.id.desc())
+    )
     
     if status_filter:
         statement = statement.where(MealPlan.status == status_filter)
     
-    meal_plans = session.exec(statement).all()
+    if cursor:
+        created_at, plan_id = _decode_cursor(cursor)
+        statement = statement.where(or_(
+            MealPlan.created_at < created_at,
+            and_(MealPlan.created_at == created_at, MealPlan.id < plan_id)
+        ))
     
-    # Get item counts for each meal plan
-    response_plans = []
-    for plan in meal_plans:
-        items_statement = select(MealPlanItem).where(MealPlanItem.meal_plan_id == plan.id)
-        items_count = len(session.exec(items_statement).all())
-        
-        response_plans.append(MealPlanResponse(
+    if limit:
+        # One extra row tells whether another page follows
+        statement = statement.limit(limit + 1)
+    
+    rows = session.exec(statement).all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1][0])
+    
+    return [
+        MealPlanResponse(
             id=plan.id,
             name=plan.name,
             description=plan.description,
@@ -215,35 +739,54 @@ def get_meal_plans(
             status=plan.status,
             created_at=plan.created_at,
             items_count=items_count
-        ))
-    
-    return response_plans
+        )
+        for plan, items_count in rows
+    ]
 
 
 @router.get("/{plan_id}", response_model=MealPlanDetailResponse)
 def get_meal_plan(
     plan_id: uuid.UUID,
     current_user: Annotated[User, Depends(get_current_user)],
-    session: Annotated[Session, Depends(get_session)]
+    session: Annotated[Session, Depends(get_session)],
+    response: Response,
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None
 ):
-    """Get a specific meal plan with all items."""
-    statement = select(MealPlan).where(
+    """
+    Get a specific meal plan with all items and the analysis saved with it.
+    
+    Send `Accept: application/vnd.mealplan.columnar+json` or `application/msgpack`
+    to receive `items` as one array per field. Responses carry a strong ETag that
+    changes with the plan; a matching `If-None-Match` gets 304 without loading items.
+    """
+    media_type = _response_format(accept)
+    
+    # Only the version columns are read until we know the client's copy is stale
+    version_statement = select(MealPlan.updated_at, MealPlan.created_at).where(
         MealPlan.id == plan_id,
         MealPlan.user_id == current_user.id
     )
-    meal_plan = session.exec(statement).first()
+    version = session.exec(version_statement).first()
     
-    if not meal_plan:
+    if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Meal plan not found"
         )
     
+    etag = _etag(plan_id, version[0] or version[1], media_type)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    
+    meal_plan = session.get(MealPlan, plan_id)
+    
     # Get meal plan items
     items_statement = select(MealPlanItem).where(MealPlanItem.meal_plan_id == plan_id)
     items = session.exec(items_statement).all()
     
-    return MealPlanDetailResponse(
+    body = MealPlanDetailResponse(
         id=meal_plan.id,
         name=meal_plan.name,
         description=meal_plan.description,
@@ -254,8 +797,11 @@ def get_meal_plan(
         status=meal_plan.status,
         created_at=meal_plan.created_at,
         items_count=len(items),
-        items=list(items)
+        items=list(items),
+        household=meal_plan.household,
+        **(unpack_analysis(meal_plan.analysis) or {})
     )
+    return _formatted(body, "items", media_type, response)
 
 
 @router.put("/{plan_id}/status")
@@ -285,6 +831,7 @@ def update_meal_plan_status(
         )
     
     meal_plan.status = status
+    meal_plan.updated_at = datetime.now().isoformat()
     session.add(meal_plan)
     session.commit()
     session.refresh(meal_plan)
@@ -299,64 +846,139 @@ def delete_meal_plan(
     session: Annotated[Session, Depends(get_session)]
 ):
     """Delete a meal plan and all its items."""
-    statement = select(MealPlan).where(
+    deleted = delete_meal_plans(
+        session,
         MealPlan.id == plan_id,
         MealPlan.user_id == current_user.id
     )
-    meal_plan = session.exec(statement).first()
     
-    if not meal_plan:
+    if not deleted:
+        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Meal plan not found"
         )
     
-    # Delete meal plan items first
-    items_statement = select(MealPlanItem).where(MealPlanItem.meal_plan_id == plan_id)
-    items = session.exec(items_statement).all()
-    for item in items:
-        session.delete(item)
-    
-    # Delete meal plan
-    session.delete(meal_plan)
     session.commit()
     
     return None
 
 
+@router.post("/retention")
+def apply_meal_plan_retention(
+    request: MealPlanRetentionRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    session: Annotated[Session, Depends(get_session)]
+):
+    """
+    Archive or delete the current user's plans older than a number of days.
+    
+    Runs as set-based statements, so no plans or items are loaded.
+    """
+    cutoff = (datetime.now() - timedelta(days=request.older_than_days)).isoformat()
+    conditions = [MealPlan.user_id == current_user.id, MealPlan.created_at < cutoff]
+    if request.status_filter:
+        conditions.append(MealPlan.status == request.status_filter)
+    
+    if request.action == "delete":
+        affected = delete_meal_plans(session, *conditions)
+    else:
+        affected = archive_meal_plans(session, *conditions)
+    session.commit()
+    
+    return {"action": request.action, "affected": affected, "cutoff": cutoff}
+
+
 @router.get("/food-database/search")
 def search_food_database(
     query: str,
-    category: Optional[str] = None
+    response: Response,
+    category: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    if_none_match: Annotated[str | None, Header()] = None
 ):
-    """Search the food database for available foods."""
-    foods = []
+    """
+    Search the food database for available foods.
     
-    for name, data in FoodDatabase.FOODS.items():
-        # Filter by category if specified
-        if category and data['category'] != category:
-            continue
-        
-        # Filter by search query
-        if query.lower() in name.lower():
-            foods.append({
-                'name': name.replace('_', ' ').title(),
-                'category': data['category'],
-                'cost_per_100g': data['cost_per_100g'],
-                'calories': data['calories'],
-                'protein': data['protein'],
-                'serving_size': data['serving_size'],
-                'unit': data['unit']
-            })
+    Results are ranked by how well each food name matches the query, tolerate
+    small typos and come with per-category match counts. They only change with
+    the catalog, so they carry an ETag derived from the catalog version and may
+    be cached by clients.
+    """
+    snapshot = FoodDatabase.snapshot()
+    etag = _etag("food-search", snapshot.tag, query, category, limit, offset)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, CATALOG_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
     
-    return foods
+    return snapshot.get_search_index().search(query, category=category, limit=limit, offset=offset)
 
 
 @router.get("/food-database/categories")
-def get_food_categories():
+def get_food_categories(
+    response: Response,
+    if_none_match: Annotated[str | None, Header()] = None
+):
     """Get all food categories."""
-    categories = set()
-    for data in FoodDatabase.FOODS.values():
-        categories.add(data['category'])
+    snapshot = FoodDatabase.snapshot()
+    etag = _etag("food-categories", snapshot.tag)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag, CATALOG_CACHE_CONTROL)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+    
+    return sorted(snapshot.get_compatibility_index().category_masks)
+
+
+@router.get("/food-database/version")
+def get_food_database_version():
+    """Get the version of the catalog currently used for planning."""
+    snapshot = FoodDatabase.snapshot()
+    return {
+        "version": snapshot.version,
+        "tag": snapshot.tag,
+        "foods": len(snapshot.FOODS),
+        "reload_pending": FoodDatabase.reload_pending()
+    }
+
+
+@router.put("/food-database/prices", status_code=status.HTTP_202_ACCEPTED)
+def update_food_prices(
+    request: FoodPriceUpdateRequest,
+    current_user: Annotated[User, Depends(get_current_user)]
+):
+    """
+    Update food prices without a restart.
+    
+    The new catalog and its indexes are built in the background and swapped in
+    once ready; plans already being optimized finish on the catalog they started with.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can update food prices"
+        )
+    
+    prices = {name.strip().lower().replace(' ', '_'): price for name, price in request.prices.items()}
+    try:
+        FoodDatabase.update_prices(prices)
+    except KeyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"Unknown foods: {e.args[0]}"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=str(e)
+        )
     
-    return sorted(list(categories))
+    snapshot = FoodDatabase.snapshot()
+    return {
+        "updated": len(prices),
+        "version": snapshot.version,
+        "tag": snapshot.tag,
+        "reload_pending": FoodDatabase.reload_pending()
+    }
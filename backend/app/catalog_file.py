@@ -0,0 +1,343 @@
+"""
+Binary Food Catalog Files
+Compiles nutrient datasets into a memory-mapped file of fixed-width records
+
+Layout (little-endian, sections aligned to 8 bytes):
+    magic       8 bytes, b"FOODCAT\\0"
+    format      uint32, FORMAT_VERSION
+    header_len  uint32, length of the JSON header that follows
+    header      JSON: version, food count, field schema, text labels, section offsets
+    records     one fixed-width record per food id: name offset and length into
+                the string table, then each field (text fields as label codes)
+    strings     UTF-8 food names, back to back
+    name index  food ids sorted by name bytes, for binary search
+
+Opening a file maps it read-only and parses only the JSON header; records,
+names and the index are views of the mapping, so every process serving the same
+file shares its pages through the OS page cache and opening costs the same for
+any catalog size.
+"""
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from app.food_catalog import FoodCatalog, FoodIds
+
+
+MAGIC = b"FOODCAT\0"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII")
+
+# Fields every food needs; datasets may add more numeric nutrient columns
+REQUIRED_FIELDS = (
+    'category', 'cost_per_100g', 'calories', 'protein', 'carbs', 'fats', 'fiber', 'serving_size', 'unit'
+)
+TEXT_FIELDS = ('category', 'unit')
+# Optional 0/1 columns marking foods that dietary restrictions rule out
+DIETARY_FLAGS = ('meat', 'animal_product', 'gluten')
+_FLAG_VALUES = {'': 0, '0': 0, 'false': 0, 'no': 0, '1': 1, 'true': 1, 'yes': 1}
+
+
+class CatalogFileError(Exception):
+    """Raised for datasets that cannot be compiled and files that cannot be opened."""
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def normalize_name(name: str) -> str:
+    """Catalog key for a dataset food name: lower case, words joined by underscores."""
+    return '_'.join(name.strip().lower().split())
+
+
+def _parse_number(value: Any) -> Any:
+    """Number in a dataset cell; empty cells of optional columns read as 0."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    text = '' if value is None else str(value).strip()
+    if not text:
+        return 0
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+
+def _parse_flag(value: Any) -> int:
+    if isinstance(value, (bool, int)) and value in (0, 1):
+        return int(value)
+    flag = _FLAG_VALUES.get(str(value).strip().lower()) if value is not None else 0
+    if flag is None:
+        raise ValueError(value)
+    return flag
+
+
+def read_dataset(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load a nutrient dataset in the FOODS layout.
+
+    CSV files need a 'name' column plus one column per field. JSON files hold
+    either a name -> record object or a list of records with a 'name' key.
+    Dietary flag columns (meat, animal_product, gluten) take 0/1, true/false or
+    yes/no. Required fields must be filled in; an empty or left-out value of any
+    other column reads as 0, so sparse datasets load as long as every value
+    given is well formed.
+
+    Args:
+        path: .csv or .json dataset
+
+    Returns:
+        Foods keyed by normalized name, in file order
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            rows = [{'name': name, **record} for name, record in data.items()]
+        else:
+            rows = data
+    elif path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        raise CatalogFileError(f"Unsupported dataset type: {path} (expected .csv or .json)")
+
+    foods = {}
+    for line, row in enumerate(rows, start=1):
+        missing = [field for field in ('name',) + REQUIRED_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            raise CatalogFileError(f"Food {line} is missing {', '.join(missing)}")
+        if None in row:
+            raise CatalogFileError(f"Food {line} has more values than the dataset has columns")
+        record = {}
+        for field, value in row.items():
+            if field == 'name':
+                continue
+            if field in TEXT_FIELDS:
+                record[field] = str(value).strip()
+            elif field in DIETARY_FLAGS:
+                try:
+                    record[field] = _parse_flag(value)
+                except ValueError:
+                    raise CatalogFileError(
+                        f"Food {line} has {field}={value!r}; use 0/1, true/false or yes/no"
+                    ) from None
+            else:
+                try:
+                    record[field] = _parse_number(value)
+                except ValueError:
+                    raise CatalogFileError(f"Food {line} has a non-numeric {field}: {value!r}") from None
+        record['category'] = record['category'].lower()
+        foods[normalize_name(str(row['name']))] = record
+
+    # Optional columns some foods leave out are 0 for them, like empty cells
+    fields = dict.fromkeys(field for record in foods.values() for field in record)
+    for record in foods.values():
+        for field in fields:
+            record.setdefault(field, 0)
+    return foods
+
+
+def write_catalog(foods, path: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compile a catalog into a binary file, replacing any file at path atomically.
+
+    Args:
+        foods: FoodCatalog or name -> record mapping
+        path: Output file
+        version: Catalog version label; a digest of the contents when not given
+
+    Returns:
+        The file header
+    """
+    catalog = FoodCatalog.from_foods(foods)
+    names = [name.encode('utf-8') for name in catalog.names]
+    n_foods = len(names)
+
+    name_lengths = np.array([len(name) for name in names], dtype=np.uint64)
+    name_offsets = np.concatenate([[0], np.cumsum(name_lengths)[:-1]]).astype(np.uint64) if n_foods else name_lengths
+    strings = b''.join(names)
+    name_index = np.array(sorted(range(n_foods), key=names.__getitem__), dtype='<u4')
+
+    fields = [('name_offset', '<u8'), ('name_length', '<u4')]
+    schema = []
+    for field in catalog.fields:
+        column = catalog.column(field)
+        dtype = column.dtype.newbyteorder('<').str
+        fields.append((field, dtype))
+        schema.append({'name': field, 'dtype': dtype, 'labels': catalog.labels(field)})
+    record_dtype = np.dtype(fields)
+    records = np.zeros(n_foods, dtype=record_dtype)
+    records['name_offset'] = name_offsets
+    records['name_length'] = name_lengths
+    for field in catalog.fields:
+        records[field] = catalog.column(field)
+
+    if version is None:
+        digest = hashlib.sha1(records.tobytes())
+        digest.update(strings)
+        version = digest.hexdigest()[:16]
+
+    # Offsets depend on the header length, which depends on the offsets
+    header = {
+        'version': version,
+        'created_at': datetime.now().isoformat(),
+        'foods': n_foods,
+        'fields': schema,
+        'record_size': record_dtype.itemsize,
+        'records_offset': 0,
+        'strings_offset': 0,
+        'strings_length': len(strings),
+        'index_offset': 0,
+    }
+    while True:
+        header_bytes = json.dumps(header, separators=(',', ':')).encode()
+        records_offset = _align(_PREAMBLE.size + len(header_bytes))
+        strings_offset = records_offset + records.nbytes
+        index_offset = _align(strings_offset + len(strings))
+        if (header['records_offset'], header['strings_offset'], header['index_offset']) == (
+                records_offset, strings_offset, index_offset):
+            break
+        header.update(records_offset=records_offset, strings_offset=strings_offset, index_offset=index_offset)
+
+    temporary = f"{path}.tmp-{os.getpid()}"
+    with open(temporary, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\0' * (records_offset - f.tell()))
+        f.write(records.tobytes())
+        f.write(strings)
+        f.write(b'\0' * (index_offset - f.tell()))
+        f.write(name_index.tobytes())
+    os.replace(temporary, path)
+    return header
+
+
+class _NameTable(Sequence):
+    """Food names decoded on demand from the mapped string table."""
+
+    def __init__(self, data: mmap.mmap, strings_offset: int, offsets: np.ndarray, lengths: np.ndarray):
+        self._data = data
+        self._strings_offset = strings_offset
+        self._offsets = offsets
+        self._lengths = lengths
+
+    def encoded(self, food_id: int) -> bytes:
+        start = self._strings_offset + int(self._offsets[food_id])
+        return self._data[start:start + int(self._lengths[food_id])]
+
+    def __getitem__(self, food_id):
+        if isinstance(food_id, slice):
+            return [self[i] for i in range(*food_id.indices(len(self)))]
+        if food_id < 0:
+            food_id += len(self)
+        if not 0 <= food_id < len(self):
+            raise IndexError(food_id)
+        return self.encoded(food_id).decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for food_id in range(len(self)):
+            yield self.encoded(food_id).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+
+class MappedFoodCatalog(FoodCatalog):
+    """FoodCatalog whose columns, names and name index are views of a memory-mapped file."""
+
+    def __init__(self, path: str):
+        """
+        Open a compiled catalog file.
+
+        Args:
+            path: File written by write_catalog
+        """
+        with open(path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise CatalogFileError(f"{path} is not a food catalog file") from e
+        if len(data) < _PREAMBLE.size:
+            raise CatalogFileError(f"{path} is not a food catalog file")
+        magic, format_version, header_length = _PREAMBLE.unpack_from(data)
+        if magic != MAGIC:
+            raise CatalogFileError(f"{path} is not a food catalog file")
+        if format_version != FORMAT_VERSION:
+            raise CatalogFileError(
+                f"{path} uses catalog format {format_version}; this build reads {FORMAT_VERSION}"
+            )
+        header = json.loads(data[_PREAMBLE.size:_PREAMBLE.size + header_length])
+
+        self.path = path
+        self.header = header
+        self.version = header['version']
+        self._data = data
+        n_foods = header['foods']
+
+        record_dtype = np.dtype(
+            [('name_offset', '<u8'), ('name_length', '<u4')]
+            + [(field['name'], field['dtype']) for field in header['fields']]
+        )
+        if record_dtype.itemsize != header['record_size']:
+            raise CatalogFileError(f"{path} has a corrupt record schema")
+        if header['index_offset'] + 4 * n_foods > len(data):
+            raise CatalogFileError(f"{path} is truncated")
+        self._records = np.frombuffer(data, dtype=record_dtype, count=n_foods, offset=header['records_offset'])
+        self._name_index = np.frombuffer(data, dtype='<u4', count=n_foods, offset=header['index_offset'])
+
+        self.names = _NameTable(
+            data, header['strings_offset'], self._records['name_offset'], self._records['name_length']
+        )
+        self.fields = tuple(field['name'] for field in header['fields'])
+        self._columns = {field: self._records[field] for field in self.fields}
+        self._labels = {
+            field['name']: field['labels'] for field in header['fields'] if field['labels'] is not None
+        }
+        # Only names looked up so far, so this grows with use rather than catalog size
+        self._found: Dict[str, int] = {}
+        # The version label stands in for a content digest, which would read every page
+        self._digest = self.version
+
+    @property
+    def ids(self) -> FoodIds:
+        """Name -> id view that searches the name index per lookup rather than decoding every name."""
+        return FoodIds(self)
+
+    def food_id(self, name: str) -> Optional[int]:
+        """Binary search of the sorted name index, remembering names already found."""
+        food_id = self._found.get(name)
+        if food_id is None:
+            food_id = self._search(name)
+            if food_id is not None:
+                self._found[name] = food_id
+        return food_id
+
+    def _search(self, name: str) -> Optional[int]:
+        key = name.encode('utf-8')
+        index = self._name_index
+        lo, hi = 0, len(index)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.names.encoded(int(index[mid])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(index):
+            food_id = int(index[lo])
+            if self.names.encoded(food_id) == key:
+                return food_id
+        return None
+
+
+def open_catalog(path: str) -> MappedFoodCatalog:
+    """Open a compiled catalog file without reading its records."""
+    return MappedFoodCatalog(path)
@@ -0,0 +1,217 @@
+"""
+Compact Food Catalog
+Struct-of-arrays storage for the food catalog behind a read-only mapping façade
+"""
+import hashlib
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+class FoodRecord(Mapping):
+    """Read-only dict-like view of one catalog row; holds no values of its own."""
+
+    __slots__ = ('_catalog', 'id')
+
+    def __init__(self, catalog: 'FoodCatalog', food_id: int):
+        self._catalog = catalog
+        self.id = food_id
+
+    @property
+    def name(self) -> str:
+        return self._catalog.names[self.id]
+
+    def __getitem__(self, field: str) -> Any:
+        return self._catalog.value(self.id, field)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._catalog.fields)
+
+    def __len__(self) -> int:
+        return len(self._catalog.fields)
+
+    def __repr__(self) -> str:
+        return f"FoodRecord({self.name!r}, {dict(self)!r})"
+
+
+class FoodIds(Mapping):
+    """Name -> food id view of a catalog that looks each name up on demand instead of holding them all."""
+
+    __slots__ = ('_catalog',)
+
+    def __init__(self, catalog: 'FoodCatalog'):
+        self._catalog = catalog
+
+    def __getitem__(self, name: str) -> int:
+        food_id = self._catalog.food_id(name)
+        if food_id is None:
+            raise KeyError(name)
+        return food_id
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._catalog
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._catalog.names)
+
+    def __len__(self) -> int:
+        return len(self._catalog)
+
+
+class FoodCatalog(Mapping):
+    """
+    Food catalog stored as one typed array per field, keyed by integer food id.
+
+    Numeric fields are int32/int64 arrays when every value is a whole number
+    and float64 arrays otherwise; text fields such as category and unit are
+    small integer codes into a label list. Looking a food up by name returns a
+    FoodRecord view, so code written against the old dict-of-dicts keeps working.
+    """
+
+    def __init__(self, names: List[str], columns: Dict[str, np.ndarray], labels: Dict[str, List[str]]):
+        """
+        Wrap prepared columns; use from_foods to build a catalog from dicts.
+
+        Args:
+            names: Food names, indexed by food id
+            columns: Array per field, one entry per food
+            labels: Label list per text field, indexed by the field's codes
+        """
+        self.names = names
+        self.ids = {name: food_id for food_id, name in enumerate(names)}
+        self.fields = tuple(columns)
+        self._columns = columns
+        self._labels = labels
+        self._digest: Optional[str] = None
+        for column in columns.values():
+            column.setflags(write=False)
+
+    @classmethod
+    def from_foods(cls, foods: Mapping) -> 'FoodCatalog':
+        """
+        Build a catalog from a name -> {field: value} mapping.
+
+        Every food needs the fields of the first one.
+
+        Args:
+            foods: Catalog in the dict-of-dicts layout of FoodDatabase.FOODS
+
+        Returns:
+            The compact catalog (foods itself if it already is one)
+        """
+        if isinstance(foods, FoodCatalog):
+            return foods
+
+        names = list(foods)
+        records = list(foods.values())
+        fields = list(records[0]) if records else []
+        columns: Dict[str, np.ndarray] = {}
+        labels: Dict[str, List[str]] = {}
+        for field in fields:
+            try:
+                values = [record[field] for record in records]
+            except KeyError as e:
+                raise ValueError(f"Every food needs the field {field!r}") from e
+
+            if all(isinstance(value, str) for value in values):
+                labels[field], codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+                labels[field] = labels[field].tolist()
+                columns[field] = codes.astype(np.min_scalar_type(max(len(labels[field]) - 1, 0)))
+            elif all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+                column = np.array(values, dtype=np.int64)
+                if column.size == 0 or np.abs(column).max() < 2 ** 31:
+                    column = column.astype(np.int32)
+                columns[field] = column
+            else:
+                columns[field] = np.array(values, dtype=np.float64)
+        return cls(names, columns, labels)
+
+    def value(self, food_id: int, field: str) -> Any:
+        """Value of one field for one food, as a plain Python object."""
+        column = self._columns[field]
+        labels = self._labels.get(field)
+        if labels is not None:
+            return labels[column[food_id]]
+        return column[food_id].item()
+
+    def column(self, field: str) -> np.ndarray:
+        """Read-only array of a field for every food; codes into labels(field) for text fields."""
+        return self._columns[field]
+
+    def labels(self, field: str) -> Optional[List[str]]:
+        """Labels of a text field's codes, or None for numeric fields."""
+        return self._labels.get(field)
+
+    def text_column(self, field: str) -> np.ndarray:
+        """Values of a text field for every food, as an array of strings."""
+        return np.array(self._labels[field], dtype=object)[self._columns[field]]
+
+    def food_id(self, name: str) -> Optional[int]:
+        """Integer id of a food, or None if it is not in the catalog."""
+        return self.ids.get(name)
+
+    def record(self, food_id: int) -> FoodRecord:
+        """View of the food with this id."""
+        return FoodRecord(self, food_id)
+
+    def with_values(self, field: str, values: Dict[str, Any]) -> 'FoodCatalog':
+        """
+        Copy of the catalog with some foods' values of one numeric field replaced.
+
+        Only that field's column is copied; every other column is shared with
+        this catalog, which stays unchanged.
+
+        Args:
+            field: Numeric field such as cost_per_100g
+            values: New value per food name
+
+        Returns:
+            The new catalog
+        """
+        if field not in self._columns or field in self._labels:
+            raise ValueError(f"{field!r} is not a numeric catalog field")
+        ids = []
+        for name in values:
+            food_id = self.food_id(name)
+            if food_id is None:
+                raise KeyError(name)
+            ids.append(food_id)
+
+        column = self._columns[field]
+        if column.dtype.kind == 'i' and not all(float(value).is_integer() for value in values.values()):
+            column = column.astype(np.float64)
+        else:
+            column = column.copy()
+        column[ids] = list(values.values())
+        return FoodCatalog(list(self.names), {**self._columns, field: column}, self._labels)
+
+    def digest(self) -> str:
+        """Digest of the catalog contents, computed on first use."""
+        if self._digest is None:
+            digest = hashlib.sha1('\0'.join(self.names).encode())
+            for field in self.fields:
+                digest.update(field.encode())
+                digest.update(repr(self._labels.get(field)).encode())
+                digest.update(np.ascontiguousarray(self._columns[field]).tobytes())
+            self._digest = digest.hexdigest()[:16]
+        return self._digest
+
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays."""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def __getitem__(self, name: str) -> FoodRecord:
+        food_id = self.food_id(name)
+        if food_id is None:
+            raise KeyError(name)
+        return FoodRecord(self, food_id)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self.food_id(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
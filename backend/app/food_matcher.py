@@ -0,0 +1,256 @@
+"""
+Inventory Name Matching
+Resolves free-text inventory item names to catalog foods
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.food_catalog import FoodCatalog
+from app.food_search import FoodSearchIndex
+from app.models import FoodNameMapping
+
+
+# Everyday names of catalog foods that share no words with the catalog name
+SYNONYMS: Dict[str, List[str]] = {
+    'chicken_breast': ['chicken'],
+    'ground_beef': ['beef', 'beef mince', 'minced beef', 'mince'],
+    'brown_rice': ['rice'],
+    'whole_wheat_bread': ['bread', 'loaf'],
+    'oatmeal': ['oats', 'rolled oats', 'porridge'],
+    'pasta': ['spaghetti', 'macaroni', 'penne', 'noodles'],
+    'bell_peppers': ['capsicum', 'peppers'],
+    'berries': ['strawberries', 'blueberries', 'raspberries'],
+    'greek_yogurt': ['yogurt', 'yoghurt', 'curd', 'doi'],
+    'cheese': ['cheddar', 'mozzarella'],
+    'nuts_almonds': ['almonds', 'nuts'],
+}
+
+# Words that describe a product rather than name the food
+QUALIFIERS = frozenset({
+    'fresh', 'organic', 'frozen', 'raw', 'boneless', 'skinless', 'whole', 'large', 'small',
+    'medium', 'pack', 'packet', 'bag', 'box', 'can', 'canned', 'of', 'and', 'the', 'a',
+    'kg', 'g', 'gm', 'lb', 'lbs', 'ml', 'l', 'litre', 'liter', 'pc', 'pcs', 'piece', 'bunch',
+    'fillet', 'leaf', 'leave', 'slice', 'sliced', 'chopped', 'diced',
+})
+
+
+class FoodNameMatcher:
+    """
+    Token and trigram index over catalog names and their synonyms.
+
+    Names are compared as sets of singular, lower-case words without
+    qualifiers, so "Chicken Breast (boneless)", "Apples" and "Rice" resolve to
+    chicken_breast, apple and brown_rice. Words not in the vocabulary may
+    still match a close spelling through shared trigrams.
+    """
+
+    # Dice similarity of the word sets a name needs to match a catalog phrase
+    MATCH_THRESHOLD = 0.6
+    # Trigram Jaccard similarity for a misspelled word, and the credit it earns
+    FUZZY_THRESHOLD = 0.5
+    FUZZY_CREDIT = 0.8
+
+    def __init__(self, foods: FoodCatalog, synonyms: Dict[str, List[str]] = SYNONYMS):
+        """
+        Build the index.
+
+        Args:
+            foods: Catalog as stored in FoodDatabase.FOODS
+            synonyms: Extra names per catalog food; foods missing from the catalog are skipped
+        """
+        self.foods = foods
+        # Persisted matches are only trusted for the catalog they were made against
+        self.catalog_version = foods.digest()
+
+        # Phrase -> food; catalog names first, so they win over a synonym
+        self.phrases: Dict[str, str] = {}
+        for name in foods:
+            self.phrases.setdefault(self.key(name), name)
+        for name, aliases in synonyms.items():
+            if name in foods:
+                for alias in aliases:
+                    self.phrases.setdefault(self.key(alias), name)
+        self.phrases.pop('', None)
+
+        self.phrase_tokens = {phrase: phrase.split() for phrase in self.phrases}
+        self.token_phrases: Dict[str, List[str]] = defaultdict(list)
+        for phrase, tokens in self.phrase_tokens.items():
+            for token in set(tokens):
+                self.token_phrases[token].append(phrase)
+
+        self.trigram_tokens: Dict[str, List[str]] = defaultdict(list)
+        for token in self.token_phrases:
+            for gram in FoodSearchIndex.trigrams(token):
+                self.trigram_tokens[gram].append(token)
+
+        self._matches: Dict[str, Optional[Tuple[str, float]]] = {}
+
+    @staticmethod
+    def singularize(word: str) -> str:
+        """Singular form of a plural English word, by suffix rules."""
+        if len(word) > 4 and word.endswith('ies'):
+            return word[:-3] + 'y'
+        if word.endswith(('ches', 'shes', 'sses', 'xes', 'oes')):
+            return word[:-2]
+        if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+            return word[:-1]
+        return word
+
+    @classmethod
+    def tokens(cls, name: str) -> List[str]:
+        """
+        Distinct words that identify the food in a name.
+
+        Text in brackets and after the first comma is a description, so it is
+        dropped along with qualifiers and quantities.
+        """
+        text = re.sub(r'\([^)]*\)|\[[^\]]*\]', ' ', name.lower()).split(',')[0]
+        words = []
+        for word in re.split(r'[^a-z0-9]+', text):
+            if not word or any(char.isdigit() for char in word):
+                continue
+            word = cls.singularize(word)
+            if word not in QUALIFIERS and word not in words:
+                words.append(word)
+        return words
+
+    @classmethod
+    def key(cls, name: str) -> str:
+        """Canonical form of a name; names with the same key always match the same food."""
+        return ' '.join(cls.tokens(name))
+
+    def _similar_tokens(self, word: str) -> Dict[str, float]:
+        """Vocabulary words a query word matches, with the credit each earns."""
+        if word in self.token_phrases:
+            return {word: 1.0}
+        if len(word) < 4:
+            return {}
+        grams = FoodSearchIndex.trigrams(word)
+        overlap: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for token in self.trigram_tokens.get(gram, ()):
+                overlap[token] += 1
+        return {
+            token: self.FUZZY_CREDIT
+            for token, shared in overlap.items()
+            if shared / (len(grams) + len(FoodSearchIndex.trigrams(token)) - shared) >= self.FUZZY_THRESHOLD
+        }
+
+    def match(self, name: str) -> Optional[Tuple[str, float]]:
+        """
+        Find the catalog food an inventory item name refers to.
+
+        The last word of a name is taken as the food itself ("Basmati Rice" is
+        rice), so a matching phrase has to contain it.
+
+        Args:
+            name: Item name as entered by the user
+
+        Returns:
+            (food name, similarity in (0, 1]) or None if nothing is close enough
+        """
+        key = self.key(name)
+        if key in self._matches:
+            return self._matches[key]
+
+        match = None
+        if key in self.phrases:
+            match = (self.phrases[key], 1.0)
+        elif key:
+            words = key.split()
+            credit: Dict[str, Dict[int, float]] = defaultdict(dict)
+            for position, word in enumerate(words):
+                for token, weight in self._similar_tokens(word).items():
+                    for phrase in self.token_phrases[token]:
+                        credit[phrase][position] = max(credit[phrase].get(position, 0.0), weight)
+
+            best = None
+            head = len(words) - 1
+            for phrase, matched in credit.items():
+                if head not in matched:
+                    continue
+                score = 2 * sum(matched.values()) / (len(words) + len(self.phrase_tokens[phrase]))
+                # Higher score, then the catalog name over a synonym, then alphabetical
+                rank = (-score, self.key(self.phrases[phrase]) != phrase, self.phrases[phrase])
+                if score >= self.MATCH_THRESHOLD and (best is None or rank < best[0]):
+                    best = (rank, (self.phrases[phrase], round(score, 3)))
+            match = best[1] if best else None
+
+        self._matches[key] = match
+        return match
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Catalog food for an inventory item name, or None."""
+        match = self.match(name)
+        return match[0] if match else None
+
+
+def resolve_names(session: Session,
+                  matcher: FoodNameMatcher,
+                  names: Iterable[str],
+                  store: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Resolve inventory item names through the persistent mapping table.
+
+    Names already mapped are read in one query; the rest are matched and
+    stored, so every distinct name is matched once across workers and restarts.
+    Unmatched names are remembered only for the catalog version they were tried
+    against, since a later catalog may add the food.
+
+    Args:
+        session: Database session; new mappings are committed
+        matcher: Matcher for the catalog snapshot in use
+        names: Item names as entered by users
+        store: Whether to store new mappings; without it the session is only read,
+            for requests that must not commit it
+
+    Returns:
+        Catalog food (or None) per name
+    """
+    keys = {name: matcher.key(name) for name in names}
+    examples = {key: name for name, key in keys.items()}
+    rows = {
+        row.item_key: row
+        for row in session.exec(
+            select(FoodNameMapping).where(FoodNameMapping.item_key.in_(list(examples)))
+        ).all()
+    }
+
+    resolved: Dict[str, Optional[str]] = {}
+    changed = []
+    resolved_at = datetime.now().isoformat()
+    for key, name in examples.items():
+        row = rows.get(key)
+        if row is not None and (
+            row.food_name in matcher.foods
+            or (row.food_name is None and row.catalog_version == matcher.catalog_version)
+        ):
+            resolved[key] = row.food_name
+            continue
+
+        food_name, score = matcher.match(name) or (None, 0.0)
+        resolved[key] = food_name
+        if not store:
+            continue
+        if row is None:
+            row = FoodNameMapping(item_key=key)
+        row.food_name = food_name
+        row.score = score
+        row.catalog_version = matcher.catalog_version
+        row.resolved_at = resolved_at
+        changed.append(row)
+
+    if changed:
+        try:
+            session.add_all(changed)
+            session.commit()
+        except IntegrityError:
+            # Another worker stored the same names first; its mappings are equivalent
+            session.rollback()
+
+    return {name: resolved[key] for name, key in keys.items()}
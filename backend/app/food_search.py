@@ -0,0 +1,240 @@
+"""
+Food Catalog Search
+In-memory token, prefix and trigram index over the food catalog
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.food_catalog import FoodCatalog
+
+
+class FoodSearchIndex:
+    """Ranked, faceted search over catalog food names."""
+
+    # Per query term: whole-token match > token prefix > inside a token > trigram look-alike
+    EXACT_SCORE = 3.0
+    PREFIX_SCORE = 2.0
+    SUBSTRING_SCORE = 1.0
+    # Bonuses for the query spelling out the whole name, or matching its first word
+    NAME_SCORE = 2.0
+    LEADING_SCORE = 0.5
+    # Trigram Jaccard similarity a misspelled term needs to match a token
+    FUZZY_THRESHOLD = 0.35
+
+    def __init__(self, foods: FoodCatalog):
+        """
+        Build the index.
+
+        Args:
+            foods: Catalog as stored in FoodDatabase.FOODS
+        """
+        self.foods = foods
+        self.names = list(foods.keys())
+        n_foods = len(self.names)
+
+        # Catalog category labels are sorted, so their codes serve as facet codes
+        self.category_names = foods.labels('category')
+        self.category_codes = foods.column('category').astype(np.int32)
+        # Alphabetical position breaks ties between equally ranked foods
+        self.name_rank = np.empty(n_foods, dtype=np.int64)
+        self.name_rank[np.argsort(np.array(self.names, dtype=object), kind='stable')] = np.arange(n_foods)
+
+        token_foods: Dict[str, List[int]] = defaultdict(list)
+        leading = {}
+        for food_id, name in enumerate(self.names):
+            tokens = self.tokenize(name)
+            for position, token in enumerate(tokens):
+                if not token_foods[token] or token_foods[token][-1] != food_id:
+                    token_foods[token].append(food_id)
+                if position == 0:
+                    leading[food_id] = token
+
+        # Sorted vocabulary with postings laid out in the same order, so every
+        # token sharing a prefix is one bisect range and one contiguous slice
+        self.tokens = sorted(token_foods)
+        lengths = np.array([len(token_foods[token]) for token in self.tokens], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.postings = np.array(
+            [food_id for token in self.tokens for food_id in token_foods[token]], dtype=np.int32
+        )
+        token_ids = {token: token_id for token_id, token in enumerate(self.tokens)}
+        self.leading_token = np.array(
+            [token_ids.get(leading.get(food_id), -1) for food_id in range(n_foods)], dtype=np.int64
+        )
+        self.full_names = {self.normalize(name): food_id for food_id, name in enumerate(self.names)}
+
+        trigram_tokens: Dict[str, List[int]] = defaultdict(list)
+        self.trigram_counts = np.zeros(len(self.tokens), dtype=np.int32)
+        for token_id, token in enumerate(self.tokens):
+            grams = self.trigrams(token)
+            self.trigram_counts[token_id] = len(grams)
+            for gram in grams:
+                trigram_tokens[gram].append(token_id)
+        self.trigram_postings = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in trigram_tokens.items()
+        }
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Lower-case words of a food name or query."""
+        return [token for token in re.split(r'[^a-z0-9]+', text.lower()) if token]
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        """Canonical spelling of a name for whole-name comparison."""
+        return ' '.join(cls.tokenize(text))
+
+    @staticmethod
+    def trigrams(token: str, padded: bool = True) -> set:
+        """Character trigrams of a token, padded at the ends unless asked otherwise."""
+        text = f"  {token} " if padded else token
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def _token_postings(self, token_ids) -> np.ndarray:
+        """Foods containing any of the given tokens."""
+        if len(token_ids) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.concatenate([
+            self.postings[self.offsets[token_id]:self.offsets[token_id + 1]] for token_id in token_ids
+        ])
+
+    def _term_scores(self, term: str) -> np.ndarray:
+        """Best score of each food for one query term; zero where it does not match."""
+        scores = np.zeros(len(self.names), dtype=np.float64)
+
+        lo = bisect_left(self.tokens, term)
+        hi = bisect_left(self.tokens, term + '\uffff')
+        if hi > lo:
+            scores[self.postings[self.offsets[lo]:self.offsets[hi]]] = self.PREFIX_SCORE
+            if self.tokens[lo] == term:
+                scores[self.postings[self.offsets[lo]:self.offsets[lo + 1]]] = self.EXACT_SCORE
+
+        if len(term) >= 3:
+            # Tokens containing the term contain all of its inner trigrams
+            candidates = None
+            for gram in self.trigrams(term, padded=False):
+                postings = self.trigram_postings.get(gram)
+                if postings is None:
+                    candidates = None
+                    break
+                candidates = postings if candidates is None else np.intersect1d(
+                    candidates, postings, assume_unique=True
+                )
+            inside = [] if candidates is None else [
+                token_id for token_id in candidates.tolist()
+                if not lo <= token_id < hi and term in self.tokens[token_id]
+            ]
+            if inside:
+                foods = self._token_postings(inside)
+                scores[foods] = np.maximum(scores[foods], self.SUBSTRING_SCORE)
+            elif hi == lo:
+                self._fuzzy_scores(term, scores)
+        return scores
+
+    def _fuzzy_scores(self, term: str, scores: np.ndarray) -> None:
+        """Score foods whose tokens look like a misspelled term."""
+        grams = self.trigrams(term)
+        hits = [self.trigram_postings[gram] for gram in grams if gram in self.trigram_postings]
+        if not hits:
+            return
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.tokens))
+        similarity = overlap / (len(grams) + self.trigram_counts - overlap)
+        close = np.flatnonzero(similarity >= self.FUZZY_THRESHOLD)
+        for token_id in close[np.argsort(similarity[close])].tolist():
+            foods = self.postings[self.offsets[token_id]:self.offsets[token_id + 1]]
+            scores[foods] = np.maximum(scores[foods], similarity[token_id])
+
+    def search(self,
+               query: str,
+               category: Optional[str] = None,
+               limit: int = 20,
+               offset: int = 0) -> Dict[str, Any]:
+        """
+        Rank the foods matching every word of a query.
+
+        Args:
+            query: Free-text query; empty lists the whole catalog by name
+            category: Only return foods of this category
+            limit: Maximum number of results
+            offset: Number of ranked results to skip
+
+        Returns:
+            Dictionary with the requested page of 'results', the 'total' number of
+            matches and per-category match counts in 'facets'
+        """
+        terms = self.tokenize(query)
+        n_foods = len(self.names)
+
+        if terms:
+            # Later terms only need scoring on the foods every earlier term matched
+            term_scores = self._term_scores(terms[0])
+            matched = np.flatnonzero(term_scores > 0)
+            total = term_scores[matched]
+            for term in terms[1:]:
+                term_scores = self._term_scores(term)[matched]
+                keep = term_scores > 0
+                matched = matched[keep]
+                total = total[keep] + term_scores[keep]
+
+            lo = bisect_left(self.tokens, terms[0])
+            hi = bisect_left(self.tokens, terms[0] + '\uffff')
+            leading = self.leading_token[matched]
+            total += np.where((leading >= lo) & (leading < hi), self.LEADING_SCORE, 0.0)
+            full_match = self.full_names.get(' '.join(terms))
+            if full_match is not None:
+                total[matched == full_match] += self.NAME_SCORE
+        else:
+            matched = np.arange(n_foods)
+            total = np.zeros(n_foods)
+
+        # Facets describe the query's matches before the category filter is applied
+        counts = np.bincount(self.category_codes[matched], minlength=len(self.category_names))
+        facets = {
+            self.category_names[code]: int(counts[code])
+            for code in np.argsort(-counts, kind='stable').tolist() if counts[code]
+        }
+
+        if category is not None:
+            code = self.category_names.index(category) if category in self.category_names else -1
+            in_category = self.category_codes[matched] == code
+            matched = matched[in_category]
+            total = total[in_category]
+
+        # One sort key: score (to the thousandth) first, then alphabetical position
+        scores = np.round(total, 3)
+        keys = -scores * 1000 * (n_foods + 1) + self.name_rank[matched]
+        end = min(offset + limit, matched.size)
+        if end < matched.size:
+            top = np.argpartition(keys, end - 1)[:end] if end else np.empty(0, dtype=np.intp)
+        else:
+            top = np.arange(matched.size)
+        top = top[np.argsort(keys[top], kind='stable')][offset:end]
+
+        results = []
+        for position in top.tolist():
+            name = self.names[matched[position]]
+            data = self.foods[name]
+            results.append({
+                'name': name.replace('_', ' ').title(),
+                'category': data['category'],
+                'cost_per_100g': data['cost_per_100g'],
+                'calories': data['calories'],
+                'protein': data['protein'],
+                'serving_size': data['serving_size'],
+                'unit': data['unit'],
+                'score': float(scores[position]),
+            })
+
+        return {
+            'query': query,
+            'category': category,
+            'total': int(matched.size),
+            'limit': limit,
+            'offset': offset,
+            'facets': facets,
+            'results': results,
+        }
@@ -0,0 +1,165 @@
+"""
+Linear Programming Meal Engine
+Solves servings per food per day for a whole plan in one sparse solve
+"""
+from typing import Dict, List, Optional, Tuple, Any
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+
+class LPMealPlanner:
+    """Cost-minimizing servings model with nutrient bands, budget and inventory limits."""
+
+    # Objective cost of missing a nutrient band by 100% of its optimal value
+    NUTRITION_PENALTY = 1e4
+    MAX_SERVINGS_PER_DAY = 2.0
+    # Stop the MILP search once within 1% of the best bound
+    MIP_GAP = 0.01
+
+    def __init__(self,
+                 serving_cost: np.ndarray,
+                 serving_nutrients: np.ndarray,
+                 requirements: List[Dict[str, float]],
+                 days: int,
+                 budget: float,
+                 inventory: Optional[List[Tuple[int, float]]] = None,
+                 inventory_days: Optional[List[int]] = None,
+                 integral: bool = False,
+                 time_limit: float = 5.0):
+        """
+        Set up the model.
+
+        Args:
+            serving_cost: Cost of one serving, one entry per candidate food
+            serving_nutrients: Nutrients per serving, shape (nutrients, foods)
+            requirements: Daily min/max/optimal band for each nutrient row
+            days: Number of days to plan
+            budget: Total budget for all days
+            inventory: (candidate position, servings available) per inventory lot;
+                a food may have several lots
+            inventory_days: Leading days each lot can be used before it expires;
+                every day when not given
+            integral: Restrict servings to whole numbers (MILP)
+            time_limit: Solver time limit in seconds
+        """
+        self.serving_cost = serving_cost
+        self.serving_nutrients = serving_nutrients
+        self.requirements = requirements
+        self.days = days
+        self.budget = budget
+        self.inventory = inventory or []
+        self.inventory_days = inventory_days
+        self.integral = integral
+        self.time_limit = time_limit
+
+    def solve(self) -> Optional[Dict[str, Any]]:
+        """
+        Solve the model.
+
+        Returns:
+            Dictionary with 'servings' (days x foods), 'inventory_servings'
+            (days x inventory lots) and solver status, or None if the solver
+            found no solution within the time limit
+        """
+        n_foods = self.serving_cost.size
+        n_nutrients = len(self.requirements)
+        n_inventory = len(self.inventory)
+        days = self.days
+
+        # Variable layout: servings | inventory servings | below-band slack | above-band slack
+        n_x = days * n_foods
+        n_u = days * n_inventory
+        n_s = days * n_nutrients
+        n_vars = n_x + n_u + 2 * n_s
+
+        inventory_cols = np.array([col for col, _ in self.inventory], dtype=int)
+        inventory_caps = np.array([cap for _, cap in self.inventory], dtype=float)
+        optimal = np.array([req['optimal'] for req in self.requirements], dtype=float)
+
+        # Inventory servings are already paid for, so they cost nothing in the objective
+        objective = np.concatenate([
+            np.tile(self.serving_cost, days),
+            -np.tile(self.serving_cost[inventory_cols], days),
+            np.full(2 * n_s, self.NUTRITION_PENALTY),
+        ])
+
+        day_eye = sparse.identity(days, format='csr')
+        nutrients = sparse.kron(day_eye, sparse.csr_matrix(self.serving_nutrients), format='csr')
+        slack = sparse.kron(day_eye, sparse.diags(optimal), format='csr')
+        zeros_u = sparse.csr_matrix((n_s, n_u))
+        zeros_s = sparse.csr_matrix((n_s, n_s))
+
+        # Daily nutrient bands, softened by the slack variables
+        band_min = sparse.hstack([nutrients, zeros_u, slack, zeros_s])
+        band_max = sparse.hstack([nutrients, zeros_u, zeros_s, -slack])
+        mins = np.tile([req['min'] for req in self.requirements], days)
+        maxs = np.tile([req['max'] for req in self.requirements], days)
+
+        # Whole-plan budget
+        budget_row = sparse.csr_matrix(
+            (np.tile(self.serving_cost, days), (np.zeros(n_x, dtype=int), np.arange(n_x))),
+            shape=(1, n_vars)
+        )
+
+        rows = [band_min, band_max, budget_row]
+        lower = [mins, np.full(n_s, -np.inf), [-np.inf]]
+        upper = [np.full(n_s, np.inf), maxs, [self.budget]]
+
+        if n_inventory:
+            # Inventory servings over the whole plan cannot exceed what is on hand
+            u_index = n_x + np.arange(n_u)
+            capacity = sparse.csr_matrix(
+                (np.ones(n_u), (np.tile(np.arange(n_inventory), days), u_index)),
+                shape=(n_inventory, n_vars)
+            )
+            # ... and each day they are part of that day's servings of the food,
+            # which several lots of one food share
+            foods, food_of = np.unique(inventory_cols, return_inverse=True)
+            n_links = days * foods.size
+            u_rows = np.repeat(np.arange(days), n_inventory) * foods.size + np.tile(food_of, days)
+            x_index = np.repeat(np.arange(days), foods.size) * n_foods + np.tile(foods, days)
+            link = sparse.csr_matrix(
+                (np.concatenate([np.ones(n_u), -np.ones(n_links)]),
+                 (np.concatenate([u_rows, np.arange(n_links)]),
+                  np.concatenate([u_index, x_index]))),
+                shape=(n_links, n_vars)
+            )
+            rows += [capacity, link]
+            lower += [np.full(n_inventory, -np.inf), np.full(n_links, -np.inf)]
+            upper += [inventory_caps, np.zeros(n_links)]
+
+        constraints = LinearConstraint(
+            sparse.vstack(rows, format='csr'), np.concatenate(lower), np.concatenate(upper)
+        )
+        upper_bounds = np.concatenate([
+            np.full(n_x + n_u, self.MAX_SERVINGS_PER_DAY),
+            np.full(2 * n_s, np.inf),
+        ])
+        if self.inventory_days is not None and n_inventory:
+            # No inventory servings once an item has expired
+            usable = np.arange(days)[:, None] < np.array(self.inventory_days, dtype=int)[None, :]
+            upper_bounds[n_x:n_x + n_u] = np.where(usable.ravel(), self.MAX_SERVINGS_PER_DAY, 0.0)
+        bounds = Bounds(np.zeros(n_vars), upper_bounds)
+        integrality = np.zeros(n_vars)
+        if self.integral:
+            integrality[:n_x + n_u] = 1
+
+        result = milp(
+            objective,
+            integrality=integrality,
+            bounds=bounds,
+            constraints=constraints,
+            options={'time_limit': self.time_limit, 'presolve': True, 'mip_rel_gap': self.MIP_GAP}
+        )
+        if result.x is None:
+            return None
+
+        return {
+            'servings': result.x[:n_x].reshape(days, n_foods),
+            'inventory_servings': result.x[n_x:n_x + n_u].reshape(days, n_inventory),
+            'status': result.status,
+            'message': result.message,
+            'objective': float(result.fun),
+        }
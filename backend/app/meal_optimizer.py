@@ -2,10 +2,31 @@
 AI Meal Optimization Engine
 Optimizes weekly meal plans based on budget, inventory, and nutrition requirements
 """
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+from bisect import bisect_right
 from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import copy
+import heapq
+import itertools
+import math
+import os
 import random
+import threading
+import time
+
+import numpy as np
+
+from app.catalog_file import DIETARY_FLAGS, open_catalog, write_catalog
+from app.food_catalog import FoodCatalog
+from app.food_matcher import FoodNameMatcher
+from app.food_search import FoodSearchIndex
+from app.meal_lp import LPMealPlanner
+from app.meal_search import AnytimeSearch, MultiStartSearch, PlanObjective
 
 
 class NutritionRules:
@@ -56,10 +77,229 @@ class NutritionRules:
         return results
 
 
+class DietaryRules:
+    """Maps free-text dietary restrictions to canonical exclusion rules."""
+    
+    # Foods of the built-in catalog, which carries no dietary flag columns
+    MEAT = ['chicken_breast', 'salmon', 'ground_beef']
+    ANIMAL_PRODUCTS = MEAT + ['eggs', 'milk', 'greek_yogurt', 'cheese']
+    GLUTEN_MARKERS = ['bread', 'pasta']
+    # Flag -> built-in foods carrying it and the categories they must be in
+    LISTED_FLAGS = {
+        'meat': (MEAT, ['protein']),
+        'animal_product': (ANIMAL_PRODUCTS, ['protein', 'dairy']),
+    }
+    
+    # Canonical restriction -> catalog flag column of the foods it rules out
+    RESTRICTION_FLAGS = {
+        'vegetarian': 'meat',
+        'vegan': 'animal_product',
+        'gluten-free': 'gluten',
+    }
+    
+    # Substring found in the restrictions text -> canonical restriction
+    KEYWORDS = {
+        'vegetarian': 'vegetarian',
+        'vegan': 'vegan',
+        'gluten-free': 'gluten-free',
+        'dairy-free': 'dairy-free',
+        'lactose': 'dairy-free',
+    }
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def canonical_profile(dietary_restrictions: Optional[str]) -> Tuple[str, ...]:
+        """Normalize a restrictions string to a sorted tuple of canonical restrictions."""
+        restrictions_lower = (dietary_restrictions or "").lower()
+        return tuple(sorted({
+            restriction for keyword, restriction in DietaryRules.KEYWORDS.items()
+            if keyword in restrictions_lower
+        }))
+    
+    @classmethod
+    def has_flag(cls, flag: str, food_name: str, food: Mapping) -> bool:
+        """
+        Check whether a food carries a dietary flag (meat, animal_product or gluten).
+        
+        Catalogs compiled with flag columns answer from the food's own value;
+        otherwise the built-in food lists decide.
+        """
+        value = food.get(flag)
+        if value is not None:
+            return bool(value)
+        if flag in cls.LISTED_FLAGS:
+            listed, categories = cls.LISTED_FLAGS[flag]
+            return food['category'] in categories and food_name in listed
+        return any(marker in food_name for marker in cls.GLUTEN_MARKERS)
+    
+    @classmethod
+    def flags(cls, food_name: str, food: Mapping) -> Dict[str, int]:
+        """A food's dietary flags as 0/1 catalog values."""
+        return {flag: int(cls.has_flag(flag, food_name, food)) for flag in DIETARY_FLAGS}
+    
+    @classmethod
+    def excludes(cls, restriction: str, food_name: str, food: Mapping) -> bool:
+        """Check whether a single canonical restriction rules out a food."""
+        flag = cls.RESTRICTION_FLAGS.get(restriction)
+        if flag is not None:
+            return cls.has_flag(flag, food_name, food)
+        if restriction == 'dairy-free':
+            return food['category'] == 'dairy'
+        return False
+    
+    @classmethod
+    def exclusion_mask(cls, restriction: str, foods: FoodCatalog) -> np.ndarray:
+        """
+        Boolean mask over a catalog of the foods a restriction rules out, as excludes decides.
+        
+        Reads the flag column when the catalog has one. Only a catalog without a
+        gluten column has its names scanned, for the gluten markers.
+        """
+        flag = cls.RESTRICTION_FLAGS.get(restriction)
+        categories = foods.text_column('category')
+        if flag is None:
+            if restriction == 'dairy-free':
+                return categories == 'dairy'
+            return np.zeros(len(foods), dtype=bool)
+        if flag in foods.fields:
+            return foods.column(flag) != 0
+        if flag in cls.LISTED_FLAGS:
+            listed, listed_categories = cls.LISTED_FLAGS[flag]
+            mask = np.zeros(len(foods), dtype=bool)
+            ids = [foods.food_id(name) for name in listed]
+            mask[[food_id for food_id in ids if food_id is not None]] = True
+            return mask & np.isin(categories, listed_categories)
+        return np.array([any(marker in name for marker in cls.GLUTEN_MARKERS) for name in foods.names], dtype=bool)
+
+
+class CatalogSnapshot:
+    """
+    One immutable version of the food catalog and the indexes derived from it.
+    
+    Optimizers keep the snapshot they started with, so a reload never changes
+    foods or prices under a running optimization.
+    
+    Indexes are built per process on first use. The catalog arrays and
+    compatibility index come from the catalog's columns; the search index, name
+    matcher and alternatives index need every food name, so with a memory-mapped
+    catalog each process decodes the whole name table once to build them.
+    """
+    
+    def __init__(self, foods: FoodCatalog, version: int):
+        """
+        Wrap a catalog.
+        
+        Args:
+            foods: Catalog of this snapshot; never modified
+            version: Process-local version number, increasing with every reload
+        """
+        self.FOODS = foods
+        self.version = version
+        # Content digest, stable across processes and restarts, for cache keys and ETags
+        self.tag = foods.digest()
+        self._derived: Dict[str, Any] = {}
+    
+    def derived(self, key: str, builder) -> Any:
+        """Return a structure derived from the catalog, building it once."""
+        value = self._derived.get(key)
+        if value is None:
+            value = builder()
+            self._derived[key] = value
+        return value
+    
+    def warm(self) -> 'CatalogSnapshot':
+        """Build every derived index up front, as done before a reload is swapped in."""
+        self.get_catalog_arrays()
+        self.get_compatibility_index()
+        self.get_search_index()
+        self.get_alternatives_index()
+        self.get_name_matcher()
+        return self
+    
+    def get_catalog_arrays(self) -> 'CatalogArrays':
+        """Get per-serving cost and nutrient vectors for the whole catalog."""
+        return self.derived('arrays', lambda: CatalogArrays(self.FOODS))
+    
+    def get_compatibility_index(self) -> 'CompatibilityIndex':
+        """Get the shared per-restriction-profile compatibility index."""
+        return self.derived('compatibility', lambda: CompatibilityIndex(self.FOODS))
+    
+    def get_search_index(self) -> FoodSearchIndex:
+        """Get the name search index for the catalog."""
+        return self.derived('search', lambda: FoodSearchIndex(self.FOODS))
+    
+    def get_alternatives_index(self) -> 'AlternativesIndex':
+        """Get the cost-sorted per-category substitutes index."""
+        return self.derived('alternatives', lambda: AlternativesIndex(self.FOODS))
+    
+    def get_name_matcher(self) -> FoodNameMatcher:
+        """Get the matcher from inventory item names to catalog foods."""
+        return self.derived('matcher', lambda: FoodNameMatcher(self.FOODS))
+    
+    def get_food(self, name: str) -> Optional[Dict]:
+        """Get food data by name."""
+        return self.FOODS.get(name)
+    
+    def get_foods_by_category(self, category: str) -> List[str]:
+        """Get all foods in a category."""
+        return self.get_compatibility_index().foods_in_category(category)
+    
+    def calculate_nutrition(self, food_name: str, quantity: float) -> Dict[str, float]:
+        """Calculate nutrition for a given quantity."""
+        food = self.get_food(food_name)
+        if not food:
+            return {}
+        
+        # Normalize to per 100g/ml
+        factor = quantity / 100
+        return {
+            'calories': food['calories'] * factor,
+            'protein': food['protein'] * factor,
+            'carbs': food['carbs'] * factor,
+            'fats': food['fats'] * factor,
+            'fiber': food['fiber'] * factor,
+            'cost': food['cost_per_100g'] * factor
+        }
+    
+    def find_alternatives(self,
+                          food_name: str,
+                          max_cost_ratio: float = 1.2,
+                          k: Optional[int] = None,
+                          rank: str = 'cost') -> List[str]:
+        """
+        Find alternative foods in the same category within cost range.
+        
+        Args:
+            food_name: Food to replace
+            max_cost_ratio: Highest cost per 100g allowed, relative to the food's
+            k: Number of alternatives to return; all of them when not given
+            rank: 'cost' for cheapest first, 'nutrition' for nutritionally closest first
+            
+        Returns:
+            Names of the alternatives, best first
+        """
+        return self.get_alternatives_index().find(food_name, max_cost_ratio, k=k, rank=rank)
+
+
+class _CatalogAttribute:
+    """Class attribute that resolves to the current snapshot's catalog."""
+    
+    def __get__(self, instance, owner) -> FoodCatalog:
+        return owner.snapshot().FOODS
+
+
 class FoodDatabase:
     """Dummy food database with nutritional info and cost data."""
     
-    FOODS = {
+    # Compiled catalog file to serve instead of the built-in foods (see ingest_catalog.py)
+    CATALOG_PATH_ENV = "FOOD_CATALOG_PATH"
+    # How often the catalog file is checked for a newer version
+    CATALOG_POLL_SECONDS = 5.0
+    
+    # Stored column-wise; FOODS[name] is a read-only dict-like FoodRecord
+    FOODS = _CatalogAttribute()
+    
+    BUILTIN_FOODS = FoodCatalog.from_foods({
         # Proteins
         'chicken_breast': {
             'category': 'protein',
@@ -335,65 +575,597 @@ class FoodDatabase:
             'serving_size': 30,
             'unit': 'g'
         }
-    }
+    })
+    
+    # The current snapshot is replaced, never modified; readers need no lock
+    _snapshot: Optional[CatalogSnapshot] = None
+    _swap_lock = threading.Lock()
+    _versions = itertools.count(1)
+    _reloader: Optional[ThreadPoolExecutor] = None
+    _pending_reload: Optional[Future] = None
+    _source_checked_at = 0.0
+    _source_mtime: Optional[int] = None
+    
+    @classmethod
+    def snapshot(cls) -> CatalogSnapshot:
+        """
+        The current catalog snapshot.
+        
+        On first use this maps the file named by FOOD_CATALOG_PATH, which
+        reads only its header, or falls back to the built-in foods. A newer
+        file is picked up by a background reload; until it is swapped in,
+        callers keep getting the current snapshot.
+        """
+        snapshot = cls._snapshot
+        if snapshot is None:
+            with cls._swap_lock:
+                if cls._snapshot is None:
+                    path = os.getenv(cls.CATALOG_PATH_ENV)
+                    if path:
+                        cls._source_mtime = os.stat(path).st_mtime_ns
+                    cls._snapshot = CatalogSnapshot(
+                        open_catalog(path) if path else cls.BUILTIN_FOODS, next(cls._versions)
+                    )
+                snapshot = cls._snapshot
+        cls._watch_source()
+        return snapshot
+    
+    @classmethod
+    def catalog(cls) -> FoodCatalog:
+        """The catalog of the current snapshot."""
+        return cls.snapshot().FOODS
+    
+    @classmethod
+    def catalog_version(cls) -> int:
+        """Version number of the currently loaded catalog."""
+        return cls.snapshot().version
+    
+    @classmethod
+    def load_catalog(cls, foods: Dict[str, Dict]) -> int:
+        """Replace the catalog right away; derived indexes are built on first use."""
+        snapshot = CatalogSnapshot(FoodCatalog.from_foods(foods), next(cls._versions))
+        cls._swap(snapshot)
+        return snapshot.version
+    
+    @classmethod
+    def _swap(cls, snapshot: CatalogSnapshot) -> None:
+        with cls._swap_lock:
+            # A slower reload must not replace a snapshot built after it
+            if cls._snapshot is None or cls._snapshot.version < snapshot.version:
+                cls._snapshot = snapshot
+    
+    @classmethod
+    def reload_in_background(cls, build: Callable[[CatalogSnapshot], FoodCatalog]) -> Future:
+        """
+        Build and swap in a new snapshot on the reload thread.
+        
+        Reloads run one at a time, each starting from the snapshot current when
+        it runs, so successive updates compose. The new snapshot's indexes are
+        built before the swap, so requests never wait for them.
+        
+        Args:
+            build: Returns the new catalog, given the current snapshot
+            
+        Returns:
+            Future resolving to the new snapshot
+        """
+        def reload() -> CatalogSnapshot:
+            foods = build(cls.snapshot())
+            snapshot = CatalogSnapshot(foods, next(cls._versions)).warm()
+            cls._swap(snapshot)
+            return snapshot
+        
+        with cls._swap_lock:
+            if cls._reloader is None:
+                cls._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-reload")
+            cls._pending_reload = cls._reloader.submit(reload)
+            return cls._pending_reload
+    
+    @classmethod
+    def reload_pending(cls) -> bool:
+        """Whether a background reload has not finished yet."""
+        return cls._pending_reload is not None and not cls._pending_reload.done()
+    
+    @classmethod
+    def update_prices(cls, prices: Dict[str, float]) -> Future:
+        """
+        Change cost_per_100g of some foods in a background reload.
+        
+        A file-backed catalog is rewritten too, so other worker processes pick
+        the prices up from the file.
+        
+        Args:
+            prices: New cost per 100g by food name
+            
+        Returns:
+            Future resolving to the new snapshot
+        """
+        current = cls.snapshot()
+        unknown = [name for name in prices if name not in current.FOODS]
+        if unknown:
+            raise KeyError(', '.join(unknown))
+        if any(price < 0 for price in prices.values()):
+            raise ValueError("Prices must not be negative")
+        
+        def build(snapshot: CatalogSnapshot) -> FoodCatalog:
+            foods = snapshot.FOODS.with_values('cost_per_100g', prices)
+            path = os.getenv(cls.CATALOG_PATH_ENV)
+            if path:
+                write_catalog(foods, path)
+                cls._source_mtime = os.stat(path).st_mtime_ns
+                foods = open_catalog(path)
+            return foods
+        
+        return cls.reload_in_background(build)
+    
+    @classmethod
+    def _watch_source(cls) -> None:
+        """Reload in the background when the catalog file has been replaced."""
+        path = os.getenv(cls.CATALOG_PATH_ENV)
+        now = time.monotonic()
+        if not path or now - cls._source_checked_at < cls.CATALOG_POLL_SECONDS:
+            return
+        cls._source_checked_at = now
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != cls._source_mtime and not cls.reload_pending():
+            cls._source_mtime = mtime
+            cls.reload_in_background(lambda snapshot: open_catalog(path))
+    
+    @classmethod
+    def get_catalog_arrays(cls) -> 'CatalogArrays':
+        """Get per-serving cost and nutrient vectors for the whole catalog."""
+        return cls.snapshot().get_catalog_arrays()
+    
+    @classmethod
+    def get_compatibility_index(cls) -> 'CompatibilityIndex':
+        """Get the shared per-restriction-profile compatibility index."""
+        return cls.snapshot().get_compatibility_index()
+    
+    @classmethod
+    def get_search_index(cls) -> FoodSearchIndex:
+        """Get the name search index for the current catalog."""
+        return cls.snapshot().get_search_index()
+    
+    @classmethod
+    def get_alternatives_index(cls) -> 'AlternativesIndex':
+        """Get the cost-sorted per-category substitutes index."""
+        return cls.snapshot().get_alternatives_index()
+    
+    @classmethod
+    def get_name_matcher(cls) -> FoodNameMatcher:
+        """Get the matcher from inventory item names to catalog foods."""
+        return cls.snapshot().get_name_matcher()
     
     @classmethod
     def get_food(cls, name: str) -> Optional[Dict]:
         """Get food data by name."""
-        return cls.FOODS.get(name)
+        return cls.snapshot().get_food(name)
     
     @classmethod
     def get_foods_by_category(cls, category: str) -> List[str]:
         """Get all foods in a category."""
-        return [name for name, data in cls.FOODS.items() 
-                if data['category'] == category]
+        return cls.snapshot().get_foods_by_category(category)
     
     @classmethod
     def calculate_nutrition(cls, food_name: str, quantity: float) -> Dict[str, float]:
         """Calculate nutrition for a given quantity."""
-        food = cls.get_food(food_name)
-        if not food:
-            return {}
+        return cls.snapshot().calculate_nutrition(food_name, quantity)
+    
+    @classmethod
+    def find_alternatives(cls,
+                          food_name: str,
+                          max_cost_ratio: float = 1.2,
+                          k: Optional[int] = None,
+                          rank: str = 'cost') -> List[str]:
+        """Find alternative foods in the same category within cost range (see CatalogSnapshot)."""
+        return cls.snapshot().find_alternatives(food_name, max_cost_ratio, k=k, rank=rank)
+
+
+class CatalogArrays:
+    """
+    Per-serving nutrient and cost vectors for every food in the catalog.
+    
+    Names and the name index are the catalog's own, so a memory-mapped catalog
+    decodes only the names a plan uses; each process still holds its own vectors.
+    """
+    
+    NUTRIENTS = ('calories', 'protein', 'carbs', 'fats', 'fiber')
+    
+    def __init__(self, foods: FoodCatalog):
+        self.names = foods.names
+        self.index = foods.ids
+        self.categories = foods.text_column('category')
         
-        # Normalize to per 100g/ml
-        factor = quantity / 100
-        return {
-            'calories': food['calories'] * factor,
-            'protein': food['protein'] * factor,
-            'carbs': food['carbs'] * factor,
-            'fats': food['fats'] * factor,
-            'fiber': food['fiber'] * factor,
-            'cost': food['cost_per_100g'] * factor
+        # Everything below is per serving, mirroring _score_food_choice
+        self.serving_size = foods.column('serving_size').astype(float)
+        factor = self.serving_size / 100
+        self.serving_cost = foods.column('cost_per_100g').astype(float) * factor
+        self.serving_nutrients = {
+            nutrient: foods.column(nutrient).astype(float) * factor
+            for nutrient in self.NUTRIENTS
         }
+        self.nutrient_matrix = np.column_stack(
+            [self.serving_nutrients[nutrient] for nutrient in self.NUTRIENTS]
+        )
+        
+        # Budget- and inventory-independent part of the score for each meal type
+        quality_bonus = (
+            np.where(self.serving_nutrients['protein'] >= 15, 10.0, 0.0)
+            + np.where(self.serving_nutrients['fiber'] >= 3, 5.0, 0.0)
+        )
+        self.base_scores = {}
+        for meal_type in NutritionRules.MEAL_DISTRIBUTION:
+            required_cals = NutritionRules.get_meal_requirement('calories', meal_type)
+            cal_diff = np.abs(self.serving_nutrients['calories'] - required_cals) / required_cals
+            self.base_scores[meal_type] = 100.0 - cal_diff * 15 + quality_bonus
     
-    @classmethod
-    def find_alternatives(cls, food_name: str, max_cost_ratio: float = 1.2) -> List[str]:
-        """Find alternative foods in the same category within cost range."""
-        food = cls.get_food(food_name)
-        if not food:
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class CompatibilityIndex:
+    """
+    Precomputed allowed-food masks per restriction profile and category.
+    
+    Masks come from the catalog's category codes and dietary flag columns, so
+    building the index reads no food names unless the catalog lacks flags.
+    """
+    
+    def __init__(self, foods: FoodCatalog):
+        self.names = foods.names
+        codes = foods.column('category')
+        self.category_masks = {
+            category: codes == code for code, category in enumerate(foods.labels('category'))
+        }
+        self.exclusion_masks = {
+            restriction: DietaryRules.exclusion_mask(restriction, foods)
+            for restriction in set(DietaryRules.KEYWORDS.values())
+        }
+        self._profile_masks: Dict[Tuple[str, ...], np.ndarray] = {}
+        self._candidates: Dict[Tuple[Tuple[str, ...], str], np.ndarray] = {}
+    
+    def allowed_mask(self, profile: Tuple[str, ...]) -> np.ndarray:
+        """Boolean mask over the catalog of foods allowed for a profile."""
+        mask = self._profile_masks.get(profile)
+        if mask is None:
+            mask = np.ones(len(self.names), dtype=bool)
+            for restriction in profile:
+                mask &= ~self.exclusion_masks[restriction]
+            mask.setflags(write=False)
+            self._profile_masks[profile] = mask
+        return mask
+    
+    def candidates(self, profile: Tuple[str, ...], category: str) -> np.ndarray:
+        """Catalog indices of allowed foods in a category, in catalog order."""
+        key = (profile, category)
+        indices = self._candidates.get(key)
+        if indices is None:
+            category_mask = self.category_masks.get(category)
+            if category_mask is None:
+                indices = np.empty(0, dtype=np.intp)
+            else:
+                indices = np.flatnonzero(category_mask & self.allowed_mask(profile))
+            indices.setflags(write=False)
+            self._candidates[key] = indices
+        return indices
+    
+    def allowed_foods(self, profile: Tuple[str, ...], category: str) -> List[str]:
+        """Names of allowed foods in a category."""
+        return [self.names[i] for i in self.candidates(profile, category)]
+    
+    def foods_in_category(self, category: str) -> List[str]:
+        """Names of every food in a category, in catalog order."""
+        return self.allowed_foods((), category)
+
+
+class AlternativesIndex:
+    """Foods of each category sorted by cost, with standardized nutrient profiles."""
+    
+    NUTRIENTS = CatalogArrays.NUTRIENTS
+    
+    def __init__(self, foods: FoodCatalog):
+        self.names = list(foods.keys())
+        self.position = {name: i for i, name in enumerate(self.names)}
+        self.category = foods.text_column('category').tolist()
+        self.cost = foods.column('cost_per_100g').astype(float)
+        
+        # Nutrients per 100g in catalog standard deviations, so every nutrient
+        # weighs the same in the euclidean distance between two foods
+        profiles = np.column_stack(
+            [foods.column(nutrient).astype(float) for nutrient in self.NUTRIENTS]
+        ).reshape(len(self.names), len(self.NUTRIENTS))
+        scale = profiles.std(axis=0)
+        scale[scale == 0] = 1.0
+        self.profiles = (profiles - profiles.mean(axis=0)) / scale
+        
+        # Per category: food positions in ascending cost, with their costs for bisecting
+        members: Dict[str, List[int]] = defaultdict(list)
+        for i, category in enumerate(self.category):
+            members[category].append(i)
+        self.by_cost: Dict[str, np.ndarray] = {}
+        self.sorted_costs: Dict[str, np.ndarray] = {}
+        for category, indices in members.items():
+            order = np.array(sorted(indices, key=lambda i: (self.cost[i], self.names[i])), dtype=np.intp)
+            self.by_cost[category] = order
+            self.sorted_costs[category] = self.cost[order]
+    
+    def nutrient_distance(self, food_name: str, other_name: str) -> float:
+        """Distance between the standardized nutrient profiles of two foods."""
+        a, b = self.position[food_name], self.position[other_name]
+        return float(np.linalg.norm(self.profiles[a] - self.profiles[b]))
+    
+    def find(self,
+             food_name: str,
+             max_cost_ratio: float,
+             k: Optional[int] = None,
+             rank: str = 'cost') -> List[str]:
+        """Same-category foods costing at most max_cost_ratio times the food, best first."""
+        i = self.position.get(food_name)
+        if i is None or (k is not None and k <= 0):
             return []
         
-        category = food['category']
-        max_cost = food['cost_per_100g'] * max_cost_ratio
+        category = self.category[i]
+        end = bisect_right(self.sorted_costs[category], self.cost[i] * max_cost_ratio)
+        candidates = self.by_cost[category][:end]
+        candidates = candidates[candidates != i]
         
-        alternatives = []
-        for name, data in cls.FOODS.items():
-            if (name != food_name and 
-                data['category'] == category and 
-                data['cost_per_100g'] <= max_cost):
-                alternatives.append(name)
+        if rank == 'nutrition':
+            distances = np.linalg.norm(self.profiles[candidates] - self.profiles[i], axis=1)
+            if k is not None and k < candidates.size:
+                # Back in cost order first, so equally close foods stay cheapest first
+                nearest = np.sort(np.argpartition(distances, k - 1)[:k])
+                candidates, distances = candidates[nearest], distances[nearest]
+            candidates = candidates[np.argsort(distances, kind='stable')]
+        elif k is not None:
+            candidates = candidates[:k]
         
-        return alternatives
+        return [self.names[j] for j in candidates.tolist()]
+
+
+class ScoringEngine:
+    """Scores every candidate food for a meal slot in one batched operation."""
+    
+    # Bonus for any food in inventory, plus up to EXPIRY_BONUS the closer its
+    # first lot is to expiring, from nothing at EXPIRY_WINDOW_DAYS out
+    INVENTORY_BONUS = 30.0
+    EXPIRY_BONUS = 10.0
+    EXPIRY_WINDOW_DAYS = 14
+    
+    def __init__(self, arrays: CatalogArrays, inventory_items: Mapping, on: Optional[date] = None):
+        self.arrays = arrays
+        self.inventory_bonus = np.zeros(len(arrays))
+        self._stocked: List[int] = []
+        self.refresh_inventory(inventory_items, on)
+        self._slots: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    
+    @classmethod
+    def inventory_score(cls, expires: Optional[date], on: Optional[date]) -> float:
+        """
+        Bonus for using an inventory food whose first lot expires on a date.
+        
+        Without a plan date only whether the lot has an expiry date counts.
+        """
+        if expires is None:
+            return cls.INVENTORY_BONUS
+        if on is None:
+            return cls.INVENTORY_BONUS + cls.EXPIRY_BONUS
+        days_left = (expires - on).days
+        urgency = min(max(1 - days_left / cls.EXPIRY_WINDOW_DAYS, 0.0), 1.0)
+        return cls.INVENTORY_BONUS + cls.EXPIRY_BONUS * urgency
+    
+    def refresh_inventory(self, inventory_items: Mapping, on: Optional[date] = None) -> None:
+        """Recompute inventory bonuses for the foods in stock on a plan date."""
+        self.inventory_bonus[self._stocked] = 0.0
+        self._stocked = []
+        for food_name, inv_item in inventory_items.items():
+            idx = self.arrays.index.get(food_name)
+            if idx is not None:
+                self.inventory_bonus[idx] = self.inventory_score(inv_item['expires'], on)
+                self._stocked.append(idx)
+    
+    def prepare_slot(self, meal_type: str, category: str, candidates: np.ndarray) -> None:
+        """Cache the static per-slot vectors for a (meal type, category) pair."""
+        base = self.arrays.base_scores.get(meal_type, self.arrays.base_scores['breakfast'])
+        self._slots[(meal_type, category)] = (
+            candidates, base[candidates], self.arrays.serving_cost[candidates]
+        )
+    
+    def has_slot(self, meal_type: str, category: str) -> bool:
+        return (meal_type, category) in self._slots
+    
+    def remove_inventory(self, food_name: str) -> None:
+        """Drop the inventory bonus once an item has been used up."""
+        idx = self.arrays.index.get(food_name)
+        if idx is not None:
+            self.inventory_bonus[idx] = 0.0
+    
+    def score(self, meal_type: str, category: str, remaining_budget: float) -> np.ndarray:
+        """Score all candidates of a prepared slot against the remaining budget."""
+        candidates, base, serving_cost = self._slots[(meal_type, category)]
+        return self._score(candidates, base, serving_cost, remaining_budget)
+    
+    def score_candidates(self, meal_type: str, candidates: np.ndarray, remaining_budget: float) -> np.ndarray:
+        """Score an arbitrary set of catalog indices for a meal type."""
+        base = self.arrays.base_scores.get(meal_type, self.arrays.base_scores['breakfast'])
+        return self._score(candidates, base[candidates], self.arrays.serving_cost[candidates], remaining_budget)
+    
+    def _score(self,
+               candidates: np.ndarray,
+               base: np.ndarray,
+               serving_cost: np.ndarray,
+               remaining_budget: float) -> np.ndarray:
+        if remaining_budget > 0:
+            cost_penalty = np.where(
+                serving_cost > remaining_budget, 40.0, serving_cost / remaining_budget * 20
+            )
+        else:
+            cost_penalty = np.where(serving_cost > remaining_budget, 40.0, 20.0)
+        scores = base - cost_penalty + self.inventory_bonus[candidates]
+        return np.maximum(scores, 0.0)
+    
+    def select(self, meal_type: str, category: str, remaining_budget: float) -> Optional[int]:
+        """Return the catalog index of the best candidate, or None if there is none."""
+        candidates = self._slots[(meal_type, category)][0]
+        if candidates.size == 0:
+            return None
+        # argmax keeps the first of equal scores, like the stable sort it replaces
+        best = int(np.argmax(self.score(meal_type, category, remaining_budget)))
+        return int(candidates[best])
+
+
+class InventoryQueue(Mapping):
+    """
+    Inventory lots per food, drawn first-expired-first-out.
+    
+    Each food keeps a heap of its lots keyed by expiry date (undated lots
+    last), so a draw always takes the lot that expires first. A second heap
+    over every dated lot lets the planner retire whatever expired by a given
+    day without scanning the inventory. Lots are the queue's own records, so
+    draws never touch the caller's items.
+    
+    As a mapping, the queue maps each food with stock left to a summary of its
+    lots: the first lot's id, name and expiry, with quantity and cost summed.
+    """
+    
+    def __init__(self):
+        self._lots: Dict[str, List[Tuple[int, int, Dict]]] = {}
+        self._by_expiry: List[Tuple[int, int, str, Dict]] = []
+        # Ties in expiry go to the lot added first
+        self._added = 0
+        # Lots retired with stock left, in the order they expired
+        self.expired: List[Dict] = []
+    
+    @staticmethod
+    def _expiry_key(lot: Dict) -> int:
+        return lot['expires'].toordinal() if lot['expires'] is not None else date.max.toordinal()
+    
+    def add(self, food_name: str, lot: Dict) -> None:
+        """
+        Put a lot of a food in the queue.
+        
+        Args:
+            food_name: Catalog food (or normalized item name) the lot counts as
+            lot: Inventory record with 'id', 'quantity' and a parsed 'expires' date or None
+        """
+        entry = (self._expiry_key(lot), self._added)
+        self._added += 1
+        heapq.heappush(self._lots.setdefault(food_name, []), entry + (lot,))
+        if lot['expires'] is not None:
+            heapq.heappush(self._by_expiry, entry + (food_name, lot))
+    
+    def _head(self, food_name: str) -> Optional[Dict]:
+        """First lot of a food to use, dropping used-up and expired lots on the way."""
+        heap = self._lots.get(food_name)
+        while heap and (heap[0][2]['quantity'] <= 0 or heap[0][2].get('expired')):
+            heapq.heappop(heap)
+        if not heap:
+            self._lots.pop(food_name, None)
+            return None
+        return heap[0][2]
+    
+    def lots(self, food_name: str) -> List[Dict]:
+        """Lots of a food with stock left, first to use first."""
+        if self._head(food_name) is None:
+            return []
+        return [lot for _, _, lot in sorted(self._lots[food_name])
+                if lot['quantity'] > 0 and not lot.get('expired')]
+    
+    def draw(self, food_name: str, amount: float) -> Optional[Dict]:
+        """
+        Take an amount of a food, earliest-expiring lots first.
+        
+        Args:
+            food_name: Food to draw
+            amount: Quantity to take, in inventory units
+            
+        Returns:
+            The lot the draw started from, or None if the food is not in stock
+        """
+        first = lot = self._head(food_name)
+        while lot is not None and amount > 0:
+            taken = min(amount, lot['quantity'])
+            lot['quantity'] -= taken
+            amount -= taken
+            lot = self._head(food_name)
+        return first
+    
+    def expire_before(self, day: date) -> List[str]:
+        """
+        Retire every lot that expires before a date.
+        
+        Returns:
+            Foods that lost a lot
+        """
+        foods = []
+        while self._by_expiry and self._by_expiry[0][0] < day.toordinal():
+            _, _, food_name, lot = heapq.heappop(self._by_expiry)
+            if lot['quantity'] > 0 and not lot.get('expired'):
+                lot['expired'] = True
+                self.expired.append(lot)
+                foods.append(food_name)
+                self._head(food_name)
+        return foods
+    
+    def expiring_by(self, day: date) -> List[Tuple[str, Dict]]:
+        """(food, lot) for every lot with stock left that expires on or before a date."""
+        return sorted(
+            ((food_name, lot) for _, _, food_name, lot in self._by_expiry
+             if lot['expires'] <= day and lot['quantity'] > 0 and not lot.get('expired')),
+            key=lambda entry: (self._expiry_key(entry[1]), entry[0])
+        )
+    
+    def __getitem__(self, food_name: str) -> Dict:
+        lots = self.lots(food_name)
+        if not lots:
+            raise KeyError(food_name)
+        return {
+            **lots[0],
+            'quantity': sum(lot['quantity'] for lot in lots),
+            'cost': sum(lot['cost'] or 0 for lot in lots),
+        }
+    
+    def __contains__(self, food_name: object) -> bool:
+        return isinstance(food_name, str) and self._head(food_name) is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter([food_name for food_name in list(self._lots) if self._head(food_name) is not None])
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
 
 
 class MealOptimizer:
     """AI-powered meal optimization engine."""
     
+    # Meal composition strategy: one pick per category slot
+    MEAL_COMPOSITION = {
+        'breakfast': ['grain', 'protein', 'fruit', 'dairy'],
+        'lunch': ['protein', 'grain', 'vegetable', 'vegetable'],
+        'dinner': ['protein', 'grain', 'vegetable', 'vegetable'],
+        'snack': ['fruit'],
+    }
+    
+    # Smallest LP serving worth putting on the plan
+    LP_MIN_SERVINGS = 0.05
+    # Upper bound on foods handed to the LP solver
+    LP_CANDIDATE_LIMIT = 600
+    # Time budget for the anytime search when the caller gives none
+    DEFAULT_DEADLINE_MS = 50
+    # Score points lost per 100% of a nutrient's optimal left outside its band
+    # when regenerating a single meal
+    NUTRITION_GAP_WEIGHT = 15.0
+    
     def __init__(self, 
                  budget: float,
                  inventory_items: List[Dict],
                  dietary_restrictions: Optional[str] = None,
-                 dietary_pref: Optional[str] = None):
+                 dietary_pref: Optional[str] = None,
+                 days: int = 7,
+                 start_date: Optional[date] = None,
+                 snapshot: Optional[CatalogSnapshot] = None):
         """
         Initialize the meal optimizer.
         
@@ -402,59 +1174,77 @@ class MealOptimizer:
             inventory_items: List of available inventory items
             dietary_restrictions: User's dietary restrictions
             dietary_pref: User's dietary preferences
+            days: Number of days to plan; the budget is scaled to this horizon
+            start_date: Date of the first planned day; when given, inventory is
+                not used after its expiration date
+            snapshot: Catalog snapshot to plan with; the current one when not given
         """
         self.budget = budget
+        self.days = days
+        self.start_date = start_date
+        # Date of the day being planned; None when planning without dates
+        self.plan_date = start_date
+        # People each planned serving feeds; household planning draws inventory for all of them
+        self.portions = 1.0
+        self.food_db = snapshot or FoodDatabase.snapshot()
         self.inventory_items = self._process_inventory(inventory_items)
         self.dietary_restrictions = dietary_restrictions or ""
         self.dietary_pref = dietary_pref or ""
-        self.food_db = FoodDatabase()
         self.nutrition_rules = NutritionRules()
+        self.catalog_arrays = self.food_db.get_catalog_arrays()
+        self.scoring_engine = ScoringEngine(self.catalog_arrays, self.inventory_items, self.plan_date)
+        self.restriction_profile = DietaryRules.canonical_profile(self.dietary_restrictions)
+        self.compatibility_index = self.food_db.get_compatibility_index()
         
-    def _process_inventory(self, items: List[Dict]) -> Dict[str, Dict]:
-        """Process inventory items into usable format."""
-        inventory = {}
+    def _process_inventory(self, items: List[Dict]) -> InventoryQueue:
+        """
+        Queue inventory items as lots of catalog foods.
+        
+        Items carrying a 'food_name' (resolved by the caller, possibly None) use
+        it as is; the others are matched by name. Unmatched items keep their
+        normalized name. Expiration dates are parsed here, once.
+        """
+        matcher = self.food_db.get_name_matcher()
+        inventory = InventoryQueue()
         for item in items:
-            # Normalize item name for matching
-            normalized_name = item.get('name', '').lower().replace(' ', '_')
-            inventory[normalized_name] = {
+            food_name = item['food_name'] if 'food_name' in item else matcher.resolve(item.get('name') or '')
+            inventory.add(food_name or (item.get('name') or '').lower().replace(' ', '_'), {
                 'id': item.get('id'),
                 'name': item.get('name'),
-                'quantity': item.get('quantity', 0),
-                'cost': item.get('cost', 0),
-                'category': item.get('category', '').lower(),
-                'expiration_date': item.get('expiration_date')
-            }
+                'food_name': food_name,
+                'quantity': item.get('quantity') or 0,
+                'cost': item.get('cost') or 0,
+                'category': (item.get('category') or '').lower(),
+                'expiration_date': item.get('expiration_date'),
+                'expires': self._parse_expiration(item.get('expiration_date'))
+            })
         return inventory
     
+    @staticmethod
+    def _parse_expiration(expiration_date: Optional[str]) -> Optional[date]:
+        """Parse an inventory expiration date, ignoring values that are not ISO dates."""
+        if not expiration_date:
+            return None
+        try:
+            return date.fromisoformat(str(expiration_date)[:10])
+        except ValueError:
+            return None
+    
+    @property
+    def plan_budget(self) -> float:
+        """Budget for the whole horizon, from the weekly budget."""
+        return self.budget * (self.days / 7)
+    
     def _check_dietary_compatibility(self, food_name: str) -> bool:
         """Check if food is compatible with dietary restrictions."""
         food = self.food_db.get_food(food_name)
         if not food:
             return False
         
-        restrictions_lower = self.dietary_restrictions.lower()
-        
-        # Check common restrictions
-        if 'vegetarian' in restrictions_lower:
-            if food['category'] == 'protein' and food_name in ['chicken_breast', 'salmon', 'ground_beef']:
-                return False
-        
-        if 'vegan' in restrictions_lower:
-            if food['category'] in ['protein', 'dairy'] and food_name in [
-                'chicken_breast', 'salmon', 'ground_beef', 'eggs', 
-                'milk', 'greek_yogurt', 'cheese'
-            ]:
-                return False
-        
-        if 'gluten-free' in restrictions_lower:
-            if 'bread' in food_name or 'pasta' in food_name:
-                return False
-        
-        if 'dairy-free' in restrictions_lower or 'lactose' in restrictions_lower:
-            if food['category'] == 'dairy':
-                return False
-        
-        return True
+        return not any(
+            DietaryRules.excludes(restriction, food_name, food)
+            for restriction in self.restriction_profile
+        )
     
     def _score_food_choice(self, 
                           food_name: str, 
@@ -476,13 +1266,10 @@ class MealOptimizer:
             cost_ratio = serving_cost / remaining_budget if remaining_budget > 0 else 1
             score -= (cost_ratio * 20)  # Lower is better
         
-        # Inventory usage (30% weight) - prioritize using inventory
+        # Inventory usage (30% weight) - prioritize using inventory, the more so
+        # the sooner it expires
         if food_name in self.inventory_items:
-            score += 30
-            # Boost score if item is expiring soon
-            inv_item = self.inventory_items[food_name]
-            if inv_item.get('expiration_date'):
-                score += 10
+            score += ScoringEngine.inventory_score(self.inventory_items[food_name]['expires'], self.plan_date)
         
         # Nutritional balance (30% weight)
         required_cals = self.nutrition_rules.get_meal_requirement('calories', meal_type)
@@ -502,75 +1289,37 @@ class MealOptimizer:
         
         return max(0, score)
     
+    def _select_best_food(self, meal_type: str, category: str, remaining_budget: float) -> Optional[int]:
+        """Pick the highest scoring compatible food for a slot via masked argmax."""
+        if not self.scoring_engine.has_slot(meal_type, category):
+            candidates = self.compatibility_index.candidates(self.restriction_profile, category)
+            self.scoring_engine.prepare_slot(meal_type, category, candidates)
+        return self.scoring_engine.select(meal_type, category, remaining_budget)
+    
     def _select_meal_items(self, 
                           meal_type: str, 
                           day: int,
                           remaining_budget: float,
-                          daily_nutrition: Dict[str, float]) -> List[Dict]:
-        """Select items for a single meal."""
+                          daily_nutrition: Dict[str, float],
+                          choices: Optional[List[Tuple]] = None) -> List[Dict]:
+        """Select items for a single meal, recording (day, meal, category, food index) in choices."""
         selected_items = []
         
-        # Meal composition strategy
-        if meal_type == 'breakfast':
-            categories = ['grain', 'protein', 'fruit', 'dairy']
-        elif meal_type in ['lunch', 'dinner']:
-            categories = ['protein', 'grain', 'vegetable', 'vegetable']
-        else:  # snack
-            categories = ['fruit']
-        
-        for category in categories:
-            available_foods = self.food_db.get_foods_by_category(category)
-            compatible_foods = [f for f in available_foods 
-                              if self._check_dietary_compatibility(f)]
-            
-            if not compatible_foods:
-                continue
-            
-            # Score all compatible foods
-            scored_foods = []
-            for food_name in compatible_foods:
-                score = self._score_food_choice(
-                    food_name, meal_type, remaining_budget, daily_nutrition
-                )
-                scored_foods.append((food_name, score))
+        for category in self.MEAL_COMPOSITION.get(meal_type, ['fruit']):
+            # Score all compatible foods in one batch and take the best
+            selected_idx = self._select_best_food(meal_type, category, remaining_budget)
             
-            # Sort by score and select top choice
-            scored_foods.sort(key=lambda x: x[1], reverse=True)
-            
-            if scored_foods:
-                selected_food = scored_foods[0][0]
+            if selected_idx is not None:
+                selected_food = self.catalog_arrays.names[selected_idx]
+                if choices is not None:
+                    choices.append((day, meal_type, category, selected_idx))
                 food_data = self.food_db.get_food(selected_food)
                 
                 quantity = food_data['serving_size']
-                nutrition = self.food_db.calculate_nutrition(selected_food, quantity)
-                
-                # Check if using inventory
-                uses_inventory = selected_food in self.inventory_items
-                inventory_item_id = None
-                
-                if uses_inventory:
-                    inv_item = self.inventory_items[selected_food]
-                    inventory_item_id = inv_item['id']
-                    # Reduce inventory quantity
-                    inv_item['quantity'] -= (quantity / 100)
-                    if inv_item['quantity'] <= 0:
-                        del self.inventory_items[selected_food]
-                
-                meal_item = {
-                    'day_of_week': day,
-                    'meal_type': meal_type,
-                    'food_name': selected_food.replace('_', ' ').title(),
-                    'quantity': quantity,
-                    'unit': food_data['unit'],
-                    'estimated_cost': nutrition['cost'],
-                    'calories': nutrition['calories'],
-                    'protein': nutrition['protein'],
-                    'carbs': nutrition['carbs'],
-                    'fats': nutrition['fats'],
-                    'uses_inventory': uses_inventory,
-                    'inventory_item_id': str(inventory_item_id) if inventory_item_id else None,
-                    'notes': f"From inventory - use by {inv_item.get('expiration_date')}" if uses_inventory and inv_item.get('expiration_date') else None
-                }
+                inv_item = self._draw_inventory(selected_food, quantity)
+                meal_item, nutrition = self._make_meal_item(
+                    day, meal_type, selected_food, quantity, inv_item
+                )
                 
                 selected_items.append(meal_item)
                 remaining_budget -= nutrition['cost']
@@ -584,46 +1333,824 @@ class MealOptimizer:
         
         return selected_items
     
-    def optimize_weekly_plan(self) -> Dict[str, Any]:
+    def regenerate_meal(self,
+                        day: int,
+                        meal_type: str,
+                        remaining_budget: float,
+                        daily_nutrition: Dict[str, float],
+                        exclude_foods: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Re-plan a single meal against what is left of the day's budget and nutrition.
+        
+        Args:
+            day: Day of the meal
+            meal_type: Meal to re-plan
+            remaining_budget: Budget left for the day once the other meals are paid for
+            daily_nutrition: Nutrient totals of the day's other meals
+            exclude_foods: Foods to avoid, e.g. the ones in the rejected meal
+        
+        Returns:
+            New meal plan items for the slot
+        """
+        arrays = self.catalog_arrays
+        excluded = {arrays.index[name] for name in exclude_foods or [] if name in arrays.index}
+        requirements = [self.nutrition_rules.DAILY_REQUIREMENTS[n] for n in arrays.NUTRIENTS]
+        mins = np.array([req['min'] for req in requirements])
+        maxs = np.array([req['max'] for req in requirements])
+        optimal = np.array([req['optimal'] for req in requirements])
+        day_totals = np.array([daily_nutrition.get(n, 0.0) for n in arrays.NUTRIENTS], dtype=float)
+        
+        selected_items = []
+        for category in self.MEAL_COMPOSITION.get(meal_type, ['fruit']):
+            candidates = self.compatibility_index.candidates(self.restriction_profile, category)
+            allowed = candidates[~np.isin(candidates, list(excluded))]
+            if allowed.size == 0:
+                allowed = candidates
+            if allowed.size == 0:
+                continue
+            
+            # Budget/inventory score, less how far each pick would leave the day outside its bands
+            totals = day_totals + arrays.nutrient_matrix[allowed]
+            band_gap = ((np.maximum(mins - totals, 0) + np.maximum(totals - maxs, 0)) / optimal).sum(axis=1)
+            scores = (self.scoring_engine.score_candidates(meal_type, allowed, remaining_budget)
+                      - self.NUTRITION_GAP_WEIGHT * band_gap)
+            selected_idx = int(allowed[np.argmax(scores)])
+            excluded.add(selected_idx)
+            
+            food_name = arrays.names[selected_idx]
+            quantity = self.food_db.get_food(food_name)['serving_size']
+            inv_item = self._draw_inventory(food_name, quantity)
+            meal_item, nutrition = self._make_meal_item(day, meal_type, food_name, quantity, inv_item)
+            selected_items.append(meal_item)
+            remaining_budget -= nutrition['cost']
+            day_totals += arrays.nutrient_matrix[selected_idx]
+        
+        return selected_items
+    
+    def _draw_inventory(self, food_name: str, quantity: float) -> Optional[Dict]:
+        """Take a quantity of a food from inventory, returning the lot used if any."""
+        lot = self.inventory_items.draw(food_name, quantity * self.portions / 100)
+        if lot is None:
+            return None
+        
+        if food_name not in self.inventory_items:
+            self.scoring_engine.remove_inventory(food_name)
+        elif self.inventory_items[food_name]['expires'] != lot['expires']:
+            # The next lot has its own expiry, so the bonus changes with it
+            self.scoring_engine.refresh_inventory(self.inventory_items, self.plan_date)
+        return lot
+    
+    def reserve_inventory(self, meal_plan_items: List[Dict]) -> None:
         """
-        Generate an optimized weekly meal plan.
+        Take out of inventory what a plan's saved items already use, e.g. before regenerating one of its meals.
+        
+        Saved quantities are already sized for the servings they feed.
+        """
+        for item in meal_plan_items:
+            if item['uses_inventory']:
+                self.inventory_items.draw(item['food_name'].lower().replace(' ', '_'), item['quantity'] / 100)
+        self._reset_scoring()
+    
+    def _expire_inventory(self, day: int) -> None:
+        """Retire inventory that has expired by the given day of the plan and rescore the rest."""
+        if self.start_date is None:
+            return
+        self.plan_date = self.start_date + timedelta(days=day)
+        self.inventory_items.expire_before(self.plan_date)
+        self.scoring_engine.refresh_inventory(self.inventory_items, self.plan_date)
+    
+    def _expiring_unused(self) -> List[Dict[str, Any]]:
+        """Inventory lots the plan leaves to expire: retired during the plan or expiring by its last day."""
+        if self.start_date is None:
+            return []
+        last_day = self.start_date + timedelta(days=self.days - 1)
+        lots = self.inventory_items.expired + [lot for _, lot in self.inventory_items.expiring_by(last_day)]
+        return [
+            {
+                'inventory_item_id': str(lot['id']) if lot['id'] else None,
+                'name': lot['name'],
+                'food_name': lot['food_name'],
+                'quantity_left': round(lot['quantity'], 2),
+                'expiration_date': lot['expires'].isoformat(),
+                'days_after_start': (lot['expires'] - self.start_date).days
+            }
+            for lot in lots
+        ]
+    
+    def _make_meal_item(self,
+                        day: int,
+                        meal_type: str,
+                        food_name: str,
+                        quantity: float,
+                        inv_item: Optional[Dict] = None) -> Tuple[Dict, Dict[str, float]]:
+        """Build a meal plan item and its nutrition for a quantity of a food."""
+        food_data = self.food_db.get_food(food_name)
+        nutrition = self.food_db.calculate_nutrition(food_name, quantity)
+        uses_inventory = inv_item is not None
+        inventory_item_id = inv_item['id'] if uses_inventory else None
+        
+        meal_item = {
+            'day_of_week': day % 7,
+            'day_index': day,
+            'meal_type': meal_type,
+            'food_name': food_name.replace('_', ' ').title(),
+            'quantity': quantity,
+            'unit': food_data['unit'],
+            'estimated_cost': nutrition['cost'],
+            'calories': nutrition['calories'],
+            'protein': nutrition['protein'],
+            'carbs': nutrition['carbs'],
+            'fats': nutrition['fats'],
+            'uses_inventory': uses_inventory,
+            'inventory_item_id': str(inventory_item_id) if inventory_item_id else None,
+            'notes': f"From inventory - use by {inv_item.get('expiration_date')}" if uses_inventory and inv_item.get('expiration_date') else None
+        }
+        return meal_item, nutrition
+    
+    def optimize_weekly_plan(self,
+                             mode: str = 'greedy',
+                             time_limit: float = 5.0,
+                             deadline_ms: Optional[float] = None,
+                             seed: Optional[int] = None,
+                             restarts: int = 8,
+                             workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Generate an optimized meal plan over the planning horizon (one week by default).
+        
+        Args:
+            mode: 'greedy' fills one meal slot at a time; 'lp' and 'milp' solve
+                servings for the whole horizon at once (fractional or whole servings);
+                'anytime' improves the greedy plan by local search until the deadline;
+                'multistart' runs several seeded restarts from perturbed greedy plans
+                in worker processes and keeps the best
+            time_limit: Solver time limit in seconds for 'lp' and 'milp'
+            deadline_ms: Time budget in milliseconds; overrides time_limit when given
+            seed: Random seed for the 'anytime' and 'multistart' searches
+            restarts: Number of restarts for 'multistart'
+            workers: Worker processes for 'multistart'; defaults to the available cores
         
         Returns:
             Dictionary containing the meal plan, shopping list, and analysis
         """
+        if mode in ('lp', 'milp'):
+            if deadline_ms is not None:
+                time_limit = deadline_ms / 1000
+            return self._optimize_lp(mode, time_limit)
+        if mode == 'anytime':
+            return self._optimize_anytime(deadline_ms or self.DEFAULT_DEADLINE_MS, seed)
+        if mode == 'multistart':
+            return self._optimize_multistart(restarts, deadline_ms, seed or 0, workers)
+        if mode != 'greedy':
+            raise ValueError(f"Unknown optimization mode: {mode}")
+        
+        meal_plan_items, weekly_nutrition, total_cost = self._greedy_plan()
+        return self._build_result(meal_plan_items, weekly_nutrition, total_cost, {'mode': 'greedy'})
+    
+    def stream_weekly_plan(self, mode: str = 'greedy', **options: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Plan like optimize_weekly_plan, handing out each day as soon as it is ready.
+        
+        Greedy plans are produced day by day; the other engines solve the whole
+        horizon first and then hand out its days.
+        
+        Args:
+            mode: Optimization engine, as for optimize_weekly_plan
+            **options: Further engine options passed to optimize_weekly_plan
+        
+        Yields:
+            A 'day' frame per planned day (see day_frame), then a final
+            {'type': 'result', 'result': ...} frame with the full plan result
+        """
+        if mode != 'greedy':
+            result = self.optimize_weekly_plan(mode=mode, **options)
+            yield from self.day_frames(result['meal_plan_items'])
+            yield {'type': 'result', 'result': result}
+            return
+        
         meal_plan_items = []
-        daily_budgets = self.budget / 7
         total_cost = 0.0
-        
         weekly_nutrition = defaultdict(lambda: defaultdict(float))
         
-        # Generate meals for each day
-        for day in range(7):  # 0 = Monday, 6 = Sunday
+        for plan_day in self.iter_plan_days():
+            meal_plan_items.extend(plan_day['items'])
+            for item in plan_day['items']:
+                total_cost += item['estimated_cost']
+            for nutrient, value in plan_day['nutrition'].items():
+                weekly_nutrition[plan_day['day']][nutrient] = value
+            yield self.day_frame(plan_day['day'], plan_day['items'], total_cost)
+        
+        result = self._build_result(meal_plan_items, weekly_nutrition, total_cost, {'mode': 'greedy'})
+        yield {'type': 'result', 'result': result}
+    
+    @staticmethod
+    def day_frame(day: int, items: List[Dict], running_total: float) -> Dict[str, Any]:
+        """One day of a plan with its nutrition, cost and the plan's running total."""
+        return {
+            'type': 'day',
+            'day_index': day,
+            'day_of_week': day % 7,
+            'items': items,
+            'nutrition': {
+                nutrient: round(sum(item[nutrient] for item in items), 1)
+                for nutrient in ('calories', 'protein', 'carbs', 'fats')
+            },
+            'day_cost': round(sum(item['estimated_cost'] for item in items), 2),
+            'running_total': round(running_total, 2)
+        }
+    
+    @classmethod
+    def day_frames(cls, meal_plan_items: List[Dict]) -> Iterator[Dict[str, Any]]:
+        """Split finished plan items, ordered by day, into day frames."""
+        running_total = 0.0
+        for day, items in itertools.groupby(meal_plan_items, key=lambda item: item['day_index']):
+            items = list(items)
+            running_total += sum(item['estimated_cost'] for item in items)
+            yield cls.day_frame(day, items, running_total)
+    
+    def budget_sweep(self, budgets: List[float], mode: str = 'greedy', **options: Any) -> Dict[str, Any]:
+        """
+        Plan the week at several budgets, sharing catalog and inventory preprocessing.
+        
+        Every point starts from the same inventory; the optimizer's own budget and
+        inventory are restored afterwards.
+        
+        Args:
+            budgets: Weekly budgets to evaluate
+            mode: Optimization engine, as for optimize_weekly_plan
+            **options: Further engine options passed to optimize_weekly_plan
+        
+        Returns:
+            Dictionary with one point per budget and the Pareto frontier of
+            (total_cost, overall_score)
+        """
+        initial_budget = self.budget
+        initial_inventory = copy.deepcopy(self.inventory_items)
+        points = []
+        
+        try:
+            for budget in budgets:
+                self.budget = budget
+                self._reset_inventory(copy.deepcopy(initial_inventory))
+                result = self.optimize_weekly_plan(mode=mode, **options)
+                analysis = result['nutrition_analysis']
+                points.append({
+                    'budget': budget,
+                    'total_cost': result['total_cost'],
+                    'budget_utilization': result['budget_utilization'],
+                    'overall_score': analysis['overall_score'],
+                    'weekly_averages': analysis['weekly_averages'],
+                    'meals_from_inventory': result['inventory_usage']['meals_from_inventory']
+                })
+        finally:
+            self.budget = initial_budget
+            self._reset_inventory(initial_inventory)
+        
+        return {'points': points, 'frontier': self.pareto_frontier(points)}
+    
+    @staticmethod
+    def pareto_frontier(points: List[Dict]) -> List[Dict]:
+        """Keep the points no other point beats on both lower cost and higher nutrition score."""
+        frontier = []
+        best_score = float('-inf')
+        for point in sorted(points, key=lambda p: (p['total_cost'], -p['overall_score'])):
+            if point['overall_score'] > best_score:
+                frontier.append(point)
+                best_score = point['overall_score']
+        return frontier
+    
+    def optimize_household(self, members: List[Dict], mode: str = 'greedy', **options: Any) -> Dict[str, Any]:
+        """
+        Plan the week for a household, sharing one budget, inventory and shopping list.
+        
+        Members with the same dietary restrictions eat the same meals, so the
+        optimizer runs once per distinct restriction profile rather than once
+        per member. Each run plans one adult's servings on an adult's share of
+        the budget and draws inventory for the whole group; items are then
+        scaled up to the group's portions. Groups draw from the shared
+        inventory in turn, largest first. The optimizer's own budget,
+        restrictions and portions are restored afterwards.
+        
+        Args:
+            members: One dict per person with 'name', optional 'dietary_restrictions'
+                and optional 'portion' (share of an adult's intake, 1.0 by default);
+                the first member is the account holder
+            mode: Optimization engine, as for optimize_weekly_plan
+            **options: Further engine options passed to optimize_weekly_plan
+        
+        Returns:
+            Plan result as from optimize_weekly_plan for the whole household, with
+            the account holder's nutrition analysis and a 'household' entry with
+            per-group plans and per-member nutrition targets; each item's
+            'household_group' is its group's position in household['groups']
+        """
+        if not members:
+            raise ValueError("A household needs at least one member")
+        
+        groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        for position, member in enumerate(members):
+            portion = float(member.get('portion', 1.0))
+            if portion <= 0:
+                raise ValueError(f"Portion for {member.get('name')} must be positive")
+            restrictions = member.get('dietary_restrictions') or ''
+            group = groups.setdefault(DietaryRules.canonical_profile(restrictions), {
+                'restrictions': restrictions, 'members': [], 'portions': 0.0, 'first': position
+            })
+            group['members'].append({**member, 'portion': portion, 'position': position})
+            group['portions'] += portion
+        total_portions = sum(group['portions'] for group in groups.values())
+        
+        person_budget = self.budget / total_portions
+        meal_order = list(self.MEAL_COMPOSITION)
+        meal_plan_items = []
+        total_cost = 0.0
+        group_results = []
+        
+        ordered = sorted(groups.values(), key=lambda group: (-group['portions'], group['first']))
+        for group_index, group in enumerate(ordered):
+            with self._planning_group(group['restrictions'], group['portions'], person_budget):
+                # Later groups continue from whatever inventory earlier groups left
+                self._reset_inventory(self.inventory_items)
+                result = self.optimize_weekly_plan(mode=mode, **options)
+            
+            names = ', '.join(member['name'] for member in group['members'])
+            for item in result['meal_plan_items']:
+                item = self._scale_meal_item(item, group['portions'], names, group_index)
+                meal_plan_items.append(item)
+                total_cost += item['estimated_cost']
+            group_results.append((group, result))
+        
+        meal_plan_items.sort(key=lambda item: (item['day_index'], meal_order.index(item['meal_type'])))
+        
+        household_groups = []
+        household_members: List[Optional[Dict]] = [None] * len(members)
+        holder_analysis = None
+        for group, result in group_results:
+            analysis = result['nutrition_analysis']
+            if group['first'] == 0:
+                holder_analysis = analysis
+            household_groups.append({
+                'members': [member['name'] for member in group['members']],
+                'dietary_restrictions': group['restrictions'],
+                'portions': group['portions'],
+                'total_cost': round(result['total_cost'] * group['portions'], 2),
+                'overall_score': analysis['overall_score'],
+                'optimization': result['optimization']
+            })
+            for member in group['members']:
+                household_members[member['position']] = {
+                    'name': member['name'],
+                    'dietary_restrictions': group['restrictions'],
+                    'portion': member['portion'],
+                    'daily_targets': {
+                        nutrient: {bound: round(value * member['portion'], 1) for bound, value in requirement.items()}
+                        for nutrient, requirement in self.nutrition_rules.DAILY_REQUIREMENTS.items()
+                    },
+                    'weekly_averages': {
+                        nutrient: round(value * member['portion'], 1)
+                        for nutrient, value in analysis['weekly_averages'].items()
+                    },
+                    'overall_score': analysis['overall_score']
+                }
+        
+        result = self._build_result(meal_plan_items, {}, total_cost, group_results[0][1]['optimization'],
+                                    nutrition_analysis=holder_analysis)
+        result['household'] = {
+            'size': len(members),
+            'portions': total_portions,
+            'groups': household_groups,
+            'members': household_members
+        }
+        return result
+    
+    def regenerate_group_meal(self,
+                              household: Dict[str, Any],
+                              group_index: int,
+                              day: int,
+                              meal_type: str,
+                              remaining_budget: float,
+                              daily_nutrition: Dict[str, float],
+                              exclude_foods: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Re-plan one household group's share of a meal, as regenerate_meal does for one person.
+        
+        Args:
+            household: 'household' entry of the plan result from optimize_household
+            group_index: Position of the group in household['groups']
+            day: Day of the meal
+            meal_type: Meal to re-plan
+            remaining_budget: The group's budget left for the day once its other meals are paid for
+            daily_nutrition: Nutrient totals of the group's other meals that day
+            exclude_foods: Foods to avoid, e.g. the ones in the group's rejected meal
+        
+        Returns:
+            New meal plan items for the group, scaled to its portions
+        """
+        group = household['groups'][group_index]
+        portions = group['portions']
+        with self._planning_group(group['dietary_restrictions'], portions, self.budget / household['portions']):
+            items = self.regenerate_meal(
+                day=day,
+                meal_type=meal_type,
+                remaining_budget=remaining_budget / portions,
+                daily_nutrition={nutrient: value / portions for nutrient, value in daily_nutrition.items()},
+                exclude_foods=exclude_foods
+            )
+        names = ', '.join(group['members'])
+        return [self._scale_meal_item(item, portions, names, group_index) for item in items]
+    
+    @contextmanager
+    def _planning_group(self, dietary_restrictions: str, portions: float, budget: float) -> Iterator[None]:
+        """
+        Plan one adult's servings for a household group inside the block, then restore this optimizer's own.
+        
+        The scoring engine caches each slot's candidates for the restrictions in
+        force, so it is rebuilt on the way in and out of the block.
+        """
+        initial = (self.budget, self.portions, self.dietary_restrictions, self.restriction_profile)
+        self.budget = budget
+        self.portions = portions
+        self.dietary_restrictions = dietary_restrictions or ''
+        self.restriction_profile = DietaryRules.canonical_profile(self.dietary_restrictions)
+        self._reset_scoring()
+        try:
+            yield
+        finally:
+            self.budget, self.portions, self.dietary_restrictions, self.restriction_profile = initial
+            self._reset_scoring()
+    
+    @staticmethod
+    def _scale_meal_item(item: Dict, portions: float, names: str, group_index: int) -> Dict:
+        """Copy of a one-person meal item sized for a household group, noting who it is for."""
+        scaled = dict(item)
+        scaled['household_group'] = group_index
+        scaled['quantity'] = round(item['quantity'] * portions, 1)
+        for field in ('estimated_cost', 'calories', 'protein', 'carbs', 'fats'):
+            scaled[field] = item[field] * portions
+        notes = f"For {names}" + (f"; {item['notes']}" if item['notes'] else '')
+        scaled['notes'] = notes if len(notes) <= 200 else notes[:197] + '...'
+        return scaled
+    
+    def iter_plan_days(self, choices: Optional[List[Tuple]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Plan the horizon greedily, one day at a time.
+        
+        Inventory draw-down and expiry carry from each day into the next; nothing
+        else is kept between days, so memory does not grow with the horizon.
+        
+        Args:
+            choices: Optional list collecting (day, meal_type, category, index) per slot
+        
+        Yields:
+            Dictionary with the day index, its meal items, nutrition totals and cost
+        """
+        daily_budgets = self.budget / 7
+        
+        for day in range(self.days):
+            self._expire_inventory(day)
             daily_nutrition = {
                 'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0, 'fiber': 0
             }
             remaining_budget = daily_budgets
+            day_items = []
             
             # Generate meals for each meal type
             for meal_type in ['breakfast', 'lunch', 'dinner', 'snack']:
                 meal_items = self._select_meal_items(
-                    meal_type, day, remaining_budget, daily_nutrition
+                    meal_type, day, remaining_budget, daily_nutrition, choices
                 )
                 
                 for item in meal_items:
-                    meal_plan_items.append(item)
-                    total_cost += item['estimated_cost']
+                    day_items.append(item)
                     remaining_budget -= item['estimated_cost']
             
+            yield {
+                'day': day,
+                'items': day_items,
+                'nutrition': daily_nutrition,
+                'cost': sum(item['estimated_cost'] for item in day_items)
+            }
+    
+    def _greedy_plan(self, choices: Optional[List[Tuple]] = None) -> Tuple[List[Dict], Dict, float]:
+        """Fill every meal slot of the horizon greedily, one slot at a time."""
+        meal_plan_items = []
+        total_cost = 0.0
+        
+        weekly_nutrition = defaultdict(lambda: defaultdict(float))
+        
+        for plan_day in self.iter_plan_days(choices):
+            meal_plan_items.extend(plan_day['items'])
+            for item in plan_day['items']:
+                total_cost += item['estimated_cost']
+            
             # Store daily nutrition
-            for nutrient, value in daily_nutrition.items():
-                weekly_nutrition[day][nutrient] = value
+            for nutrient, value in plan_day['nutrition'].items():
+                weekly_nutrition[plan_day['day']][nutrient] = value
+        
+        return meal_plan_items, weekly_nutrition, total_cost
+    
+    def _search_seed(self) -> Tuple[List[Tuple], PlanObjective, np.ndarray, List[np.ndarray], np.ndarray]:
+        """Build the greedy seed plan and everything a local search over it needs."""
+        initial_inventory = copy.deepcopy(self.inventory_items)
+        slots = []
+        self._greedy_plan(choices=slots)
+        self._reset_inventory(initial_inventory)
+        
+        slot_days = np.array([slot[0] for slot in slots], dtype=int)
+        slot_candidates = [
+            self.compatibility_index.candidates(self.restriction_profile, slot[2])
+            for slot in slots
+        ]
+        choices = np.array([slot[3] for slot in slots], dtype=int)
+        return slots, self._plan_objective(), slot_days, slot_candidates, choices
+    
+    def _optimize_anytime(self, deadline_ms: float, seed: Optional[int]) -> Dict[str, Any]:
+        """Seed with the greedy plan, then improve it by local search until the deadline."""
+        started = time.perf_counter()
+        slots, objective, slot_days, slot_candidates, choices = self._search_seed()
+        
+        search = AnytimeSearch(
+            objective=objective,
+            slot_days=slot_days,
+            slot_candidates=slot_candidates,
+            choices=choices,
+            deadline=started + deadline_ms / 1000,
+            seed=seed
+        )
+        outcome = search.run()
+        
+        meal_plan_items, weekly_nutrition, total_cost = self._materialize_choices(slots, outcome['choices'])
+        return self._build_result(meal_plan_items, weekly_nutrition, total_cost, {
+            'mode': 'anytime',
+            'deadline_ms': deadline_ms,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'converged': outcome['converged'],
+            'iterations': outcome['iterations'],
+            'improvements': outcome['improvements'],
+            'initial_objective': outcome['initial_objective'],
+            'final_objective': outcome['final_objective'],
+        })
+    
+    def _optimize_multistart(self,
+                             restarts: int,
+                             deadline_ms: Optional[float],
+                             seed: int,
+                             workers: Optional[int]) -> Dict[str, Any]:
+        """Run seeded local-search restarts from perturbed greedy plans in parallel."""
+        started = time.perf_counter()
+        wall_deadline = time.time() + deadline_ms / 1000 if deadline_ms is not None else None
+        slots, objective, slot_days, slot_candidates, choices = self._search_seed()
+        
+        search = MultiStartSearch(
+            objective=objective,
+            slot_days=slot_days,
+            slot_candidates=slot_candidates,
+            choices=choices,
+            restarts=restarts,
+            seed=seed,
+            wall_deadline=wall_deadline,
+            workers=workers
+        )
+        outcome = search.run()
+        
+        meal_plan_items, weekly_nutrition, total_cost = self._materialize_choices(slots, outcome['choices'])
+        return self._build_result(meal_plan_items, weekly_nutrition, total_cost, {
+            'mode': 'multistart',
+            'deadline_ms': deadline_ms,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            'seed': seed,
+            'restarts': outcome['restarts'],
+            'workers': outcome['workers'],
+            'best_restart': outcome['restart'],
+            'converged': outcome['converged'],
+            'iterations': outcome['iterations'],
+            'initial_objective': outcome['initial_objective'],
+            'final_objective': outcome['final_objective'],
+            'restart_objectives': outcome['restart_objectives'],
+        })
+    
+    def _plan_objective(self) -> PlanObjective:
+        """Build the local-search objective for this optimizer's budget and inventory."""
+        arrays = self.catalog_arrays
+        inventory_servings = {}
+        for food_name, inv_item in self.inventory_items.items():
+            idx = arrays.index.get(food_name)
+            if idx is not None and inv_item['quantity'] > 0:
+                # Inventory is drawn while any quantity is left (see _draw_inventory)
+                inventory_servings[idx] = math.ceil(
+                    inv_item['quantity'] / self.portions / (arrays.serving_size[idx] / 100)
+                )
+        
+        return PlanObjective(
+            serving_cost=arrays.serving_cost,
+            serving_nutrients=arrays.nutrient_matrix,
+            requirements=[self.nutrition_rules.DAILY_REQUIREMENTS[n] for n in arrays.NUTRIENTS],
+            budget=self.plan_budget,
+            days=self.days,
+            inventory_servings=inventory_servings
+        )
+    
+    def _reset_inventory(self, inventory_items: InventoryQueue) -> None:
+        """Restore inventory to an earlier state, e.g. before replaying a plan."""
+        self.inventory_items = inventory_items
+        self.plan_date = self.start_date
+        self._reset_scoring()
+    
+    def _reset_scoring(self) -> None:
+        """Start a fresh scoring engine, dropping the per-slot candidates it cached."""
+        self.scoring_engine = ScoringEngine(self.catalog_arrays, self.inventory_items, self.plan_date)
+    
+    def _materialize_choices(self, slots: List[Tuple], choices: np.ndarray) -> Tuple[List[Dict], Dict, float]:
+        """Turn per-slot food choices into meal items, drawing inventory in plan order."""
+        arrays = self.catalog_arrays
+        meal_plan_items = []
+        total_cost = 0.0
+        weekly_nutrition = defaultdict(lambda: defaultdict(float))
+        
+        current_day = None
+        for (day, meal_type, _, _), idx in zip(slots, choices):
+            if day != current_day:
+                self._expire_inventory(day)
+                current_day = day
+            food_name = arrays.names[idx]
+            quantity = self.food_db.get_food(food_name)['serving_size']
+            inv_item = self._draw_inventory(food_name, quantity)
+            meal_item, nutrition = self._make_meal_item(day, meal_type, food_name, quantity, inv_item)
+            meal_plan_items.append(meal_item)
+            total_cost += nutrition['cost']
+            for nutrient in arrays.NUTRIENTS:
+                weekly_nutrition[day][nutrient] += nutrition[nutrient]
+        
+        return meal_plan_items, weekly_nutrition, total_cost
+    
+    def _optimize_lp(self, mode: str, time_limit: float) -> Dict[str, Any]:
+        """Solve the whole horizon as one linear program over servings per food per day."""
+        arrays = self.catalog_arrays
+        nutrients = list(self.nutrition_rules.DAILY_REQUIREMENTS)
+        allowed = self.compatibility_index.allowed_mask(self.restriction_profile)
+        inventory_indices = [arrays.index[name] for name in self.inventory_items
+                             if name in arrays.index and allowed[arrays.index[name]]]
+        candidates = self._lp_candidates(allowed, inventory_indices)
+        
+        # Inventory capacity in servings per lot, using the same draw-down rate as
+        # _draw_inventory, and the number of plan days before each lot expires
+        inventory = []
+        inventory_days = []
+        for food_name in self.inventory_items:
+            idx = arrays.index.get(food_name)
+            if idx is None or not allowed[idx]:
+                continue
+            pos = int(np.searchsorted(candidates, idx))
+            for lot in self.inventory_items.lots(food_name):
+                inventory.append((pos, max(lot['quantity'], 0) / self.portions / (arrays.serving_size[idx] / 100)))
+                usable_days = self.days
+                if self.start_date is not None and lot['expires'] is not None:
+                    usable_days = min(max((lot['expires'] - self.start_date).days + 1, 0), self.days)
+                inventory_days.append(usable_days)
+        
+        planner = LPMealPlanner(
+            serving_cost=arrays.serving_cost[candidates],
+            serving_nutrients=np.vstack([arrays.serving_nutrients[n][candidates] for n in nutrients]),
+            requirements=[self.nutrition_rules.DAILY_REQUIREMENTS[n] for n in nutrients],
+            days=self.days,
+            budget=self.plan_budget,
+            inventory=inventory,
+            inventory_days=inventory_days,
+            integral=(mode == 'milp'),
+            time_limit=time_limit
+        )
+        solution = planner.solve()
+        
+        if solution is None:
+            result = self.optimize_weekly_plan(mode='greedy')
+            result['optimization'] = {'mode': mode, 'status': 'fallback',
+                                      'message': 'No LP solution within the time limit'}
+            return result
+        
+        meal_order = list(self.MEAL_COMPOSITION)
+        meal_plan_items = []
+        total_cost = 0.0
+        weekly_nutrition = defaultdict(lambda: defaultdict(float))
         
+        for day in range(self.days):
+            self._expire_inventory(day)
+            daily_nutrition = weekly_nutrition[day]
+            day_items = []
+            servings = solution['servings'][day]
+            # Lots of one food are drawn first-expired-first-out, so only their total matters here
+            from_inventory = defaultdict(float)
+            for (pos, _), amount in zip(inventory, solution['inventory_servings'][day]):
+                from_inventory[pos] += amount
+            remaining_cals = {
+                meal_type: self.nutrition_rules.get_meal_requirement('calories', meal_type)
+                for meal_type in meal_order
+            }
+            
+            # Place the biggest calorie contributors first so they land in the meals that need them
+            chosen = np.flatnonzero(servings > self.LP_MIN_SERVINGS)
+            chosen_cals = arrays.serving_nutrients['calories'][candidates[chosen]] * servings[chosen]
+            for pos in chosen[np.argsort(-chosen_cals, kind='stable')]:
+                idx = candidates[pos]
+                food_name = arrays.names[idx]
+                meal_type = self._lp_meal_type(arrays.categories[idx], remaining_cals)
+                inventory_servings = min(from_inventory.get(pos, 0.0), servings[pos])
+                
+                for part, use_inventory in ((inventory_servings, True),
+                                            (servings[pos] - inventory_servings, False)):
+                    if part <= self.LP_MIN_SERVINGS:
+                        continue
+                    quantity = round(float(part * arrays.serving_size[idx]), 1)
+                    inv_item = self._draw_inventory(food_name, quantity) if use_inventory else None
+                    meal_item, nutrition = self._make_meal_item(
+                        day, meal_type, food_name, quantity, inv_item
+                    )
+                    day_items.append(meal_item)
+                    total_cost += nutrition['cost']
+                    remaining_cals[meal_type] -= nutrition['calories']
+                    for nutrient in nutrients:
+                        daily_nutrition[nutrient] += nutrition[nutrient]
+            
+            day_items.sort(key=lambda item: meal_order.index(item['meal_type']))
+            meal_plan_items.extend(day_items)
+        
+        return self._build_result(meal_plan_items, weekly_nutrition, total_cost, {
+            'mode': mode,
+            'status': 'optimal' if solution['status'] == 0 else 'time_limit',
+            'message': solution['message'],
+        })
+    
+    def _lp_candidates(self, allowed: np.ndarray, inventory_indices: List[int]) -> np.ndarray:
+        """
+        Limit the LP to a bounded candidate set so solve time does not grow with the catalog.
+        
+        Keeps the foods with the most of each nutrient per unit cost, the cheapest
+        servings overall, and every usable inventory food.
+        """
+        candidates = np.flatnonzero(allowed)
+        if candidates.size <= self.LP_CANDIDATE_LIMIT:
+            return candidates
+        
+        arrays = self.catalog_arrays
+        per_rank = self.LP_CANDIDATE_LIMIT // (len(arrays.NUTRIENTS) + 1)
+        cost = np.maximum(arrays.serving_cost[candidates], 1e-9)
+        keep = [candidates[np.argsort(cost, kind='stable')[:per_rank]], np.array(inventory_indices, dtype=int)]
+        for nutrient in arrays.NUTRIENTS:
+            value_per_cost = arrays.serving_nutrients[nutrient][candidates] / cost
+            keep.append(candidates[np.argsort(-value_per_cost, kind='stable')[:per_rank]])
+        return np.unique(np.concatenate(keep))
+    
+    def _lp_meal_type(self, category: str, remaining_cals: Dict[str, float]) -> str:
+        """Assign a food to the meal that uses its category and still needs the most calories."""
+        eligible = [meal_type for meal_type, categories in self.MEAL_COMPOSITION.items()
+                    if category in categories] or ['lunch', 'dinner']
+        return max(eligible, key=lambda meal_type: remaining_cals[meal_type])
+    
+    def analyze_plan(self, meal_plan_items: List[Dict], household: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Rebuild the shopping list, nutrition analysis and alternatives of a plan's items as they stand.
+        
+        Nutrition is recomputed from each item's food and quantity. In household
+        plans it is the first member's, from one serving of their group's items,
+        as optimize_household reports it.
+        
+        Args:
+            meal_plan_items: Every item of the plan, e.g. after a meal was regenerated
+            household: 'household' entry of the plan result from optimize_household
+        
+        Returns:
+            Plan result in the shape optimize_weekly_plan returns
+        """
+        holder_group, portions = None, 1.0
+        if household:
+            holder = household['members'][0]['name']
+            holder_group = next(index for index, group in enumerate(household['groups'])
+                                if holder in group['members'])
+            portions = household['groups'][holder_group]['portions']
+        
+        weekly_nutrition = defaultdict(lambda: defaultdict(float))
+        for item in meal_plan_items:
+            if item.get('household_group') != holder_group:
+                continue
+            food_name = item['food_name'].lower().replace(' ', '_')
+            nutrition = self.food_db.calculate_nutrition(food_name, item['quantity'] / portions)
+            for nutrient in self.catalog_arrays.NUTRIENTS:
+                weekly_nutrition[item['day_index']][nutrient] += nutrition.get(nutrient, 0)
+        
+        total_cost = sum(item['estimated_cost'] for item in meal_plan_items)
+        return self._build_result(meal_plan_items, weekly_nutrition, total_cost, {'mode': 'greedy'})
+    
+    def _build_result(self,
+                      meal_plan_items: List[Dict],
+                      weekly_nutrition: Dict,
+                      total_cost: float,
+                      optimization: Dict[str, Any],
+                      nutrition_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Assemble the plan result with shopping list, analysis and alternatives."""
         # Generate shopping list (items not from inventory)
         shopping_list = self._generate_shopping_list(meal_plan_items)
         
         # Generate nutrition analysis
-        nutrition_analysis = self._analyze_nutrition(weekly_nutrition)
+        if nutrition_analysis is None:
+            nutrition_analysis = self._analyze_nutrition(weekly_nutrition)
         
         # Generate alternatives for expensive items
         alternatives = self._suggest_alternatives(meal_plan_items, shopping_list)
@@ -632,12 +2159,15 @@ class MealOptimizer:
             'meal_plan_items': meal_plan_items,
             'shopping_list': shopping_list,
             'total_cost': round(total_cost, 2),
-            'budget': self.budget,
-            'budget_remaining': round(self.budget - total_cost, 2),
-            'budget_utilization': round((total_cost / self.budget * 100), 1) if self.budget > 0 else 0,
+            'days': self.days,
+            'budget': self.plan_budget,
+            'budget_remaining': round(self.plan_budget - total_cost, 2),
+            'budget_utilization': round((total_cost / self.plan_budget * 100), 1) if self.plan_budget > 0 else 0,
             'nutrition_analysis': nutrition_analysis,
             'alternatives': alternatives,
             'inventory_usage': self._calculate_inventory_usage(meal_plan_items),
+            'optimization': optimization,
+            'catalog_version': self.food_db.tag,
             'generated_at': datetime.now().isoformat()
         }
     
@@ -687,7 +2217,7 @@ class MealOptimizer:
         
         # Calculate weekly averages
         weekly_averages = {
-            nutrient: round(total / 7, 1)
+            nutrient: round(total / self.days, 1)
             for nutrient, total in weekly_totals.items()
         }
         
@@ -715,28 +2245,31 @@ class MealOptimizer:
         return round(score)
     
     def _suggest_alternatives(self, meal_items: List[Dict], shopping_list: List[Dict]) -> List[Dict]:
-        """Suggest cheaper alternatives for expensive items."""
+        """Suggest the cheapest same-category alternatives for expensive items."""
         alternatives = []
+        index = self.food_db.get_alternatives_index()
         
         # Find expensive items (top 5 by cost)
         expensive_items = sorted(shopping_list, key=lambda x: x['estimated_cost'], reverse=True)[:5]
         
         for item in expensive_items:
             food_name = item['item'].lower().replace(' ', '_')
-            alternative_foods = self.food_db.find_alternatives(food_name, max_cost_ratio=0.8)
+            # Top 3 by savings; every one is at least 20% cheaper per 100g
+            alternative_foods = self.food_db.find_alternatives(food_name, max_cost_ratio=0.8, k=3)
             
             if alternative_foods:
                 food_data = self.food_db.get_food(food_name)
                 alt_suggestions = []
                 
-                for alt_name in alternative_foods[:3]:  # Top 3 alternatives
+                for alt_name in alternative_foods:
                     alt_data = self.food_db.get_food(alt_name)
-                    savings = (food_data['cost_per_100g'] - alt_data['cost_per_100g']) * item['quantity']
+                    savings = (food_data['cost_per_100g'] - alt_data['cost_per_100g']) * item['quantity'] / 100
                     
                     alt_suggestions.append({
                         'name': alt_name.replace('_', ' ').title(),
                         'cost_per_100g': alt_data['cost_per_100g'],
-                        'estimated_savings': round(savings, 2)
+                        'estimated_savings': round(savings, 2),
+                        'nutrient_distance': round(index.nutrient_distance(food_name, alt_name), 2)
                     })
                 
                 if alt_suggestions:
@@ -760,5 +2293,6 @@ class MealOptimizer:
             'meals_from_inventory': len(inventory_items),
             'inventory_usage_percentage': round((len(inventory_items) / total_items * 100), 1) if total_items > 0 else 0,
             'estimated_cost_saved': round(inventory_cost_saved, 2),
-            'waste_reduction': f"{len(inventory_items)} items used from inventory to reduce waste"
+            'waste_reduction': f"{len(inventory_items)} items used from inventory to reduce waste",
+            'expiring_unused': self._expiring_unused()
         }
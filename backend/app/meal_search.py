@@ -0,0 +1,382 @@
+"""
+Meal Plan Local Search
+Improves a seeded meal plan by swapping foods between slots under a time budget
+"""
+import atexit
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+
+class PlanObjective:
+    """Combined cost, nutrition and inventory objective for a plan (lower is better)."""
+
+    COST_WEIGHT = 10.0          # per 100% of the budget spent
+    OVER_BUDGET_WEIGHT = 100.0  # per 100% of the budget overspent
+    NUTRITION_WEIGHT = 100.0    # per 100% of a nutrient's optimal outside its band, per day
+    INVENTORY_WEIGHT = 1.0      # per serving taken from inventory
+    VARIETY_WEIGHT = 2.0        # per unit of sum(count^2) / slots, so repeats cost more
+
+    def __init__(self,
+                 serving_cost: np.ndarray,
+                 serving_nutrients: np.ndarray,
+                 requirements: List[Dict[str, float]],
+                 budget: float,
+                 days: int,
+                 inventory_servings: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            serving_cost: Cost of one serving for every catalog food
+            serving_nutrients: Nutrients per serving, shape (foods, nutrients)
+            requirements: Daily min/max/optimal band for each nutrient column
+            budget: Budget for the whole plan
+            days: Number of days in the plan
+            inventory_servings: Catalog index -> servings available from inventory
+        """
+        self.serving_cost = serving_cost
+        self.serving_nutrients = serving_nutrients
+        self.mins = np.array([req['min'] for req in requirements], dtype=float)
+        self.maxs = np.array([req['max'] for req in requirements], dtype=float)
+        self.optimal = np.array([req['optimal'] for req in requirements], dtype=float)
+        self.budget = budget
+        self.days = days
+        self.inventory_servings = inventory_servings or {}
+
+    def cost_term(self, total_cost):
+        """Penalty for spending, steeper once over budget. Accepts a scalar or an array."""
+        if self.budget <= 0:
+            return self.OVER_BUDGET_WEIGHT * total_cost
+        over = np.maximum(total_cost - self.budget, 0.0)
+        return (self.COST_WEIGHT * total_cost + self.OVER_BUDGET_WEIGHT * over) / self.budget
+
+    def day_penalty(self, day_totals: np.ndarray) -> np.ndarray:
+        """Band penalty of each row of daily nutrient totals."""
+        below = np.maximum(self.mins - day_totals, 0.0)
+        above = np.maximum(day_totals - self.maxs, 0.0)
+        return self.NUTRITION_WEIGHT * ((below + above) / self.optimal).sum(axis=-1) / self.days
+
+    def nutrition_term(self, day_totals: np.ndarray) -> float:
+        """Penalty for daily nutrient totals outside their bands."""
+        return float(self.day_penalty(day_totals).sum())
+
+    def inventory_term(self, food_counts: Dict[int, int]) -> float:
+        """Reward for servings that can be taken from inventory."""
+        used = sum(min(food_counts.get(idx, 0), available)
+                   for idx, available in self.inventory_servings.items())
+        return -self.INVENTORY_WEIGHT * used
+
+    def variety_term(self, food_counts: Dict[int, int], slot_count: int) -> float:
+        """Penalty for serving the same foods over and over."""
+        if slot_count == 0:
+            return 0.0
+        return self.VARIETY_WEIGHT * sum(count * count for count in food_counts.values()) / slot_count
+
+    def evaluate(self, slot_days: np.ndarray, choices: np.ndarray) -> float:
+        """Score a full plan given the day and chosen food of every slot."""
+        day_totals = np.zeros((self.days, self.optimal.size))
+        np.add.at(day_totals, slot_days, self.serving_nutrients[choices])
+        counts = dict(zip(*np.unique(choices, return_counts=True)))
+        return (float(self.cost_term(float(self.serving_cost[choices].sum())))
+                + self.nutrition_term(day_totals)
+                + self.inventory_term(counts)
+                + self.variety_term(counts, len(choices)))
+
+
+class PlanState:
+    """
+    Incremental state of a plan under an objective.
+
+    Holds per-day nutrient sums, the running cost and per-food counts (which
+    also give inventory draw-down), so the objective change of swapping the
+    food in one slot can be computed, applied and undone in constant time.
+    """
+
+    def __init__(self, objective: PlanObjective, slot_days: np.ndarray, choices: np.ndarray):
+        self.objective = objective
+        self.slot_days = slot_days
+        self.choices = choices.copy()
+
+        n_foods = objective.serving_cost.size
+        self.day_totals = np.zeros((objective.days, objective.optimal.size))
+        np.add.at(self.day_totals, slot_days, objective.serving_nutrients[self.choices])
+        self.day_penalties = objective.day_penalty(self.day_totals)
+        self.total_cost = float(objective.serving_cost[self.choices].sum())
+        self.counts = np.bincount(self.choices, minlength=n_foods)
+        self.inventory_caps = np.zeros(n_foods, dtype=int)
+        for idx, available in objective.inventory_servings.items():
+            self.inventory_caps[idx] = available
+
+        self.value = objective.evaluate(slot_days, self.choices)
+        self._history: List[Tuple[int, int, float]] = []
+
+    def inventory_remaining(self, food: int) -> int:
+        """Inventory servings of a food not yet used by the plan."""
+        return max(0, int(self.inventory_caps[food] - self.counts[food]))
+
+    def deltas(self, slot: int, foods: np.ndarray) -> np.ndarray:
+        """Objective change of putting each of foods in a slot (0 for the current food)."""
+        objective = self.objective
+        old = self.choices[slot]
+        day = self.slot_days[slot]
+
+        new_totals = (self.day_totals[day] - objective.serving_nutrients[old]
+                      + objective.serving_nutrients[foods])
+        nutrition = objective.day_penalty(new_totals) - self.day_penalties[day]
+
+        new_cost = self.total_cost - objective.serving_cost[old] + objective.serving_cost[foods]
+        cost = objective.cost_term(new_cost) - objective.cost_term(self.total_cost)
+
+        # Only the counts of the outgoing and incoming foods change
+        old_count = self.counts[old]
+        new_counts = self.counts[foods]
+        variety = objective.VARIETY_WEIGHT * (2 * (new_counts - old_count) + 2) / len(self.choices)
+
+        old_cap = self.inventory_caps[old]
+        new_caps = self.inventory_caps[foods]
+        inventory_used = (np.minimum(new_counts + 1, new_caps) - np.minimum(new_counts, new_caps)
+                          + min(old_count - 1, old_cap) - min(old_count, old_cap))
+        inventory = -objective.INVENTORY_WEIGHT * inventory_used
+
+        delta = nutrition + cost + variety + inventory
+        return np.where(foods == old, 0.0, delta)
+
+    def delta(self, slot: int, food: int) -> float:
+        """Objective change of putting a food in a slot."""
+        return float(self.deltas(slot, np.array([food]))[0])
+
+    def apply(self, slot: int, food: int) -> float:
+        """Swap the food in a slot and return the objective change."""
+        change = self.delta(slot, food)
+        self._history.append((slot, int(self.choices[slot]), change))
+        self._move(slot, food)
+        self.value += change
+        return change
+
+    def undo(self) -> None:
+        """Revert the most recent apply."""
+        slot, food, change = self._history.pop()
+        self._move(slot, food)
+        self.value -= change
+
+    def _move(self, slot: int, food: int) -> None:
+        objective = self.objective
+        old = self.choices[slot]
+        day = self.slot_days[slot]
+        self.day_totals[day] += objective.serving_nutrients[food] - objective.serving_nutrients[old]
+        self.day_penalties[day] = objective.day_penalty(self.day_totals[day])
+        self.total_cost += objective.serving_cost[food] - objective.serving_cost[old]
+        self.counts[old] -= 1
+        self.counts[food] += 1
+        self.choices[slot] = food
+
+
+class AnytimeSearch:
+    """Best-improvement local search over single-slot swaps that stops at a deadline."""
+
+    def __init__(self,
+                 objective: PlanObjective,
+                 slot_days: np.ndarray,
+                 slot_candidates: List[np.ndarray],
+                 choices: np.ndarray,
+                 deadline: Optional[float] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            objective: Objective to minimize
+            slot_days: Day index of every slot
+            slot_candidates: Catalog indices allowed in each slot
+            choices: Initial catalog index chosen for each slot
+            deadline: time.perf_counter() value at which to stop, or None to run to convergence
+            seed: Seed for the slot visiting order
+        """
+        self.objective = objective
+        self.slot_days = slot_days
+        self.slot_candidates = slot_candidates
+        self.choices = choices.copy()
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+
+    def run(self) -> Dict[str, Any]:
+        """Improve the plan until no swap helps or the deadline passes."""
+        state = PlanState(self.objective, self.slot_days, self.choices)
+        initial = state.value
+        iterations = 0
+        improvements = 0
+        converged = False
+        slots = list(range(len(self.choices)))
+
+        while not converged:
+            self.rng.shuffle(slots)
+            improved = False
+            for slot in slots:
+                if self.deadline is not None and time.perf_counter() >= self.deadline:
+                    return self._summary(state, initial, iterations, improvements, False)
+                iterations += 1
+
+                candidates = self.slot_candidates[slot]
+                if len(candidates) == 0:
+                    continue
+                deltas = state.deltas(slot, candidates)
+                best = int(np.argmin(deltas))
+                if deltas[best] < -1e-9:
+                    state.apply(slot, int(candidates[best]))
+                    improvements += 1
+                    improved = True
+            converged = not improved
+
+        return self._summary(state, initial, iterations, improvements, True)
+
+    def _summary(self, state: PlanState, initial: float, iterations: int,
+                 improvements: int, converged: bool) -> Dict[str, Any]:
+        return {
+            'choices': state.choices,
+            'converged': converged,
+            'iterations': iterations,
+            'improvements': improvements,
+            'initial_objective': round(float(initial), 4),
+            'final_objective': round(float(state.value), 4),
+        }
+
+
+def available_cores() -> int:
+    """Number of CPU cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by every search in this process, sized to the available cores.
+
+    Created once on first use and only shut down when the interpreter exits,
+    so concurrent searches never lose the pool while their restarts run.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=available_cores())
+            atexit.register(_executor.shutdown)
+        return _executor
+
+
+def _map_bounded(executor: ProcessPoolExecutor, jobs: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """run_restart over jobs on the pool with at most limit running at once, results in job order."""
+    outcomes: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    pending = {}
+    queued = iter(enumerate(jobs))
+    for index, job in itertools.islice(queued, limit):
+        pending[executor.submit(run_restart, job)] = index
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            outcomes[pending.pop(future)] = future.result()
+            for index, job in itertools.islice(queued, 1):
+                pending[executor.submit(run_restart, job)] = index
+    return outcomes
+
+
+def run_restart(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one restart: perturb the seed plan, then improve it by local search.
+
+    Module level so it can be shipped to a worker process. The deadline is
+    wall-clock time because perf_counter values do not carry across processes.
+    """
+    rng = random.Random(job['seed'])
+    choices = job['choices'].copy()
+    slot_candidates = job['slot_candidates']
+
+    # Restart 0 keeps the unperturbed seed so the result is never worse than it
+    if job['restart'] > 0:
+        slots = range(len(choices))
+        for slot in rng.sample(slots, max(1, int(len(choices) * job['perturbation']))):
+            if len(slot_candidates[slot]):
+                choices[slot] = rng.choice(slot_candidates[slot])
+
+    deadline = None
+    if job['wall_deadline'] is not None:
+        deadline = time.perf_counter() + (job['wall_deadline'] - time.time())
+
+    outcome = AnytimeSearch(
+        job['objective'], job['slot_days'], slot_candidates, choices, deadline, rng.random()
+    ).run()
+    outcome['restart'] = job['restart']
+    return outcome
+
+
+class MultiStartSearch:
+    """Seeded local-search restarts from perturbed copies of a plan, run across processes."""
+
+    PERTURBATION = 0.2  # fraction of slots re-drawn at random for each restart
+
+    def __init__(self,
+                 objective: PlanObjective,
+                 slot_days: np.ndarray,
+                 slot_candidates: List[np.ndarray],
+                 choices: np.ndarray,
+                 restarts: int,
+                 seed: int = 0,
+                 wall_deadline: Optional[float] = None,
+                 workers: Optional[int] = None):
+        """
+        Args:
+            objective: Objective to minimize
+            slot_days: Day index of every slot
+            slot_candidates: Catalog indices allowed in each slot
+            choices: Seed plan, catalog index chosen for each slot
+            restarts: Number of restarts to run
+            seed: Base seed; restart i uses a seed derived from it and i
+            wall_deadline: time.time() value at which restarts stop, or None
+            workers: Restarts to run at once in the shared process pool; defaults
+                to, and is capped by, the available cores
+        """
+        self.objective = objective
+        self.slot_days = slot_days
+        self.slot_candidates = slot_candidates
+        self.choices = choices
+        self.restarts = restarts
+        self.seed = seed
+        self.wall_deadline = wall_deadline
+        self.workers = min(restarts, workers or available_cores(), available_cores())
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Inputs of run_restart for every restart."""
+        return [{
+            'restart': restart,
+            'seed': self.seed * 1_000_003 + restart,
+            'perturbation': self.PERTURBATION,
+            'objective': self.objective,
+            'slot_days': self.slot_days,
+            'slot_candidates': self.slot_candidates,
+            'choices': self.choices,
+            'wall_deadline': self.wall_deadline,
+        } for restart in range(self.restarts)]
+
+    def run(self) -> Dict[str, Any]:
+        """Run every restart and keep the best plan, ties going to the earliest restart."""
+        jobs = self.jobs()
+        if self.workers > 1:
+            outcomes = _map_bounded(_get_executor(), jobs, self.workers)
+        else:
+            outcomes = [run_restart(job) for job in jobs]
+
+        best = min(outcomes, key=lambda outcome: (outcome['final_objective'], outcome['restart']))
+        return {
+            **best,
+            'restarts': self.restarts,
+            'workers': self.workers,
+            'converged': all(outcome['converged'] for outcome in outcomes),
+            'iterations': sum(outcome['iterations'] for outcome in outcomes),
+            'restart_objectives': [outcome['final_objective'] for outcome in outcomes],
+        }
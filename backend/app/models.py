@@ -1,3 +1,4 @@
+from sqlalchemy import JSON, Index, LargeBinary
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import EmailStr
 import uuid
@@ -106,14 +107,25 @@ class MealPlanBase(SQLModel):
 
 
 class MealPlan(MealPlanBase, table=True):
+    # Serves the per-user plan listing, newest first
+    __table_args__ = (Index("ix_mealplan_user_id_created_at", "user_id", "created_at"),)
+    
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
     created_at: str = Field(max_length=30)
+    # Bumped whenever the plan or its items change; drives the plan's ETag
+    updated_at: str | None = Field(default=None, max_length=30)
+    # zlib-compressed JSON of the shopping list, nutrition analysis, alternatives
+    # and inventory usage computed when the plan was optimized
+    analysis: bytes | None = Field(default=None, sa_type=LargeBinary)
+    # Household groups the plan feeds, as planned; items point into its 'groups'
+    household: dict | None = Field(default=None, sa_type=JSON)
     user: User | None = Relationship(back_populates="meal_plans")
 
 
 class MealPlanItemBase(SQLModel):
-    meal_plan_id: uuid.UUID = Field(foreign_key="mealplan.id", ondelete="CASCADE")
+    meal_plan_id: uuid.UUID = Field(foreign_key="mealplan.id", ondelete="CASCADE", index=True)
     day_of_week: int = Field(ge=0, le=6)  # 0=Monday, 6=Sunday
+    day_index: int = Field(default=0, ge=0)  # Day of the plan, 0 = start date
     meal_type: str = Field(max_length=20)  # breakfast, lunch, dinner, snack
     food_name: str = Field(max_length=100)
     quantity: float = Field(ge=0.0)
@@ -126,12 +138,23 @@ class MealPlanItemBase(SQLModel):
     uses_inventory: bool = Field(default=False)
     inventory_item_id: uuid.UUID | None = Field(default=None)
     notes: str | None = Field(default=None, max_length=200)
+    household_group: int | None = Field(default=None, ge=0)  # Index into the plan's household groups
 
 
 class MealPlanItem(MealPlanItemBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
 
 
+class FoodNameMapping(SQLModel, table=True):
+    # Inventory item names already matched to catalog foods, shared by all users
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True, index=True)
+    item_key: str = Field(max_length=100, unique=True, index=True)  # Canonical form of the item name
+    food_name: str | None = Field(default=None, max_length=100)  # Catalog food, None if nothing matched
+    score: float = Field(default=0.0, ge=0.0)
+    catalog_version: str = Field(max_length=32)  # Catalog tag the name was matched against
+    resolved_at: str = Field(max_length=30)
+
+
 # Chatbot Models
 
 class ChatSessionBase(SQLModel):
@@ -0,0 +1,210 @@
+"""
+Plan Memoization Cache
+Shares optimized plans between requests whose optimizer inputs are equivalent
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.meal_optimizer import DietaryRules, FoodDatabase
+
+
+class PlanCache:
+    """LRU cache of optimizer results with a time-to-live, keyed by input fingerprint."""
+
+    DEFAULT_MAX_ENTRIES = 512
+    DEFAULT_TTL_SECONDS = 600.0
+    # Budgets are planned at the bottom of their bucket so a shared plan fits every budget in it
+    DEFAULT_BUDGET_STEP = 1.0
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 budget_step: float = DEFAULT_BUDGET_STEP):
+        """
+        Set up an empty cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_seconds: Age after which an entry is no longer served
+            budget_step: Width of a budget bucket
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.budget_step = budget_step
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize_budget(self, budget: float) -> float:
+        """Round a budget down to its bucket."""
+        if self.budget_step <= 0:
+            return budget
+        return round(math.floor(budget / self.budget_step + 1e-9) * self.budget_step, 2)
+
+    @staticmethod
+    def inventory_digest(inventory_items: List[Dict]) -> str:
+        """Digest the inventory fields the optimizer reads, ignoring ids and order."""
+        entries = sorted(
+            (
+                (item.get('name') or '').lower().replace(' ', '_'),
+                item.get('food_name') or '',
+                float(item.get('quantity') or 0),
+                (item.get('category') or '').lower(),
+                item.get('expiration_date') or '',
+            )
+            for item in inventory_items
+        )
+        return hashlib.sha1(json.dumps(entries).encode()).hexdigest()
+
+    def fingerprint(self,
+                    budget: float,
+                    dietary_restrictions: Optional[str],
+                    inventory_items: List[Dict],
+                    catalog: Optional[str] = None,
+                    **options: Any) -> str:
+        """
+        Build the cache key for an optimizer call.
+
+        Args:
+            budget: Requested budget
+            dietary_restrictions: Raw restriction string of the user
+            inventory_items: Inventory passed to the optimizer
+            catalog: Tag of the catalog snapshot the optimizer uses; the
+                current snapshot's when not given
+            **options: Engine options such as mode, deadline and seed
+
+        Returns:
+            Hex digest identifying equivalent inputs
+        """
+        key = {
+            'budget': self.quantize_budget(budget),
+            'profile': DietaryRules.canonical_profile(dietary_restrictions or ''),
+            'inventory': self.inventory_digest(inventory_items),
+            'catalog': catalog or FoodDatabase.snapshot().tag,
+            'options': sorted(options.items()),
+        }
+        return hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a live entry and mark it recently used, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result, evicting the least recently used entries past the size limit."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Look up a result, computing and storing it on a miss.
+
+        Returns:
+            Tuple of (result, whether it came from the cache)
+        """
+        result = self.get(key)
+        if result is not None:
+            return result, True
+        result = compute()
+        self.put(key, result)
+        return result, False
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Current size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    @staticmethod
+    def rebase(result: Dict[str, Any], budget: float, inventory_items: List[Dict]) -> Dict[str, Any]:
+        """
+        Adapt a shared result to one request's budget and inventory records.
+
+        Cached entries are never modified; the copy gets its own item list and
+        inventory report with inventory ids pointing at the caller's inventory.
+
+        Args:
+            result: Result as stored in the cache
+            budget: The caller's exact weekly budget
+            inventory_items: The caller's inventory
+
+        Returns:
+            Shallow copy of the result for this caller
+        """
+        own_ids = {str(item.get('id')) for item in inventory_items}
+        inventory_ids = {}
+        lot_ids = {}
+        # Foods are drawn first-expired-first-out, so a food maps to its earliest lot
+        for item in sorted(inventory_items, key=lambda item: item.get('expiration_date') or '9999'):
+            # Plans name the catalog food an item was matched to, if any
+            key = item.get('food_name') or (item.get('name') or '').lower().replace(' ', '_')
+            inventory_ids.setdefault(key, item.get('id'))
+            lot_ids.setdefault((key, (item.get('expiration_date') or '')[:10]), item.get('id'))
+
+        def own_id(inventory_id, fallback):
+            # Ids from this caller's own run are kept; ids from another caller's are remapped
+            if inventory_id is not None and str(inventory_id) in own_ids:
+                return inventory_id
+            return str(fallback) if fallback else None
+
+        meal_plan_items = []
+        for item in result['meal_plan_items']:
+            if item['uses_inventory']:
+                item = dict(item)
+                item['inventory_item_id'] = own_id(
+                    item['inventory_item_id'], inventory_ids.get(item['food_name'].lower().replace(' ', '_'))
+                )
+            meal_plan_items.append(item)
+
+        inventory_usage = dict(result['inventory_usage'])
+        inventory_usage['expiring_unused'] = [
+            {
+                **lot,
+                'inventory_item_id': own_id(lot['inventory_item_id'], lot_ids.get((
+                    lot['food_name'] or (lot['name'] or '').lower().replace(' ', '_'), lot['expiration_date']
+                )))
+            }
+            for lot in inventory_usage.get('expiring_unused', [])
+        ]
+
+        total_cost = result['total_cost']
+        plan_budget = budget * (result.get('days', 7) / 7)
+        rebased = dict(result)
+        rebased['meal_plan_items'] = meal_plan_items
+        rebased['inventory_usage'] = inventory_usage
+        rebased['budget'] = plan_budget
+        rebased['budget_remaining'] = round(plan_budget - total_cost, 2)
+        rebased['budget_utilization'] = round((total_cost / plan_budget * 100), 1) if plan_budget > 0 else 0
+        return rebased
@@ -0,0 +1,97 @@
+"""
+Meal Plan Response Formats
+Content negotiation for compact layouts of plan item lists
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency: MessagePack responses need `pip install msgpack`
+    msgpack = None
+
+
+JSON = "application/json"
+# One array per item field instead of one object per item
+COLUMNAR_JSON = "application/vnd.mealplan.columnar+json"
+# The columnar layout, encoded as MessagePack
+MSGPACK = "application/msgpack"
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+
+class FormatUnavailable(Exception):
+    """Raised when the only acceptable format needs a dependency that is not installed."""
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """
+    Pick the response format for an Accept header.
+
+    Media ranges are taken in order of their q-values; a client asking only for
+    MessagePack when msgpack is not installed gets FormatUnavailable.
+
+    Args:
+        accept: Raw Accept header, if any
+
+    Returns:
+        JSON, COLUMNAR_JSON or MSGPACK
+    """
+    if not accept:
+        return JSON
+
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [token.strip() for token in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            ranges.append((-quality, position, media_type.lower()))
+
+    msgpack_requested = False
+    for _, _, media_type in sorted(ranges):
+        if media_type == COLUMNAR_JSON:
+            return COLUMNAR_JSON
+        if media_type in MSGPACK_ALIASES:
+            if msgpack is not None:
+                return MSGPACK
+            msgpack_requested = True
+            continue
+        if media_type in (JSON, "application/*", "*/*"):
+            return JSON
+
+    if msgpack_requested:
+        raise FormatUnavailable("MessagePack responses need the msgpack package")
+    return JSON
+
+
+def to_columns(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn a list of item objects into {'count': n, 'columns': {field: [values]}}."""
+    fields = list(items[0]) if items else []
+    return {
+        'count': len(items),
+        'columns': {field: [item.get(field) for item in items] for field in fields},
+    }
+
+
+def encode(payload: Dict[str, Any], items_key: str, media_type: str) -> bytes:
+    """
+    Serialize a JSON-ready response payload, laying out its item list in columns.
+
+    Args:
+        payload: Response as produced by model_dump(mode='json')
+        items_key: Key of the item list to lay out in columns
+        media_type: COLUMNAR_JSON or MSGPACK
+
+    Returns:
+        Encoded response body
+    """
+    body = dict(payload)
+    body[items_key] = to_columns(payload[items_key])
+    if media_type == MSGPACK:
+        return msgpack.packb(body, use_bin_type=True)
+    return json.dumps(body, separators=(',', ':')).encode()
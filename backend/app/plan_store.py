@@ -0,0 +1,126 @@
+"""
+Meal Plan Persistence
+Writes optimized plans and their items with a fixed number of round trips
+"""
+import json
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select
+
+from app.models import MealPlan, MealPlanItem
+
+
+# Parts of an optimization result kept with the saved plan
+ANALYSIS_FIELDS = (
+    'shopping_list',
+    'nutrition_analysis',
+    'alternatives',
+    'inventory_usage',
+    'budget_remaining',
+    'budget_utilization',
+)
+
+
+def pack_analysis(optimization_result: Dict[str, Any]) -> bytes:
+    """Compress the analysis parts of an optimization result for storage."""
+    analysis = {field: optimization_result[field] for field in ANALYSIS_FIELDS}
+    return zlib.compress(json.dumps(analysis, separators=(',', ':')).encode())
+
+
+def unpack_analysis(blob: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """Read a stored analysis back, or None for plans saved without one."""
+    if not blob:
+        return None
+    return json.loads(zlib.decompress(blob))
+
+
+def meal_item_fields(item_data: Dict) -> Dict:
+    """Map an optimizer meal item onto MealPlanItem columns."""
+    return {
+        'day_of_week': item_data['day_of_week'],
+        'day_index': item_data['day_index'],
+        'meal_type': item_data['meal_type'],
+        'food_name': item_data['food_name'],
+        'quantity': item_data['quantity'],
+        'unit': item_data['unit'],
+        'estimated_cost': item_data['estimated_cost'],
+        'calories': item_data.get('calories'),
+        'protein': item_data.get('protein'),
+        'carbs': item_data.get('carbs'),
+        'fats': item_data.get('fats'),
+        'uses_inventory': item_data['uses_inventory'],
+        'inventory_item_id': uuid.UUID(item_data['inventory_item_id']) if item_data.get('inventory_item_id') else None,
+        'notes': item_data.get('notes'),
+        'household_group': item_data.get('household_group')
+    }
+
+
+def write_meal_plan(session: Session, meal_plan: MealPlan, items: List[Dict]) -> List[MealPlanItem]:
+    """
+    Stage a plan and all of its items in the session's current transaction.
+
+    Item ids are generated here, so the items go out as one multi-row INSERT
+    and nothing has to be read back. The caller commits; build any response
+    from the returned objects before committing, as committing expires the plan.
+
+    Args:
+        session: Open database session
+        meal_plan: New plan to insert
+        items: Optimizer meal items belonging to the plan
+
+    Returns:
+        In-memory MealPlanItem objects matching the inserted rows
+    """
+    rows = [
+        {'id': uuid.uuid4(), 'meal_plan_id': meal_plan.id, **meal_item_fields(item_data)}
+        for item_data in items
+    ]
+
+    session.add(meal_plan)
+    session.flush()
+    if rows:
+        session.execute(insert(MealPlanItem), rows)
+
+    return [MealPlanItem(**row) for row in rows]
+
+
+def delete_meal_plans(session: Session, *conditions) -> int:
+    """
+    Delete the plans matching some conditions, and their items, without loading them.
+
+    Items are removed by one DELETE over the matching plan ids rather than left
+    to the foreign-key cascade, which SQLite only applies when enforced per
+    connection. The caller commits.
+
+    Args:
+        session: Open database session
+        *conditions: WHERE clauses on MealPlan
+
+    Returns:
+        Number of plans deleted
+    """
+    plan_ids = select(MealPlan.id).where(*conditions)
+    session.execute(
+        delete(MealPlanItem)
+        .where(MealPlanItem.meal_plan_id.in_(plan_ids))
+        .execution_options(synchronize_session=False)
+    )
+    result = session.execute(
+        delete(MealPlan).where(*conditions).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def archive_meal_plans(session: Session, *conditions) -> int:
+    """Mark the plans matching some conditions as archived in one UPDATE; the caller commits."""
+    result = session.execute(
+        update(MealPlan)
+        .where(*conditions, MealPlan.status != "archived")
+        .values(status="archived", updated_at=datetime.now().isoformat())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
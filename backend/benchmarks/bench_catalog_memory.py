@@ -0,0 +1,76 @@
+"""
+Benchmark: Food Catalog Memory
+Compares memory per food of the dict-of-dicts catalog and the compact FoodCatalog
+
+Usage:
+    python benchmarks/bench_catalog_memory.py [--foods 100000] [--nutrients 30]
+
+Foods get the usual catalog fields plus extra per-100g nutrient columns,
+with distinct float values as in a real nutrient table.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.food_catalog import FoodCatalog
+from app.meal_optimizer import FoodDatabase
+
+
+def synthetic_foods(size: int, nutrients: int, rng: random.Random) -> dict:
+    base = list(FoodDatabase.FOODS.items())
+    extra = [f"nutrient_{i}" for i in range(max(0, nutrients - 5))]
+    foods = {}
+    for i in range(size):
+        name, data = base[i % len(base)]
+        food = dict(data)
+        for field in ('calories', 'protein', 'carbs', 'fats', 'fiber'):
+            food[field] = round(food[field] * rng.uniform(0.8, 1.2), 2)
+        for field in extra:
+            food[field] = round(rng.uniform(0, 50), 3)
+        foods[f"{name}_{i}"] = food
+    return foods
+
+
+def traced(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    value = build()
+    elapsed = time.perf_counter() - started
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=100_000, help="Catalog size")
+    parser.add_argument("--nutrients", type=int, default=30, help="Nutrient columns per food")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    foods, dict_bytes, _ = traced(lambda: synthetic_foods(args.foods, args.nutrients, random.Random(args.seed)))
+    catalog, catalog_bytes, build_seconds = traced(lambda: FoodCatalog.from_foods(foods))
+    # The name strings are shared with the source dict, so count them separately
+    catalog_bytes += sum(sys.getsizeof(name) for name in catalog.names)
+
+    print(f"{args.foods} foods, {len(catalog.fields)} fields each\n")
+    print(f"{'layout':<16}{'total MB':>10}{'bytes/food':>12}")
+    print(f"{'dict of dicts':<16}{dict_bytes / 2 ** 20:>10.1f}{dict_bytes / args.foods:>12.0f}")
+    print(f"{'FoodCatalog':<16}{catalog_bytes / 2 ** 20:>10.1f}{catalog_bytes / args.foods:>12.0f}")
+    print(f"  of which columns {catalog.nbytes() / args.foods:.0f} bytes/food")
+    print(f"\nFoodCatalog built in {build_seconds:.2f}s")
+
+    name = catalog.names[args.foods // 2]
+    assert dict(catalog[name]) == foods[name], "Façade should read back the original record"
+
+
+if __name__ == "__main__":
+    main()
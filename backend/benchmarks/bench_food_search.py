@@ -0,0 +1,70 @@
+"""
+Benchmark: Food Catalog Search
+Times index build and query latency on a synthetic catalog
+
+Usage:
+    python benchmarks/bench_food_search.py [--foods 100000] [--runs 200]
+
+The synthetic catalog combines the real food names with brand and style
+words, so token frequencies look like a large retail catalog.
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.food_catalog import FoodCatalog
+from app.food_search import FoodSearchIndex
+from app.meal_optimizer import FoodDatabase
+
+STYLES = ['organic', 'fresh', 'frozen', 'smoked', 'roasted', 'canned', 'dried', 'raw',
+          'sliced', 'whole', 'low_fat', 'spiced', 'sweet', 'salted', 'plain', 'baby',
+          'wild', 'local', 'premium', 'value']
+BRANDS = ['aarong', 'pran', 'radhuni', 'fresh_farms', 'golden', 'meghna', 'akij', 'bashundhara',
+          'ifad', 'square', 'teer', 'rupchanda', 'shwapno', 'agora', 'dhaka', 'sylhet']
+
+QUERIES = ['rice', 'brown rice', 'chick', 'organic broccoli', 'brocoli', 'chiken breast',
+           'ice', 'a', 'fresh', 'pran salmon', 'zzzz']
+
+
+def synthetic_catalog(size: int) -> FoodCatalog:
+    foods = {}
+    combos = itertools.product(range(10 ** 6), BRANDS, STYLES, FoodDatabase.FOODS.items())
+    for batch, brand, style, (name, data) in combos:
+        if len(foods) >= size:
+            break
+        foods[f"{brand}_{style}_{name}_{batch}"] = dict(data)
+    return FoodCatalog.from_foods(foods)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=100_000, help="Catalog size")
+    parser.add_argument("--runs", type=int, default=200, help="Searches per query")
+    args = parser.parse_args()
+
+    foods = synthetic_catalog(args.foods)
+    started = time.perf_counter()
+    index = FoodSearchIndex(foods)
+    print(f"{len(foods)} foods, {len(index.tokens)} tokens, "
+          f"index built in {time.perf_counter() - started:.2f}s\n")
+
+    print(f"{'query':<18}{'matches':>9}{'median ms':>11}{'p95 ms':>9}")
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = index.search(query, limit=20)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"{query!r:<18}{result['total']:>9}{statistics.median(timings):>11.3f}"
+              f"{timings[int(len(timings) * 0.95) - 1]:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
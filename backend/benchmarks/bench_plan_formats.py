@@ -0,0 +1,75 @@
+"""
+Benchmark: Meal Plan Response Formats
+Compares payload size and serialization time of plan item layouts
+
+Usage:
+    python benchmarks/bench_plan_formats.py [--runs 200]
+
+Formats: the default JSON rows (as FastAPI serializes the response model),
+columnar JSON, and columnar MessagePack when msgpack is installed.
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+import uuid
+from typing import List
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+
+from app import plan_formats
+from app.meal_optimizer import MealOptimizer
+from app.models import MealPlanItem
+from app.plan_store import meal_item_fields
+
+
+def plan_items(days: int) -> List[MealPlanItem]:
+    result = MealOptimizer(budget=3500.0, inventory_items=[], days=days).optimize_weekly_plan()
+    meal_plan_id = uuid.uuid4()
+    return [
+        MealPlanItem(id=uuid.uuid4(), meal_plan_id=meal_plan_id, **meal_item_fields(item_data))
+        for item_data in result['meal_plan_items']
+    ]
+
+
+def timed(encode, runs: int):
+    started = time.perf_counter()
+    for _ in range(runs):
+        body = encode()
+    return body, (time.perf_counter() - started) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200, help="Serializations per format")
+    args = parser.parse_args()
+
+    rows_adapter = TypeAdapter(List[MealPlanItem])
+    formats = [("json rows", None), ("columnar json", plan_formats.COLUMNAR_JSON)]
+    if plan_formats.msgpack is not None:
+        formats.append(("msgpack", plan_formats.MSGPACK))
+    else:
+        print("msgpack not installed; skipping MessagePack")
+
+    for days in (7, 30):
+        items = plan_items(days)
+        print(f"\n{days}-day plan, {len(items)} items")
+        print(f"{'format':<16}{'bytes':>10}{'gzip bytes':>12}{'ms':>10}")
+        for name, media_type in formats:
+            if media_type is None:
+                encode = lambda: rows_adapter.dump_json(items)
+            else:
+                # Includes dumping the models, as the endpoints do before encoding
+                encode = lambda: plan_formats.encode(
+                    {'items': rows_adapter.dump_python(items, mode='json')}, 'items', media_type
+                )
+            body, ms = timed(encode, args.runs)
+            print(f"{name:<16}{len(body):>10}{len(gzip.compress(body)):>12}{ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark: Meal Plan Persistence Round Trips
+Compares saving an optimized plan item by item with the bulk writer
+
+Usage:
+    python benchmarks/bench_plan_persistence.py [--days 7] [--runs 20]
+
+Uses DATABASE_URL when set, otherwise a throwaway in-memory SQLite database.
+Round trips are counted with a cursor-execute listener on the engine.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.meal_optimizer import MealOptimizer
+from app.models import MealPlan, MealPlanItem, User
+from app.plan_store import meal_item_fields, write_meal_plan
+
+
+class RoundTripCounter:
+    """Counts statements sent to the database."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def new_plan(user_id, result) -> MealPlan:
+    return MealPlan(
+        name="Benchmark Plan",
+        start_date="2025-01-01",
+        end_date="2025-01-07",
+        target_budget=result['budget'],
+        total_cost=result['total_cost'],
+        user_id=user_id,
+        created_at=datetime.now().isoformat()
+    )
+
+
+def save_item_by_item(session: Session, user_id, result) -> None:
+    """The original persistence path: commit, then add and refresh each item."""
+    meal_plan = new_plan(user_id, result)
+    session.add(meal_plan)
+    session.commit()
+    session.refresh(meal_plan)
+
+    items = []
+    for item_data in result['meal_plan_items']:
+        item = MealPlanItem(meal_plan_id=meal_plan.id, **meal_item_fields(item_data))
+        session.add(item)
+        items.append(item)
+    session.commit()
+    for item in items:
+        session.refresh(item)
+
+
+def save_bulk(session: Session, user_id, result) -> None:
+    """The bulk path: one transaction, client-side ids, no refreshes."""
+    meal_plan = new_plan(user_id, result)
+    write_meal_plan(session, meal_plan, result['meal_plan_items'])
+    session.commit()
+
+
+def run(engine, counter, user_id, result, save, runs):
+    counter.count = 0
+    started = time.perf_counter()
+    for _ in range(runs):
+        with Session(engine) as session:
+            save(session, user_id, result)
+    elapsed = time.perf_counter() - started
+    return counter.count / runs, elapsed / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7, help="Plan horizon in days")
+    parser.add_argument("--runs", type=int, default=20, help="Plans saved per method")
+    args = parser.parse_args()
+
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        engine = create_engine(database_url)
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    counter = RoundTripCounter(engine)
+
+    with Session(engine) as session:
+        user = User(username=f"bench_{int(time.time())}", email=f"bench_{int(time.time())}@example.com",
+                    hashed_password="x")
+        session.add(user)
+        session.commit()
+        user_id = user.id
+
+    result = MealOptimizer(budget=3500.0, inventory_items=[], days=args.days).optimize_weekly_plan()
+    print(f"Plan: {args.days} days, {len(result['meal_plan_items'])} items, {engine.dialect.name}")
+    print(f"{'method':<14}{'round trips':>12}{'ms / plan':>12}")
+    for name, save in (("item-by-item", save_item_by_item), ("bulk", save_bulk)):
+        trips, ms = run(engine, counter, user_id, result, save, args.runs)
+        print(f"{name:<14}{trips:>12.0f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Food Catalog Ingest
+Compiles a CSV/JSON nutrient dataset into a memory-mapped binary catalog
+
+Usage:
+    python ingest_catalog.py foods.csv catalog.bin [--version 2025-w14]
+    python ingest_catalog.py --builtin catalog.bin
+
+CSV datasets need a 'name' column plus category, cost_per_100g, calories,
+protein, carbs, fats, fiber, serving_size and unit; any further columns are
+kept as extra numeric nutrients, and their empty cells read as 0. JSON
+datasets use the FoodDatabase.FOODS layout or a list of records with a 'name'
+key.
+
+Optional meat, animal_product and gluten columns (0/1, true/false or yes/no)
+flag the foods that vegetarian, vegan and gluten-free plans leave out. Without
+them those restrictions only recognize the built-in foods. --builtin fills the
+flags in from the built-in food lists.
+
+Point the API at the result with FOOD_CATALOG_PATH=/path/to/catalog.bin.
+"""
+import argparse
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.catalog_file import DIETARY_FLAGS, CatalogFileError, open_catalog, read_dataset, write_catalog
+from app.meal_optimizer import DietaryRules, FoodDatabase
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", help="Dataset to compile (.csv or .json)")
+    parser.add_argument("output", help="Catalog file to write")
+    parser.add_argument("--builtin", action="store_true", help="Compile the built-in catalog instead of a dataset")
+    parser.add_argument("--version", help="Version label stored in the file (default: content digest)")
+    args = parser.parse_args()
+
+    if args.builtin == bool(args.source):
+        parser.error("give either a dataset or --builtin")
+
+    started = time.perf_counter()
+    try:
+        if args.builtin:
+            foods = {
+                name: {**food, **DietaryRules.flags(name, food)}
+                for name, food in FoodDatabase.BUILTIN_FOODS.items()
+            }
+        else:
+            foods = read_dataset(args.source)
+        header = write_catalog(foods, args.output, version=args.version)
+    except (CatalogFileError, OSError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    catalog = open_catalog(args.output)
+    print(f"✓ {header['foods']} foods, {len(catalog.fields)} fields, version {header['version']}")
+    missing_flags = [flag for flag in DIETARY_FLAGS if flag not in catalog.fields]
+    if missing_flags:
+        print(f"! No {', '.join(missing_flags)} flag column; those restrictions only recognize built-in foods")
+    print(f"✓ {header['record_size']} bytes per record, {os.path.getsize(args.output) / 2 ** 20:.1f} MB on disk")
+    print(f"✓ Written to {args.output} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,70 @@
 Test script for the Meal Optimizer
 Run this to verify the optimization engine works correctly
 """
-from app.meal_optimizer import MealOptimizer, FoodDatabase, NutritionRules
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+# The API modules read their token settings when imported
+for _name, _value in (('SECRET_KEY', 'test-secret'), ('ALGORITHM', 'HS256'),
+                      ('ACCESS_TOKEN_EXPIRE_MINUTES', '30'), ('REFRESH_TOKEN_EXPIRE_DAYS', '7')):
+    os.environ.setdefault(_name, _value)
+
+from app.api.routes import meal_plans
+from app.meal_optimizer import MealOptimizer, FoodDatabase, NutritionRules, DietaryRules, ScoringEngine, CompatibilityIndex, CatalogArrays
+from app import meal_search
+from app.meal_search import MultiStartSearch, PlanState
+from app import catalog_file, plan_formats
+from app.food_catalog import FoodCatalog
+from app.food_matcher import FoodNameMatcher, resolve_names
+from app.models import FoodNameMapping, InventoryItem, MealPlan, MealPlanItem, User
+from app.plan_cache import PlanCache
+from app.plan_store import ANALYSIS_FIELDS, pack_analysis, unpack_analysis, write_meal_plan
+
+
+def _memory_session() -> Session:
+    """Session on a fresh in-memory database with every table."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+
+def _add_user(session: Session, username: str, **fields) -> User:
+    """Store a user for the API route tests."""
+    user = User(username=username, email=f"{username}@example.com", hashed_password='x', **fields)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+def _store_plan(session: Session, user: User, created_at: str, status: str = 'active', result=None):
+    """Save a plan for the API route tests, from an optimizer result or with no items."""
+    result = result or {'meal_plan_items': [], 'total_cost': 0.0}
+    start_date = date.fromisoformat(created_at[:10])
+    plan = MealPlan(
+        name=f"Plan {created_at}",
+        start_date=start_date.isoformat(),
+        end_date=(start_date + timedelta(days=result.get('days', 1) - 1)).isoformat(),
+        target_budget=100.0,
+        total_cost=result['total_cost'],
+        status=status,
+        user_id=user.id,
+        created_at=created_at,
+        updated_at=created_at,
+        analysis=pack_analysis(result) if 'shopping_list' in result else None
+    )
+    items = write_meal_plan(session, plan, result['meal_plan_items'])
+    session.commit()
+    session.refresh(plan)
+    return plan, items
 
 
 def test_basic_optimization():
@@ -240,6 +303,1080 @@ def test_food_database():
     print("\n✓ Test PASSED\n")
 
 
+def test_scoring_engine():
+    """Test that batched scoring matches the per-food scoring rules."""
+    print("=" * 60)
+    print("TEST 8: Vectorized Scoring Engine")
+    print("=" * 60)
+    
+    optimizer = MealOptimizer(
+        budget=100.0,
+        inventory_items=[{
+            'id': '123e4567-e89b-12d3-a456-426614174000',
+            'name': 'tofu',
+            'quantity': 5,
+            'cost': 3.0,
+            'category': 'protein',
+            'expiration_date': '2024-12-25'
+        }],
+        dietary_restrictions="vegetarian",
+        dietary_pref=None
+    )
+    
+    for meal_type in ['breakfast', 'lunch', 'snack']:
+        for remaining_budget in [0.0, 5.0, 50.0]:
+            optimizer._select_best_food(meal_type, 'protein', remaining_budget)
+            candidates = optimizer.scoring_engine._slots[(meal_type, 'protein')][0]
+            batched = optimizer.scoring_engine.score(meal_type, 'protein', remaining_budget)
+            for idx, score in zip(candidates, batched):
+                food_name = optimizer.catalog_arrays.names[idx]
+                expected = optimizer._score_food_choice(food_name, meal_type, remaining_budget, {})
+                assert abs(score - expected) < 1e-9, f"Score mismatch for {food_name}"
+    
+    names = [optimizer.catalog_arrays.names[idx]
+             for idx in optimizer.scoring_engine._slots[('lunch', 'protein')][0]]
+    assert 'chicken_breast' not in names, "Incompatible food scored!"
+    print(f"✓ Batched scores match for {len(names)} protein candidates")
+    print("\n✓ Test PASSED\n")
+
+
+def test_compatibility_index():
+    """Test the shared dietary compatibility index."""
+    print("=" * 60)
+    print("TEST 9: Dietary Compatibility Index")
+    print("=" * 60)
+    
+    profile = DietaryRules.canonical_profile("Vegan, Gluten-Free")
+    assert profile == ('gluten-free', 'vegan'), f"Unexpected profile: {profile}"
+    assert DietaryRules.canonical_profile("lactose intolerant") == ('dairy-free',)
+    print(f"✓ Canonical profile: {profile}")
+    
+    first = MealOptimizer(100.0, [], dietary_restrictions="vegan, gluten-free")
+    second = MealOptimizer(100.0, [], dietary_restrictions="gluten-free vegan")
+    assert first.compatibility_index is second.compatibility_index, "Index not shared!"
+    
+    index = FoodDatabase.get_compatibility_index()
+    grains = index.allowed_foods(profile, 'grain')
+    proteins = index.allowed_foods(profile, 'protein')
+    assert 'pasta' not in grains and 'whole_wheat_bread' not in grains
+    assert 'eggs' not in proteins and 'tofu' in proteins
+    for name in FoodDatabase.FOODS:
+        allowed = name in index.allowed_foods(profile, FoodDatabase.get_food(name)['category'])
+        assert allowed == first._check_dietary_compatibility(name), f"Mismatch for {name}"
+    print(f"✓ Allowed grains: {grains}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_lp_mode():
+    """Test the linear-programming optimization mode."""
+    print("=" * 60)
+    print("TEST 10: Linear Programming Mode")
+    print("=" * 60)
+    
+    greedy = MealOptimizer(3500.0, [], dietary_restrictions="vegetarian").optimize_weekly_plan()
+    result = MealOptimizer(3500.0, [], dietary_restrictions="vegetarian").optimize_weekly_plan(mode='lp')
+    
+    assert set(result) == set(greedy), "Result shape differs from greedy mode!"
+    assert result['optimization']['status'] == 'optimal', result['optimization']
+    assert result['total_cost'] <= result['budget'] + 0.01, "Budget exceeded!"
+    meat_items = ['Chicken Breast', 'Salmon', 'Ground Beef']
+    assert not any(item['food_name'] in meat_items for item in result['meal_plan_items'])
+    
+    averages = result['nutrition_analysis']['weekly_averages']
+    for nutrient, band in NutritionRules.DAILY_REQUIREMENTS.items():
+        assert band['min'] * 0.99 <= averages[nutrient] <= band['max'] * 1.01, f"{nutrient} out of band"
+    
+    print(f"✓ LP cost: ৳{result['total_cost']:.2f} (greedy: ৳{greedy['total_cost']:.2f})")
+    print(f"✓ LP nutrition score: {result['nutrition_analysis']['overall_score']}/100")
+    print("\n✓ Test PASSED\n")
+
+
+def test_anytime_mode():
+    """Test the deadline-aware anytime optimizer."""
+    print("=" * 60)
+    print("TEST 11: Anytime Optimization")
+    print("=" * 60)
+    
+    greedy = MealOptimizer(3500.0, []).optimize_weekly_plan()
+    result = MealOptimizer(3500.0, []).optimize_weekly_plan(mode='anytime', deadline_ms=2000, seed=7)
+    optimization = result['optimization']
+    
+    assert set(result) == set(greedy), "Result shape differs from greedy mode!"
+    assert optimization['converged'], "Search did not converge within 2s!"
+    assert optimization['final_objective'] <= optimization['initial_objective']
+    assert len(result['meal_plan_items']) == len(greedy['meal_plan_items'])
+    assert result['nutrition_analysis']['overall_score'] >= greedy['nutrition_analysis']['overall_score']
+    print(f"✓ Converged after {optimization['iterations']} iterations in {optimization['elapsed_ms']} ms")
+    
+    rushed = MealOptimizer(3500.0, []).optimize_weekly_plan(mode='anytime', deadline_ms=1, seed=7)
+    assert not rushed['optimization']['converged'], "1 ms deadline should cut the search off"
+    assert len(rushed['meal_plan_items']) > 0, "No plan returned at the deadline!"
+    print(f"✓ Cut off after {rushed['optimization']['iterations']} iterations with a 1 ms deadline")
+    print("\n✓ Test PASSED\n")
+
+
+def test_multistart_mode():
+    """Test seeded multi-start local search."""
+    print("=" * 60)
+    print("TEST 12: Multi-Start Local Search")
+    print("=" * 60)
+    
+    first = MealOptimizer(3500.0, []).optimize_weekly_plan(mode='multistart', restarts=3, seed=11)
+    second = MealOptimizer(3500.0, []).optimize_weekly_plan(mode='multistart', restarts=3, seed=11)
+    greedy = MealOptimizer(3500.0, []).optimize_weekly_plan()
+    
+    assert first['meal_plan_items'] == second['meal_plan_items'], "Same seed gave different plans!"
+    assert first['optimization']['restarts'] == 3
+    objectives = first['optimization']['restart_objectives']
+    assert first['optimization']['final_objective'] == min(objectives)
+    
+    distinct = {item['food_name'] for item in first['meal_plan_items']}
+    greedy_distinct = {item['food_name'] for item in greedy['meal_plan_items']}
+    assert len(distinct) > len(greedy_distinct), "No more variety than the greedy plan!"
+    print(f"✓ Best of {objectives} from restart {first['optimization']['best_restart']}")
+    print(f"✓ Distinct foods: {len(distinct)} (greedy: {len(greedy_distinct)})")
+    
+    # Concurrent searches with different worker counts share one pool
+    _, objective, slot_days, slot_candidates, choices = MealOptimizer(3500.0, [])._search_seed()
+    jobs = MultiStartSearch(objective, slot_days, slot_candidates, choices, restarts=4, seed=5).jobs()
+    serial = [meal_search.run_restart(job)['final_objective'] for job in jobs]
+    with ThreadPoolExecutor(max_workers=2) as threads:
+        runs = list(threads.map(
+            lambda limit: meal_search._map_bounded(meal_search._get_executor(), jobs, limit), [2, 4]
+        ))
+    for outcomes in runs:
+        assert [outcome['final_objective'] for outcome in outcomes] == serial
+    assert meal_search._get_executor() is meal_search._get_executor()
+    print(f"✓ Concurrent searches on the shared pool: {serial}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_state():
+    """Test incremental swap deltas against full re-evaluation."""
+    print("=" * 60)
+    print("TEST 13: Incremental Plan State")
+    print("=" * 60)
+    
+    optimizer = MealOptimizer(
+        budget=500.0,
+        inventory_items=[{
+            'id': '123e4567-e89b-12d3-a456-426614174000',
+            'name': 'eggs',
+            'quantity': 3,
+            'cost': 4.0,
+            'category': 'protein',
+            'expiration_date': None
+        }],
+        dietary_restrictions=None,
+        dietary_pref=None
+    )
+    slots, objective, slot_days, slot_candidates, choices = optimizer._search_seed()
+    state = PlanState(objective, slot_days, choices)
+    start_value = state.value
+    
+    for step in range(50):
+        slot = (step * 7) % len(slots)
+        food = int(slot_candidates[slot][step % len(slot_candidates[slot])])
+        before = state.value
+        change = state.apply(slot, food)
+        expected = objective.evaluate(slot_days, state.choices)
+        assert abs(before + change - expected) < 1e-6, f"Wrong delta at step {step}"
+    
+    for _ in range(50):
+        state.undo()
+    assert abs(state.value - start_value) < 1e-6, "Undo did not restore the plan value!"
+    assert (state.choices == choices).all(), "Undo did not restore the plan!"
+    print(f"✓ 50 swaps applied and undone, objective back to {state.value:.4f}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_regenerate_meal():
+    """Test re-planning a single meal."""
+    print("=" * 60)
+    print("TEST 14: Single Meal Regeneration")
+    print("=" * 60)
+    
+    optimizer = MealOptimizer(
+        budget=100.0,
+        inventory_items=[],
+        dietary_restrictions=None,
+        dietary_pref=None
+    )
+    result = optimizer.optimize_weekly_plan()
+    lunch = [item for item in result['meal_plan_items']
+             if item['day_of_week'] == 2 and item['meal_type'] == 'lunch']
+    rejected = [item['food_name'].lower().replace(' ', '_') for item in lunch]
+    
+    new_items = optimizer.regenerate_meal(
+        day=2,
+        meal_type='lunch',
+        remaining_budget=5.0,
+        daily_nutrition={'calories': 900, 'protein': 30, 'carbs': 120, 'fats': 25, 'fiber': 10},
+        exclude_foods=rejected
+    )
+    new_names = [item['food_name'].lower().replace(' ', '_') for item in new_items]
+    
+    print(f"Rejected: {rejected}")
+    print(f"Regenerated: {new_names}")
+    assert len(new_items) == len(optimizer.MEAL_COMPOSITION['lunch']), "Meal is missing components!"
+    assert not set(new_names) & set(rejected), "Rejected foods were picked again!"
+    assert len(set(new_names)) == len(new_names), "Food repeated within the meal!"
+    assert all(item['day_of_week'] == 2 and item['meal_type'] == 'lunch' for item in new_items)
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_cache():
+    """Test plan memoization keys, eviction and rebasing."""
+    print("=" * 60)
+    print("TEST 15: Plan Cache")
+    print("=" * 60)
+    
+    cache = PlanCache(max_entries=2, ttl_seconds=60.0)
+    inventory_a = [
+        {'id': 'a1', 'name': 'Eggs', 'quantity': 3, 'category': 'protein', 'expiration_date': None},
+        {'id': 'a2', 'name': 'Brown Rice', 'quantity': 5, 'category': 'grain', 'expiration_date': None},
+    ]
+    inventory_b = [
+        {'id': 'b2', 'name': 'brown rice', 'quantity': 5, 'category': 'Grain', 'expiration_date': None},
+        {'id': 'b1', 'name': 'eggs', 'quantity': 3, 'category': 'protein', 'expiration_date': None},
+    ]
+    key_a = cache.fingerprint(100.4, 'Vegan, Gluten-Free', inventory_a, mode='greedy')
+    key_b = cache.fingerprint(100.9, 'gluten-free,vegan', inventory_b, mode='greedy')
+    assert key_a == key_b, "Equivalent inputs should share a key!"
+    assert key_a != cache.fingerprint(101.0, 'vegan, gluten-free', inventory_a, mode='greedy')
+    assert key_a != cache.fingerprint(100.4, 'vegan, gluten-free', inventory_a, mode='lp')
+    
+    optimizer = MealOptimizer(
+        budget=cache.quantize_budget(100.4),
+        inventory_items=inventory_a,
+        dietary_restrictions='vegetarian',
+        dietary_pref=None
+    )
+    result, hit = cache.get_or_compute(key_a, optimizer.optimize_weekly_plan)
+    assert not hit
+    shared, hit = cache.get_or_compute(key_b, lambda: None)
+    assert hit and shared is result, "Second lookup should be a hit!"
+    
+    rebased = PlanCache.rebase(shared, 100.9, inventory_b)
+    inventory_ids = {item['inventory_item_id'] for item in rebased['meal_plan_items'] if item['uses_inventory']}
+    assert inventory_ids <= {'b1', 'b2'}, "Inventory ids were not rebased!"
+    assert rebased['budget'] == 100.9
+    assert all(item['inventory_item_id'] in (None, 'a1', 'a2') for item in result['meal_plan_items'])
+    
+    cache.put('second', {})
+    cache.put('third', {})
+    assert cache.get(key_a) is None, "Least recently used entry should be evicted!"
+    cache.ttl_seconds = -1
+    assert cache.get('third') is None, "Expired entry should not be served!"
+    
+    stats = cache.stats()
+    print(f"Cache stats: {stats}")
+    assert stats['hits'] == 1 and stats['misses'] == 3 and stats['evictions'] == 1
+    
+    # Inventory rows may leave their category empty
+    uncategorized = [{'id': 'c1', 'name': 'Brown Rice', 'quantity': 5, 'category': None, 'expiration_date': None}]
+    assert cache.fingerprint(100.0, None, uncategorized) == cache.fingerprint(
+        100.0, None, [{**uncategorized[0], 'category': ''}]
+    )
+    session = _memory_session()
+    user = _add_user(session, 'pantry')
+    session.add(InventoryItem(name='Brown Rice', quantity=5, cost=1.0, category=None, user_id=user.id))
+    session.commit()
+    plan = meal_plans.optimize_meal_plan(meal_plans.MealPlanOptimizeRequest(target_budget=100.0), user, session, Response())
+    assert any(item.uses_inventory for item in plan.meal_items), "Uncategorized inventory was not used!"
+    print("✓ Inventory without a category plans and caches")
+    print("\n✓ Test PASSED\n")
+
+
+def test_budget_sweep():
+    """Test evaluating several budgets and the Pareto frontier."""
+    print("=" * 60)
+    print("TEST 16: Budget Sweep")
+    print("=" * 60)
+    
+    inventory = [{
+        'id': '123e4567-e89b-12d3-a456-426614174000',
+        'name': 'eggs',
+        'quantity': 3,
+        'cost': 4.0,
+        'category': 'protein',
+        'expiration_date': None
+    }]
+    optimizer = MealOptimizer(budget=80.0, inventory_items=inventory, dietary_restrictions=None, dietary_pref=None)
+    budgets = [40.0, 80.0, 150.0, 300.0]
+    sweep = optimizer.budget_sweep(budgets)
+    
+    for point in sweep['points']:
+        print(f"${point['budget']:>7.2f}: cost ${point['total_cost']:.2f}, score {point['overall_score']}")
+    assert [point['budget'] for point in sweep['points']] == budgets
+    assert optimizer.budget == 80.0, "Sweep should restore the optimizer budget!"
+    assert optimizer.inventory_items['eggs']['quantity'] == 3, "Sweep should restore the inventory!"
+    
+    # Each point matches a fresh single-budget run
+    fresh = MealOptimizer(budget=150.0, inventory_items=inventory, dietary_restrictions=None, dietary_pref=None)
+    assert fresh.optimize_weekly_plan()['total_cost'] == sweep['points'][2]['total_cost']
+    
+    frontier = sweep['frontier']
+    assert frontier, "Frontier should not be empty!"
+    for point in frontier:
+        assert not any(
+            other['total_cost'] <= point['total_cost'] and other['overall_score'] > point['overall_score']
+            for other in sweep['points']
+        ), "Dominated point on the frontier!"
+    print(f"✓ Frontier: {[(p['total_cost'], p['overall_score']) for p in frontier]}")
+    
+    points = [
+        {'total_cost': 10, 'overall_score': 50},
+        {'total_cost': 12, 'overall_score': 40},
+        {'total_cost': 15, 'overall_score': 80},
+    ]
+    assert MealOptimizer.pareto_frontier(points) == [points[0], points[2]]
+    print("\n✓ Test PASSED\n")
+
+
+def test_multi_week_horizon():
+    """Test planning past one week with inventory expiring mid-plan."""
+    print("=" * 60)
+    print("TEST 17: Multi-Week Horizon")
+    print("=" * 60)
+    
+    start = date(2025, 3, 3)
+    inventory = [
+        {
+            'id': '123e4567-e89b-12d3-a456-426614174000',
+            'name': 'chicken breast',
+            'quantity': 50,
+            'cost': 6.0,
+            'category': 'protein',
+            'expiration_date': '2025-03-12'
+        },
+        {
+            'id': '123e4567-e89b-12d3-a456-426614174001',
+            'name': 'brown rice',
+            'quantity': 100,
+            'cost': 1.5,
+            'category': 'grain',
+            'expiration_date': None
+        }
+    ]
+    optimizer = MealOptimizer(budget=100.0, inventory_items=inventory, days=30, start_date=start)
+    
+    plan_days = list(optimizer.iter_plan_days())
+    assert [plan_day['day'] for plan_day in plan_days] == list(range(30))
+    
+    optimizer = MealOptimizer(budget=100.0, inventory_items=inventory, days=30, start_date=start)
+    result = optimizer.optimize_weekly_plan()
+    items = result['meal_plan_items']
+    
+    assert {item['day_index'] for item in items} == set(range(30)), "Every day should be planned!"
+    assert all(item['day_of_week'] == item['day_index'] % 7 for item in items)
+    assert abs(result['budget'] - 100.0 * 30 / 7) < 1e-9, "Budget should scale with the horizon!"
+    
+    chicken_days = {item['day_index'] for item in items
+                    if item['uses_inventory'] and item['food_name'] == 'Chicken Breast'}
+    print(f"Chicken from inventory on days: {sorted(chicken_days)}")
+    assert chicken_days and max(chicken_days) <= 9, "Expired inventory was used!"
+    rice_days = {item['day_index'] for item in items
+                 if item['uses_inventory'] and item['food_name'] == 'Brown Rice'}
+    assert max(rice_days) >= 7, "Inventory should carry across weeks!"
+    print(f"✓ 30 days planned, {len(items)} items, ${result['total_cost']:.2f}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_stream_weekly_plan():
+    """Test that streamed day frames add up to the regular plan."""
+    print("=" * 60)
+    print("TEST 18: Streamed Plan")
+    print("=" * 60)
+    
+    frames = list(MealOptimizer(budget=200.0, inventory_items=[]).stream_weekly_plan())
+    expected = MealOptimizer(budget=200.0, inventory_items=[]).optimize_weekly_plan()
+    
+    day_frames = [frame for frame in frames if frame['type'] == 'day']
+    assert [frame['day_index'] for frame in day_frames] == list(range(7))
+    assert frames[-1]['type'] == 'result', "Last frame should carry the full result!"
+    
+    result = frames[-1]['result']
+    streamed_items = [item for frame in day_frames for item in frame['items']]
+    assert streamed_items == expected['meal_plan_items'] == result['meal_plan_items']
+    assert result['total_cost'] == expected['total_cost']
+    assert abs(day_frames[-1]['running_total'] - expected['total_cost']) < 0.01
+    assert list(MealOptimizer.day_frames(expected['meal_plan_items'])) == day_frames
+    print(f"✓ {len(day_frames)} day frames, running total ${day_frames[-1]['running_total']:.2f}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_formats():
+    """Test Accept negotiation and the columnar item layout."""
+    print("=" * 60)
+    print("TEST 19: Plan Response Formats")
+    print("=" * 60)
+    
+    assert plan_formats.negotiate(None) == plan_formats.JSON
+    assert plan_formats.negotiate("text/html, */*;q=0.8") == plan_formats.JSON
+    assert plan_formats.negotiate(
+        "application/json;q=0.5, application/vnd.mealplan.columnar+json"
+    ) == plan_formats.COLUMNAR_JSON
+    
+    items = MealOptimizer(budget=200.0, inventory_items=[]).optimize_weekly_plan()['meal_plan_items']
+    layout = plan_formats.to_columns(items)
+    assert layout['count'] == len(items)
+    assert layout['columns']['food_name'] == [item['food_name'] for item in items]
+    
+    body = json.loads(plan_formats.encode({'items': items}, 'items', plan_formats.COLUMNAR_JSON))
+    rows = [
+        {field: values[i] for field, values in body['items']['columns'].items()}
+        for i in range(body['items']['count'])
+    ]
+    assert rows == items, "Columnar layout should round-trip!"
+    print(f"✓ {len(items)} items: {len(json.dumps(items))} bytes as rows, "
+          f"{len(json.dumps(body))} bytes as columns")
+    print("\n✓ Test PASSED\n")
+
+
+def test_food_search():
+    """Test ranked, typo-tolerant food search with facets and paging."""
+    print("=" * 60)
+    print("TEST 20: Food Search Index")
+    print("=" * 60)
+    
+    index = FoodDatabase.get_search_index()
+    assert index is FoodDatabase.get_search_index(), "Index should be built once per catalog!"
+    
+    result = index.search("brown rice")
+    assert result['results'][0]['name'] == 'Brown Rice'
+    assert index.search("ric")['results'][0]['name'] == 'Brown Rice', "Prefixes should match!"
+    assert index.search("brocoli")['results'][0]['name'] == 'Broccoli', "Typos should match!"
+    assert index.search("zzzz")['total'] == 0
+    
+    everything = index.search("", limit=100)
+    assert everything['total'] == len(FoodDatabase.FOODS)
+    assert sum(everything['facets'].values()) == len(FoodDatabase.FOODS)
+    names = [food['name'] for food in everything['results']]
+    assert names == sorted(names)
+    
+    page = index.search("", category='protein', limit=2, offset=2)
+    assert page['total'] == len(FoodDatabase.get_foods_by_category('protein'))
+    assert [food['name'] for food in page['results']] == [
+        food['name'] for food in index.search("", category='protein', limit=100)['results'][2:4]
+    ]
+    print(f"✓ {len(index.tokens)} tokens indexed, facets: {everything['facets']}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_alternatives_index():
+    """Test cheapest and nutritionally closest substitutes."""
+    print("=" * 60)
+    print("TEST 21: Alternatives Index")
+    print("=" * 60)
+    
+    salmon_cost = FoodDatabase.get_food('salmon')['cost_per_100g']
+    cheapest = FoodDatabase.find_alternatives('salmon', max_cost_ratio=0.8, k=3)
+    costs = [FoodDatabase.get_food(name)['cost_per_100g'] for name in cheapest]
+    assert len(cheapest) == 3 and 'salmon' not in cheapest
+    assert costs == sorted(costs) and costs[-1] <= salmon_cost * 0.8
+    
+    same_category = [
+        name for name in FoodDatabase.get_foods_by_category('protein')
+        if name != 'salmon' and FoodDatabase.get_food(name)['cost_per_100g'] <= salmon_cost * 0.8
+    ]
+    assert costs[0] == min(FoodDatabase.get_food(name)['cost_per_100g'] for name in same_category)
+    
+    index = FoodDatabase.get_alternatives_index()
+    closest = FoodDatabase.find_alternatives('salmon', k=2, rank='nutrition')
+    distances = [index.nutrient_distance('salmon', name) for name in closest]
+    assert distances == sorted(distances)
+    assert all(
+        index.nutrient_distance('salmon', name) >= distances[-1]
+        for name in FoodDatabase.find_alternatives('salmon') if name not in closest
+    ), "Nutrition ranking should return the closest foods!"
+    assert FoodDatabase.find_alternatives('unknown_food') == []
+    print(f"✓ Cheapest for salmon: {cheapest}, closest: {closest}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_food_catalog():
+    """Test the column-backed catalog behind the dict-like food records."""
+    print("=" * 60)
+    print("TEST 22: Compact Food Catalog")
+    print("=" * 60)
+    
+    foods = {
+        'oats': {'category': 'grain', 'cost_per_100g': 12, 'calories': 389, 'protein': 16.9, 'unit': 'g'},
+        'kale': {'category': 'vegetable', 'cost_per_100g': 30, 'calories': 49, 'protein': 4, 'unit': 'g'},
+    }
+    catalog = FoodCatalog.from_foods(foods)
+    assert FoodCatalog.from_foods(catalog) is catalog
+    assert list(catalog) == ['oats', 'kale'] and catalog.food_id('kale') == 1
+    assert 'oats' in catalog and catalog.get('rice') is None
+    
+    for name, data in foods.items():
+        record = catalog[name]
+        assert record == data and dict(record) == data, "Records should read back as the source dicts!"
+        assert type(record['cost_per_100g']) is int and type(record['protein']) is float
+    assert catalog.record(0).name == 'oats'
+    assert not hasattr(catalog['oats'], '__dict__'), "Records should not carry per-instance dicts!"
+    assert catalog.column('calories').dtype.kind == 'i' and catalog.column('protein').dtype.kind == 'f'
+    assert catalog.labels('category') == ['grain', 'vegetable']
+    
+    assert isinstance(FoodDatabase.FOODS, FoodCatalog)
+    chicken = FoodDatabase.get_food('chicken_breast')
+    print(f"✓ {len(FoodDatabase.FOODS)} foods in {FoodDatabase.FOODS.nbytes()} bytes of columns")
+    print(f"✓ chicken_breast: {dict(chicken)}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_catalog_file():
+    """Test compiling a dataset into a mapped catalog file and reading it back."""
+    print("=" * 60)
+    print("TEST 23: Memory-Mapped Catalog File")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        dataset = os.path.join(directory, 'foods.csv')
+        with open(dataset, 'w') as f:
+            f.write("name,category,cost_per_100g,calories,protein,carbs,fats,fiber,serving_size,unit,iron\n")
+            f.write("Red Lentils,Protein,18,116,9,20,0.4,7.9,100,g,3.3\n")
+            f.write("Basmati Rice,grain,9,360,7.1,79,0.9,1.3,75,g,0.8\n")
+        foods = catalog_file.read_dataset(dataset)
+        assert list(foods) == ['red_lentils', 'basmati_rice']
+        assert foods['red_lentils']['category'] == 'protein' and foods['red_lentils']['iron'] == 3.3
+        
+        # Sparse nutrient columns read as 0 where a food has no value
+        sparse = os.path.join(directory, 'sparse.csv')
+        with open(sparse, 'w') as f:
+            f.write("name,category,cost_per_100g,calories,protein,carbs,fats,fiber,serving_size,unit,iron,vitamin_c\n")
+            f.write("Kale,vegetable,12,49,4.3,8.8,0.9,3.6,67,g,,120\n")
+            f.write("Oat Milk,dairy,4,48,1,6.7,1.5,0.8,250,ml,0.3\n")
+        sparse_foods = catalog_file.read_dataset(sparse)
+        assert sparse_foods['kale']['iron'] == 0 and sparse_foods['kale']['vitamin_c'] == 120
+        assert sparse_foods['oat_milk']['vitamin_c'] == 0
+        with open(sparse, 'a') as f:
+            f.write("Chard,vegetable,10,19,1.8,3.7,0.2,1.6,80,g,1.8,about 30\n")
+        try:
+            catalog_file.read_dataset(sparse)
+            assert False, "A malformed value should still be rejected!"
+        except catalog_file.CatalogFileError as e:
+            assert 'vitamin_c' in str(e)
+        
+        path = os.path.join(directory, 'catalog.bin')
+        header = catalog_file.write_catalog(FoodDatabase.BUILTIN_FOODS, path, version='test')
+        catalog = catalog_file.open_catalog(path)
+        assert catalog.version == 'test' and header['foods'] == len(catalog)
+        assert list(catalog) == list(FoodDatabase.BUILTIN_FOODS)
+        for name, data in FoodDatabase.BUILTIN_FOODS.items():
+            assert catalog.food_id(name) == FoodDatabase.BUILTIN_FOODS.food_id(name)
+            assert catalog[name] == data, "Mapped records should match the source!"
+        assert 'unknown_food' not in catalog and catalog.get('') is None
+        
+        # Indexes over a flagged file come from its columns, without looking names up
+        flagged = {name: {**food, **DietaryRules.flags(name, food)} for name, food in FoodDatabase.BUILTIN_FOODS.items()}
+        catalog_file.write_catalog(flagged, path)
+        mapped = catalog_file.open_catalog(path)
+        index, arrays = CompatibilityIndex(mapped), CatalogArrays(mapped)
+        assert not mapped._found, "Building the indexes should not search the name index!"
+        assert index.foods_in_category('dairy') == FoodDatabase.get_foods_by_category('dairy')
+        assert index.allowed_foods(('vegan',), 'protein') == \
+            FoodDatabase.snapshot().get_compatibility_index().allowed_foods(('vegan',), 'protein')
+        assert arrays.names[arrays.index['brown_rice']] == 'brown_rice'
+        
+        catalog_file.write_catalog(foods, path)
+        assert catalog_file.open_catalog(path)['basmati_rice']['calories'] == 360
+        
+        # Dietary flag columns decide restrictions for foods the built-in lists do not know
+        with open(dataset, 'w') as f:
+            f.write("name,category,cost_per_100g,calories,protein,carbs,fats,fiber,serving_size,unit,meat,animal_product,gluten\n")
+            f.write("Venison,protein,30,158,30,0,3.2,0,150,g,1,yes,\n")
+            f.write("Tofu,protein,8,76,8,1.9,4.8,0.3,150,g,0,no,\n")
+            f.write("Paneer,dairy,15,265,18,1.2,21,0,100,g,false,true,0\n")
+            f.write("Rye Crackers,grain,12,366,9,82,1,15,30,g,0,0,1\n")
+        catalog_file.write_catalog(catalog_file.read_dataset(dataset), path)
+        index = CompatibilityIndex(catalog_file.open_catalog(path))
+        assert index.allowed_foods(('vegetarian',), 'protein') == ['tofu']
+        assert index.allowed_foods(('vegan',), 'dairy') == []
+        assert index.allowed_foods(('gluten-free',), 'grain') == []
+        with open(dataset, 'a') as f:
+            f.write("Jerky,protein,40,410,33,11,26,2,30,g,maybe,1,0\n")
+        try:
+            catalog_file.read_dataset(dataset)
+            assert False, "A flag that is not yes or no should be rejected!"
+        except catalog_file.CatalogFileError:
+            pass
+        print(f"✓ {header['foods']} foods, {header['record_size']} bytes per record")
+    print("\n✓ Test PASSED\n")
+
+
+def test_catalog_reload():
+    """Test that price reloads swap in a new snapshot without touching running optimizers."""
+    print("=" * 60)
+    print("TEST 24: Catalog Snapshot Reload")
+    print("=" * 60)
+    
+    before = FoodDatabase.snapshot()
+    optimizer = MealOptimizer(budget=1500.0, inventory_items=[], days=2)
+    price = before.FOODS['brown_rice']['cost_per_100g']
+    
+    try:
+        after = FoodDatabase.update_prices({'brown_rice': price * 2}).result()
+        assert FoodDatabase.snapshot() is after and after.version > before.version
+        assert after.tag != before.tag, "New prices should change the catalog tag!"
+        assert FoodDatabase.get_food('brown_rice')['cost_per_100g'] == price * 2
+        assert optimizer.food_db is before and before.FOODS['brown_rice']['cost_per_100g'] == price
+        assert optimizer.optimize_weekly_plan()['catalog_version'] == before.tag
+        
+        try:
+            FoodDatabase.update_prices({'unknown_food': 1.0})
+            assert False, "Unknown foods should be rejected"
+        except KeyError:
+            pass
+        print(f"✓ Version {before.version} -> {after.version}, tag {before.tag} -> {after.tag}")
+    finally:
+        FoodDatabase.load_catalog(FoodDatabase.BUILTIN_FOODS)
+    print("\n✓ Test PASSED\n")
+
+
+def test_inventory_name_matching():
+    """Test matching free-text inventory names to catalog foods."""
+    print("=" * 60)
+    print("TEST 25: Inventory Name Matching")
+    print("=" * 60)
+    
+    matcher = FoodNameMatcher(FoodDatabase.BUILTIN_FOODS)
+    expected = {
+        'Chicken Breast (boneless)': 'chicken_breast',
+        'Apples': 'apple',
+        'Rice': 'brown_rice',
+        'Basmati rice': 'brown_rice',
+        'brocoli': 'broccoli',
+        'Greek yoghurt': 'greek_yogurt',
+        'Eggs, large': 'eggs',
+        'Orange juice': None,
+        'Peanut butter': None,
+    }
+    for name, food_name in expected.items():
+        assert matcher.resolve(name) == food_name, f"{name!r} should match {food_name}"
+        print(f"✓ {name!r} -> {food_name}")
+    
+    # Items matching the same food are pooled under it
+    optimizer = MealOptimizer(
+        budget=100.0,
+        inventory_items=[
+            {'id': 'a', 'name': 'Apples', 'quantity': 300, 'cost': 1.0, 'category': 'fruit'},
+            {'id': 'b', 'name': 'green apple', 'quantity': 200, 'cost': 0.5, 'category': 'fruit'},
+            {'id': 'c', 'name': 'Mystery jar', 'quantity': 100, 'cost': 1.0, 'category': ''},
+        ],
+        days=1
+    )
+    assert optimizer.inventory_items['apple']['quantity'] == 500
+    assert 'mystery_jar' in optimizer.inventory_items
+    
+    # Resolved names are stored once and read back from the table
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[FoodNameMapping.__table__])
+    with Session(engine) as session:
+        first = resolve_names(session, matcher, ['Apples', 'apple', 'Mystery jar'])
+        assert first == {'Apples': 'apple', 'apple': 'apple', 'Mystery jar': None}
+        rows = session.exec(select(FoodNameMapping)).all()
+        assert sorted(row.item_key for row in rows) == ['apple', 'mystery jar']
+        assert resolve_names(session, matcher, ['APPLES']) == {'APPLES': 'apple'}
+        assert len(session.exec(select(FoodNameMapping)).all()) == 2
+        
+        # Read-only resolution matches new names without storing them
+        assert resolve_names(session, matcher, ['Spinach leaves'], store=False) == {'Spinach leaves': 'spinach'}
+        assert not session.new and not session.dirty
+        assert len(session.exec(select(FoodNameMapping)).all()) == 2
+    print("\n✓ Test PASSED\n")
+
+
+def test_fefo_inventory():
+    """Test first-expired-first-out inventory lots and the expiring-unused report."""
+    print("=" * 60)
+    print("TEST 26: First-Expired-First-Out Inventory")
+    print("=" * 60)
+    
+    inventory = [
+        {'id': 'late', 'name': 'Apples', 'quantity': 3, 'cost': 1.0, 'category': 'fruit', 'expiration_date': '2026-10-30'},
+        {'id': 'soon', 'name': 'apple', 'quantity': 2, 'cost': 1.0, 'category': 'fruit', 'expiration_date': '2026-10-19'},
+        {'id': 'gone', 'name': 'Bananas', 'quantity': 5, 'cost': 1.0, 'category': 'fruit', 'expiration_date': '2026-10-16'},
+        {'id': 'spinach', 'name': 'spinach', 'quantity': 50, 'cost': 1.0, 'category': 'vegetable', 'expiration_date': '2026-10-19'},
+    ]
+    optimizer = MealOptimizer(
+        budget=700.0,
+        inventory_items=inventory,
+        days=4,
+        start_date=date(2026, 10, 17)
+    )
+    assert [lot['id'] for lot in optimizer.inventory_items.lots('apple')] == ['soon', 'late']
+    assert optimizer.inventory_items['apple']['quantity'] == 5
+    
+    # Sooner expiry, bigger bonus
+    on = date(2026, 10, 17)
+    assert (ScoringEngine.inventory_score(date(2026, 10, 18), on)
+            > ScoringEngine.inventory_score(date(2026, 10, 28), on)
+            > ScoringEngine.inventory_score(None, on))
+    
+    result = optimizer.optimize_weekly_plan()
+    apple_lots = [item['inventory_item_id'] for item in result['meal_plan_items']
+                  if item['uses_inventory'] and item['food_name'] == 'Apple']
+    assert apple_lots and apple_lots[0] == 'soon', "The lot expiring first should be used first!"
+    assert apple_lots == sorted(apple_lots, key=['soon', 'late'].index)
+    assert all(item['food_name'] != 'Banana' or not item['uses_inventory'] for item in result['meal_plan_items'])
+    
+    unused = {lot['inventory_item_id']: lot for lot in result['inventory_usage']['expiring_unused']}
+    assert unused['gone']['quantity_left'] == 5 and unused['gone']['days_after_start'] == -1
+    assert 'late' not in unused
+    for lot in result['inventory_usage']['expiring_unused']:
+        print(f"✓ {lot['name']}: {lot['quantity_left']} left, expires {lot['expiration_date']}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_household_plan():
+    """Test planning one shared budget for household members with different restrictions."""
+    print("=" * 60)
+    print("TEST 27: Household Planning")
+    print("=" * 60)
+    
+    members = [
+        {'name': 'Alex'},
+        {'name': 'Sam', 'dietary_restrictions': 'vegetarian'},
+        {'name': 'Kit', 'portion': 0.5},
+        {'name': 'Jo'},
+        {'name': 'Lee'},
+        {'name': 'Max'},
+    ]
+    inventory = [{'id': 'rice', 'name': 'Brown Rice', 'quantity': 10, 'cost': 1.0, 'category': 'grain'}]
+    optimizer = MealOptimizer(budget=600.0, inventory_items=inventory)
+    result = optimizer.optimize_household(members)
+    household = result['household']
+    
+    # Six members, two restriction profiles, two optimizer runs
+    groups = {tuple(group['members']): group for group in household['groups']}
+    assert groups[('Alex', 'Kit', 'Jo', 'Lee', 'Max')]['portions'] == 4.5
+    assert groups[('Sam',)]['dietary_restrictions'] == 'vegetarian'
+    sam_items = [item for item in result['meal_plan_items'] if item['notes'].startswith('For Sam')]
+    assert sam_items and all(item['food_name'].lower().replace(' ', '_') not in DietaryRules.MEAT
+                             for item in sam_items)
+    
+    # Portions and targets scale per member
+    kit = household['members'][2]
+    assert kit['name'] == 'Kit'
+    assert kit['daily_targets']['calories']['optimal'] == NutritionRules.DAILY_REQUIREMENTS['calories']['optimal'] * 0.5
+    assert result['nutrition_analysis']['overall_score'] == groups[('Alex', 'Kit', 'Jo', 'Lee', 'Max')]['overall_score']
+    
+    # One shopping list for everyone
+    names = [entry['item'] for entry in result['shopping_list']]
+    assert len(names) == len(set(names)), "Shared ingredients should be listed once!"
+    bought = sum(item['quantity'] for item in result['meal_plan_items']
+                 if item['food_name'] == names[0] and not item['uses_inventory'])
+    assert result['shopping_list'][0]['quantity'] == round(bought, 1)
+    assert abs(result['total_cost'] - sum(item['estimated_cost'] for item in result['meal_plan_items'])) < 0.01
+    
+    # The optimizer is left planning for its own user
+    assert optimizer.budget == 600.0 and optimizer.portions == 1.0 and optimizer.dietary_restrictions == ''
+    
+    # Nor does it keep the last group's slot candidates
+    unstocked = MealOptimizer(budget=600.0, inventory_items=[])
+    own = [item['food_name'] for item in unstocked.optimize_weekly_plan()['meal_plan_items']]
+    unstocked.optimize_household([{'name': 'Alex'}, {'name': 'Sam', 'dietary_restrictions': 'vegan'}])
+    assert [item['food_name'] for item in unstocked.optimize_weekly_plan()['meal_plan_items']] == own, \
+        "Slot candidates leaked out of the last household group!"
+    print(f"✓ {household['size']} members in {len(household['groups'])} groups, total ${result['total_cost']:.2f}")
+    print(f"✓ {len(result['shopping_list'])} shopping list entries")
+    print("\n✓ Test PASSED\n")
+
+
+def test_household_regenerate():
+    """Test regenerating one meal of a saved household plan through the API route."""
+    print("=" * 60)
+    print("TEST 28: Household Meal Regeneration")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'holder', dietary_restrictions=None)
+    request = meal_plans.MealPlanOptimizeRequest(
+        target_budget=300.0,
+        use_inventory=False,
+        members=[
+            meal_plans.HouseholdMember(name='Holder'),
+            meal_plans.HouseholdMember(name='Vegan kid', dietary_restrictions='vegan', portion=0.5),
+        ]
+    )
+    plan = meal_plans.optimize_meal_plan(request, user, session, Response())
+    household = plan.household
+    
+    def lunch_rows():
+        return session.exec(select(MealPlanItem).where(
+            MealPlanItem.meal_plan_id == plan.meal_plan.id,
+            MealPlanItem.day_index == 0,
+            MealPlanItem.meal_type == 'lunch'
+        )).all()
+    
+    def check_groups(rows):
+        for group_index, group in enumerate(household['groups']):
+            group_rows = [row for row in rows if row.household_group == group_index]
+            assert group_rows, f"{group['members']} lost their meal!"
+            profile = DietaryRules.canonical_profile(group['dietary_restrictions'])
+            for row in group_rows:
+                food_name = row.food_name.lower().replace(' ', '_')
+                food = FoodDatabase.get_food(food_name)
+                assert not any(DietaryRules.excludes(r, food_name, food) for r in profile), \
+                    f"{row.food_name} does not suit {group['members']}"
+                assert row.notes.startswith(f"For {', '.join(group['members'])}")
+    
+    before = lunch_rows()
+    check_groups(before)
+    regenerated = meal_plans.regenerate_meal(
+        plan.meal_plan.id,
+        meal_plans.MealRegenerateRequest(day_index=0, meal_type='lunch', use_inventory=False),
+        user,
+        session
+    )
+    after = lunch_rows()
+    check_groups(after)
+    assert len(after) == len(before) == len(regenerated.items)
+    
+    # The child's share is half an adult's
+    kid_group = [group['members'] for group in household['groups']].index(['Vegan kid'])
+    kid_rows = [row for row in after if row.household_group == kid_group]
+    assert all(row.quantity == FoodDatabase.get_food(row.food_name.lower().replace(' ', '_'))['serving_size'] * 0.5
+               for row in kid_rows)
+    for row in after:
+        print(f"✓ {row.notes}: {row.food_name} {row.quantity}{row.unit}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_persistence():
+    """Test saving a plan and all of its items with one bulk insert."""
+    print("=" * 60)
+    print("TEST 29: Bulk Plan Persistence")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'bulk')
+    result = MealOptimizer(100.0, []).optimize_weekly_plan()
+    
+    inserts = []
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('INSERT'):
+            inserts.append(statement.split('(')[0])
+    event.listen(session.get_bind(), 'before_cursor_execute', count_inserts)
+    try:
+        plan, items = _store_plan(session, user, '2026-10-01T08:00:00', result=result)
+    finally:
+        event.remove(session.get_bind(), 'before_cursor_execute', count_inserts)
+    assert len(inserts) == 2, f"Expected one INSERT for the plan and one for its items, got {inserts}"
+    
+    stored = session.exec(select(MealPlanItem).where(MealPlanItem.meal_plan_id == plan.id)).all()
+    assert len(stored) == len(items) == len(result['meal_plan_items'])
+    expected = {item.id: (item.day_index, item.meal_type, item.food_name, item.quantity) for item in items}
+    assert {row.id: (row.day_index, row.meal_type, row.food_name, row.quantity) for row in stored} == expected
+    print(f"✓ {len(stored)} items written with {len(inserts)} INSERT statements")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_listing_pages():
+    """Test keyset paging of the plan listing through the API route."""
+    print("=" * 60)
+    print("TEST 30: Plan Listing Pages")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'pager')
+    other = _add_user(session, 'someone_else')
+    result = MealOptimizer(100.0, []).optimize_weekly_plan(mode='greedy')
+    # Several plans share a created_at, so pages have to break ties by id
+    for created_at in ['2026-10-01T08:00:00'] * 5 + ['2026-10-02T08:00:00', '2026-09-30T08:00:00']:
+        _store_plan(session, user, created_at, result=result if created_at.startswith('2026-10-02') else None)
+    _store_plan(session, other, '2026-10-01T08:00:00')
+    
+    everything = meal_plans.get_meal_plans(user, session, Response(), status_filter=None, limit=None, cursor=None)
+    assert len(everything) == 7
+    
+    paged = []
+    cursor = None
+    pages = 0
+    while True:
+        response = Response()
+        page = meal_plans.get_meal_plans(user, session, response, status_filter=None, limit=2, cursor=cursor)
+        paged.extend(page)
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+        assert len(page) == 2
+    
+    ids = [plan.id for plan in paged]
+    assert len(ids) == len(set(ids)), "A plan appeared on two pages!"
+    assert ids == [plan.id for plan in everything], "Pages skipped or reordered plans!"
+    assert [plan.created_at for plan in paged] == sorted((plan.created_at for plan in paged), reverse=True)
+    assert paged[0].items_count == len(result['meal_plan_items']) and paged[-1].items_count == 0
+    print(f"✓ {len(ids)} plans over {pages} pages, no duplicates or gaps")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_analysis_storage():
+    """Test storing a plan's analysis with it, and recomputing it when a meal is regenerated."""
+    print("=" * 60)
+    print("TEST 31: Stored Plan Analysis")
+    print("=" * 60)
+    
+    result = MealOptimizer(100.0, []).optimize_weekly_plan()
+    analysis = unpack_analysis(pack_analysis(result))
+    assert analysis == json.loads(json.dumps({field: result[field] for field in ANALYSIS_FIELDS}))
+    assert unpack_analysis(None) is None and unpack_analysis(b'') is None
+    
+    session = _memory_session()
+    user = _add_user(session, 'analyst')
+    plan, _ = _store_plan(session, user, '2026-10-01T08:00:00', result=result)
+    detail = meal_plans.get_meal_plan(plan.id, user, session, Response())
+    assert detail.shopping_list == analysis['shopping_list']
+    assert detail.nutrition_analysis == analysis['nutrition_analysis']
+    assert detail.budget_utilization == result['budget_utilization']
+    
+    # Plans saved before analyses were stored come back without one
+    old_plan, _ = _store_plan(session, user, '2026-09-01T08:00:00')
+    old_detail = meal_plans.get_meal_plan(old_plan.id, user, session, Response())
+    assert old_detail.shopping_list is None and old_detail.nutrition_analysis is None
+    
+    # An edited plan is analyzed again as it now stands
+    regenerated = meal_plans.regenerate_meal(
+        plan.id, meal_plans.MealRegenerateRequest(day_index=0, meal_type='dinner', use_inventory=False), user, session
+    )
+    session.refresh(plan)
+    edited = meal_plans.get_meal_plan(plan.id, user, session, Response())
+    day_calories = sum(item.calories for item in edited.items if item.day_index == 0)
+    assert abs(edited.nutrition_analysis['daily_analyses']['day_0']['calories']['actual'] - day_calories) < 0.01
+    assert len(edited.nutrition_analysis['daily_analyses']) == result['days']
+    bought = {entry['item'] for entry in edited.shopping_list}
+    assert all(item.food_name in bought for item in regenerated.items if not item.uses_inventory)
+    assert edited.budget_remaining == round(result['budget'] - plan.total_cost, 2)
+    print(f"✓ Analysis round-trips in {len(pack_analysis(result))} bytes and is recomputed on regenerate")
+    print("\n✓ Test PASSED\n")
+
+
+def test_plan_retention():
+    """Test archiving and deleting old plans through the retention route."""
+    print("=" * 60)
+    print("TEST 32: Plan Retention")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'keeper')
+    other = _add_user(session, 'neighbour')
+    result = MealOptimizer(100.0, []).optimize_weekly_plan()
+    old_active, _ = _store_plan(session, user, '2025-01-01T08:00:00', result=result)
+    old_completed, _ = _store_plan(session, user, '2025-01-02T08:00:00', status='completed')
+    recent, _ = _store_plan(session, user, datetime.now().isoformat())
+    others, _ = _store_plan(session, other, '2025-01-01T08:00:00', result=result)
+    
+    def statuses():
+        session.expire_all()
+        return {plan.id: plan.status for plan in session.exec(select(MealPlan)).all()}
+    
+    archived = meal_plans.apply_meal_plan_retention(
+        meal_plans.MealPlanRetentionRequest(older_than_days=30, action='archive', status_filter='active'), user, session
+    )
+    assert archived['affected'] == 1
+    assert statuses() == {old_active.id: 'archived', old_completed.id: 'completed',
+                          recent.id: 'active', others.id: 'active'}
+    
+    deleted = meal_plans.apply_meal_plan_retention(
+        meal_plans.MealPlanRetentionRequest(older_than_days=30, action='delete'), user, session
+    )
+    assert deleted['affected'] == 2
+    assert statuses() == {recent.id: 'active', others.id: 'active'}
+    remaining_items = {row.meal_plan_id for row in session.exec(select(MealPlanItem)).all()}
+    assert remaining_items == {others.id}, "Deleted plans left items behind, or another user's were removed!"
+    print(f"✓ Archived {archived['affected']}, deleted {deleted['affected']}; other users untouched")
+    print("\n✓ Test PASSED\n")
+
+
+def test_conditional_get():
+    """Test plan and catalog ETags and 304 responses."""
+    print("=" * 60)
+    print("TEST 33: ETags and Conditional GET")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'revalidator')
+    plan, _ = _store_plan(session, user, '2026-10-01T08:00:00', result=MealOptimizer(100.0, []).optimize_weekly_plan())
+    
+    def plan_etag():
+        response = Response()
+        meal_plans.get_meal_plan(plan.id, user, session, response)
+        return response.headers['ETag']
+    
+    etag = plan_etag()
+    not_modified = meal_plans.get_meal_plan(plan.id, user, session, Response(), if_none_match=etag)
+    assert not_modified.status_code == 304 and not_modified.headers['ETag'] == etag
+    assert meal_plans.get_meal_plan(plan.id, user, session, Response(), if_none_match='"stale"').id == plan.id
+    
+    # Every change to the plan or its items gives it a new tag
+    meal_plans.update_meal_plan_status(plan.id, 'completed', user, session)
+    after_status = plan_etag()
+    meal_plans.regenerate_meal(
+        plan.id, meal_plans.MealRegenerateRequest(day_index=1, meal_type='lunch', use_inventory=False), user, session
+    )
+    after_regenerate = plan_etag()
+    assert len({etag, after_status, after_regenerate}) == 3, "Plan changed without a new ETag!"
+    assert meal_plans.get_meal_plan(plan.id, user, session, Response(), if_none_match=etag).id == plan.id
+    
+    # Search bodies echo the query as sent, so differently cased queries are different entities
+    def search(query, if_none_match=None):
+        response = Response()
+        body = meal_plans.search_food_database(query, response, category=None, limit=20, offset=0,
+                                               if_none_match=if_none_match)
+        return body, response.headers.get('ETag')
+    
+    body, lower_etag = search('rice')
+    _, upper_etag = search('Rice')
+    assert lower_etag != upper_etag
+    assert search('Rice', if_none_match=lower_etag)[0]['query'] == 'Rice'
+    assert search('rice', if_none_match=lower_etag)[0].status_code == 304
+    print(f"✓ Plan ETags: {etag} -> {after_status} -> {after_regenerate}")
+    print("\n✓ Test PASSED\n")
+
+
+def test_regenerate_checks():
+    """Test that regenerating a meal checks the slot and leaves the plan's own pantry draws alone."""
+    print("=" * 60)
+    print("TEST 34: Meal Regeneration Checks")
+    print("=" * 60)
+    
+    session = _memory_session()
+    user = _add_user(session, 'pantry')
+    session.add(InventoryItem(name='Brown Rice', quantity=1.5, cost=1.0, category='grain', user_id=user.id))
+    session.commit()
+    plan = meal_plans.optimize_meal_plan(
+        meal_plans.MealPlanOptimizeRequest(target_budget=100.0, use_inventory=True), user, session, Response()
+    )
+    drawn = sum(item.quantity for item in plan.meal_items if item.uses_inventory) / 100
+    assert drawn >= 1.5, "The plan should use up the rice!"
+    
+    # Dinner may not draw the rice breakfast and lunch already took
+    regenerated = meal_plans.regenerate_meal(
+        plan.meal_plan.id, meal_plans.MealRegenerateRequest(day_index=0, meal_type='dinner'), user, session
+    )
+    assert regenerated.items and not any(item.uses_inventory for item in regenerated.items)
+    
+    def rejected(day_index, plan_id=plan.meal_plan.id):
+        try:
+            meal_plans.regenerate_meal(
+                plan_id, meal_plans.MealRegenerateRequest(day_index=day_index, meal_type='dinner'), user, session
+            )
+        except HTTPException as e:
+            return e.status_code
+        return None
+    
+    # Days past the plan and empty slots have nothing to regenerate
+    assert rejected(7) == 422
+    empty_plan, _ = _store_plan(session, user, '2026-10-01T08:00:00')
+    assert rejected(0, plan_id=empty_plan.id) == 404
+    print(f"✓ Regenerated dinner without redrawing {drawn:.2f} units of rice")
+    print("✓ Out-of-range days and empty slots are rejected")
+    print("\n✓ Test PASSED\n")
+
+
 def run_all_tests():
     """Run all tests."""
     print("\n" + "=" * 60)
@@ -254,6 +1391,33 @@ def run_all_tests():
         test_shopping_list()
         test_alternatives()
         test_nutrition_analysis()
+        test_scoring_engine()
+        test_compatibility_index()
+        test_lp_mode()
+        test_anytime_mode()
+        test_multistart_mode()
+        test_plan_state()
+        test_regenerate_meal()
+        test_plan_cache()
+        test_budget_sweep()
+        test_multi_week_horizon()
+        test_stream_weekly_plan()
+        test_plan_formats()
+        test_food_search()
+        test_alternatives_index()
+        test_food_catalog()
+        test_catalog_file()
+        test_catalog_reload()
+        test_inventory_name_matching()
+        test_fefo_inventory()
+        test_household_plan()
+        test_household_regenerate()
+        test_plan_persistence()
+        test_plan_listing_pages()
+        test_plan_analysis_storage()
+        test_plan_retention()
+        test_conditional_get()
+        test_regenerate_checks()
         
         print("=" * 60)
         print("ALL TESTS PASSED! ✓")
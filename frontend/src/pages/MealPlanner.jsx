@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
-import api from '../services/api';
+import api, { mealPlanAPI, streamNdjson } from '../services/api';
 import { Utensils, Sparkles, FileText, Target, DollarSign, Calendar, Package, Trash2, Eye, Loader2, ShoppingCart, Lightbulb, Sun, Moon, Cookie, Sunrise } from 'lucide-react';
 
 export default function MealPlanner() {
@@ -37,17 +37,36 @@ export default function MealPlanner() {
   const handleOptimizeMealPlan = async () => {
     try {
       setOptimizing(true);
-      const response = await api.post('/meal-plans/optimize', {
+      setOptimizationResult({ meal_items: [] });
+      setActiveTab('details');
+      
+      // Render each day as soon as it is planned; the summary frame completes the result
+      let streamError = null;
+      await streamNdjson('/meal-plans/optimize/stream', {
         target_budget: targetBudget,
         duration_days: durationDays,
         use_inventory: useInventory
+      }, (frame) => {
+        if (frame.type === 'day') {
+          setOptimizationResult(prev => ({
+            ...prev,
+            meal_items: [...(prev?.meal_items || []), ...frame.items],
+            total_cost: frame.running_total
+          }));
+        } else if (frame.type === 'summary') {
+          setOptimizationResult(frame);
+        } else if (frame.type === 'error') {
+          streamError = new Error(frame.detail);
+        }
       });
-      
-      setOptimizationResult(response.data);
-      setActiveTab('details');
+      if (streamError) {
+        throw streamError;
+      }
       await loadMealPlans();
     } catch (error) {
       console.error('Error optimizing meal plan:', error);
+      setOptimizationResult(null);
+      setActiveTab('create');
       alert('Failed to generate meal plan. Please try again.');
     } finally {
       setOptimizing(false);
@@ -57,8 +76,12 @@ export default function MealPlanner() {
   const handleViewPlan = async (planId) => {
     try {
       setLoading(true);
-      const response = await api.get(`/meal-plans/${planId}`);
+      const response = await mealPlanAPI.getPlan(planId);
       setSelectedPlan(response.data);
+      // Plans saved with their analysis show the same summary as a fresh optimization
+      setOptimizationResult(
+        response.data.nutrition_analysis ? { ...response.data, meal_items: response.data.items } : null
+      );
       setActiveTab('details');
     } catch (error) {
       console.error('Error loading plan details:', error);
@@ -86,19 +109,20 @@ export default function MealPlanner() {
   
   const getDayName = (dayIndex) => {
     const days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
-    return days[dayIndex];
+    return days[dayIndex % 7];
   };
   
   const groupItemsByDay = (items) => {
     const grouped = {};
     items.forEach(item => {
-      if (!grouped[item.day_of_week]) {
-        grouped[item.day_of_week] = {};
+      const day = item.day_index ?? item.day_of_week;
+      if (!grouped[day]) {
+        grouped[day] = {};
       }
-      if (!grouped[item.day_of_week][item.meal_type]) {
-        grouped[item.day_of_week][item.meal_type] = [];
+      if (!grouped[day][item.meal_type]) {
+        grouped[day][item.meal_type] = [];
       }
-      grouped[item.day_of_week][item.meal_type].push(item);
+      grouped[day][item.meal_type].push(item);
     });
     return grouped;
   };
@@ -328,7 +352,7 @@ export default function MealPlanner() {
       {activeTab === 'details' && (optimizationResult || selectedPlan) && (
         <div className="space-y-6">
           {/* Summary Cards */}
-          {optimizationResult && (
+          {optimizationResult?.nutrition_analysis && (
             <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
               <div className="stat-card bg-gradient-to-br from-[#3E7C59] to-[#2d5a42] text-white cursor-default">
                 <div className="text-sm font-semibold uppercase tracking-wider text-white/80 mb-2">Total Cost</div>
@@ -398,7 +422,7 @@ export default function MealPlanner() {
               <div className="w-12 h-12 rounded-2xl bg-gradient-to-br from-[#3E7C59] to-[#2d5a42] flex items-center justify-center text-2xl shadow-lg">
                 <span>🍽️</span>
               </div>
-              <h3 className="text-2xl font-bold text-neutral-800">Weekly Meal Plan</h3>
+              <h3 className="text-2xl font-bold text-neutral-800">Meal Plan</h3>
             </div>
             <div className="space-y-6">
               {Object.entries(
@@ -21,6 +21,30 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+// Swaps the refresh token for new tokens; if that fails, logs out and sends the user to login
+const refreshTokens = async () => {
+  try {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (!refreshToken) {
+      throw new Error('No refresh token');
+    }
+
+    const response = await axios.post(`${API_URL}/auth/refresh`, {
+      refresh_token: refreshToken,
+    });
+
+    const { access_token, refresh_token } = response.data;
+    localStorage.setItem('access_token', access_token);
+    localStorage.setItem('refresh_token', refresh_token);
+    return access_token;
+  } catch (refreshError) {
+    localStorage.removeItem('access_token');
+    localStorage.removeItem('refresh_token');
+    window.location.href = '/login';
+    throw refreshError;
+  }
+};
+
 // Response interceptor to handle token refresh
 api.interceptors.response.use(
   (response) => response,
@@ -30,28 +54,9 @@ api.interceptors.response.use(
     if (error.response?.status === 401 && !originalRequest._retry) {
       originalRequest._retry = true;
 
-      try {
-        const refreshToken = localStorage.getItem('refresh_token');
-        if (!refreshToken) {
-          throw new Error('No refresh token');
-        }
-
-        const response = await axios.post(`${API_URL}/auth/refresh`, {
-          refresh_token: refreshToken,
-        });
-
-        const { access_token, refresh_token } = response.data;
-        localStorage.setItem('access_token', access_token);
-        localStorage.setItem('refresh_token', refresh_token);
-
-        originalRequest.headers.Authorization = `Bearer ${access_token}`;
-        return api(originalRequest);
-      } catch (refreshError) {
-        localStorage.removeItem('access_token');
-        localStorage.removeItem('refresh_token');
-        window.location.href = '/login';
-        return Promise.reject(refreshError);
-      }
+      const accessToken = await refreshTokens();
+      originalRequest.headers.Authorization = `Bearer ${accessToken}`;
+      return api(originalRequest);
     }
 
     return Promise.reject(error);
@@ -104,4 +109,68 @@ export const imageAPI = {
   },
 };
 
+// Item layouts the meal-plan endpoints can negotiate through the Accept header
+export const PLAN_FORMATS = {
+  json: 'application/json',
+  columnar: 'application/vnd.mealplan.columnar+json',
+};
+
+// Rebuilds item objects from the columnar layout ({ count, columns: { field: [values] } })
+export const rowsFromColumns = ({ count, columns }) =>
+  Array.from({ length: count }, (_, index) =>
+    Object.fromEntries(Object.entries(columns).map(([field, values]) => [field, values[index]]))
+  );
+
+export const mealPlanAPI = {
+  getPlan: async (planId, format = 'columnar') => {
+    const response = await api.get(`/meal-plans/${planId}`, {
+      headers: { Accept: PLAN_FORMATS[format] },
+    });
+    if (format === 'columnar') {
+      response.data.items = rowsFromColumns(response.data.items);
+    }
+    return response;
+  },
+};
+
+const postStream = (path, body) => {
+  const token = localStorage.getItem('access_token');
+  return fetch(`${API_URL}${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+  });
+};
+
+// Streams a newline-delimited JSON response, calling onFrame for each parsed line.
+// fetch bypasses the axios interceptors, so an expired token is refreshed here and the request retried once.
+export const streamNdjson = async (path, body, onFrame) => {
+  let response = await postStream(path, body);
+  if (response.status === 401) {
+    await refreshTokens();
+    response = await postStream(path, body);
+  }
+  if (!response.ok || !response.body) {
+    throw new Error(`Request failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.filter((line) => line.trim()).forEach((line) => onFrame(JSON.parse(line)));
+    if (done) break;
+  }
+  if (buffer.trim()) {
+    onFrame(JSON.parse(buffer));
+  }
+};
+
 export default api;